@@ -9,13 +9,19 @@ import qrcode
 import io
 import base64
 from functools import wraps
+import database
+from database import get_db
+from pagination import parse_page, page_headers
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-in-production'
 
+# Pooled SQLite connections are released when each app context tears down
+database.init_app(app)
+
 # Database initialization
 def init_db():
-    conn = sqlite3.connect('school_system.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Users table
@@ -136,7 +142,7 @@ def init_db():
 
 def migrate_database():
     """Add missing columns to existing tables"""
-    conn = sqlite3.connect('school_system.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
@@ -211,7 +217,7 @@ def login():
         username = request.form['username']
         password = request.form['password']
         
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute('SELECT id, password_hash, role FROM users WHERE username = ?', (username,))
         user = cursor.fetchone()
@@ -270,7 +276,7 @@ def register():
                 designation = request.form['designation']  # Changed from class_name to designation
                 mobile_number = request.form.get('mobile_number', '')
             
-            conn = sqlite3.connect('school_system.db')
+            conn = get_db()
             cursor = conn.cursor()
             
             # Create user account with mobile number
@@ -443,7 +449,7 @@ def dashboard():
 @login_required
 @role_required('student')
 def student_dashboard():
-    conn = sqlite3.connect('school_system.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Get student info
@@ -492,7 +498,7 @@ def student_dashboard():
 @login_required
 @role_required('teacher')
 def teacher_dashboard():
-    conn = sqlite3.connect('school_system.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Get teacher info
@@ -543,7 +549,7 @@ def admin_api_test():
 @login_required
 @role_required('admin')
 def admin_dashboard():
-    conn = sqlite3.connect('school_system.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Get overall statistics
@@ -586,7 +592,7 @@ def admin_dashboard():
 @role_required('admin')
 def manage_schedule():
     """Admin schedule management page"""
-    conn = sqlite3.connect('school_system.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Get all teachers for dropdown
@@ -638,25 +644,39 @@ def manage_schedule():
                          periods=periods,
                          subjects=subjects)
 
+STUDENT_FIELDS = ('student_id', 'name', 'department', 'section', 'year', 'email', 'mobile', 'password')
+TEACHER_FIELDS = ('teacher_id', 'name', 'subject', 'department', 'section', 'email', 'username', 'password')
+SCHEDULE_FIELDS = ('id', 'class_name', 'section', 'day_of_week', 'period_number', 'subject', 'teacher_id',
+                   'start_time', 'end_time', 'teacher_name')
+
 @app.route('/api/students')
 @login_required
 def get_all_students():
     if session.get('role') != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
     
-    conn = sqlite3.connect('school_system.db')
+    # Keyset pages with ?limit= and ?cursor=, ?fields= to pick keys (see pagination)
+    try:
+        page = parse_page(request.args, STUDENT_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conn = get_db()
     cursor = conn.cursor()
     
     # Get all students with their details
-    cursor.execute('''
+    after, params = page.where(['s.class_name', 's.section', 's.first_name', 's.last_name', 's.id'])
+    cursor.execute(f'''
         SELECT s.student_id, s.first_name, s.last_name, s.class_name, s.section, 
-               s.mobile, u.email, u.username
+               s.mobile, u.email, u.username, s.id
         FROM students s
         LEFT JOIN users u ON s.user_id = u.id
-        ORDER BY s.class_name, s.section, s.first_name, s.last_name
-    ''')
+        {'WHERE ' + after if after else ''}
+        ORDER BY s.class_name, s.section, s.first_name, s.last_name, s.id{page.limit_clause()}
+    ''', params)
     
-    students = cursor.fetchall()
+    students, next_cursor = page.split(cursor.fetchall(), lambda student: [student[3], student[4], student[1],
+                                                                          student[2], student[8]])
     conn.close()
     
     # Format the data for JSON response
@@ -689,7 +709,9 @@ def get_all_students():
             'password': password
         })
     
-    return jsonify(student_list)
+    response = jsonify(page.project(student_list))
+    response.headers.update(page_headers(request, next_cursor))
+    return response
 
 @app.route('/api/teachers')
 @login_required
@@ -697,19 +719,27 @@ def get_all_teachers():
     if session.get('role') != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
     
-    conn = sqlite3.connect('school_system.db')
+    # Keyset pages with ?limit= and ?cursor=, ?fields= to pick keys (see pagination)
+    try:
+        page = parse_page(request.args, TEACHER_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conn = get_db()
     cursor = conn.cursor()
     
     # Get all teachers with their details
-    cursor.execute('''
+    after, params = page.where(['t.first_name', 't.last_name', 't.id'])
+    cursor.execute(f'''
         SELECT t.teacher_id, t.first_name, t.last_name, t.subject, 
-               t.class_name, t.section, u.email, u.username
+               t.class_name, t.section, u.email, u.username, t.id
         FROM teachers t
         LEFT JOIN users u ON t.user_id = u.id
-        ORDER BY t.first_name, t.last_name
-    ''')
+        {'WHERE ' + after if after else ''}
+        ORDER BY t.first_name, t.last_name, t.id{page.limit_clause()}
+    ''', params)
     
-    teachers = cursor.fetchall()
+    teachers, next_cursor = page.split(cursor.fetchall(), lambda teacher: [teacher[1], teacher[2], teacher[8]])
     conn.close()
     
     # Format the data for JSON response
@@ -758,7 +788,9 @@ def get_all_teachers():
             'password': password
         })
     
-    return jsonify(teacher_list)
+    response = jsonify(page.project(teacher_list))
+    response.headers.update(page_headers(request, next_cursor))
+    return response
 
 @app.route('/api/add_student', methods=['POST'])
 @login_required  
@@ -780,7 +812,7 @@ def add_student():
         
         app.logger.info(f'Adding student with data: {data}')
         
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # Check if student_id already exists
@@ -849,7 +881,7 @@ def add_teacher():
         
         app.logger.info(f'Adding teacher with data: {data}')
         
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # Check if teacher_id already exists
@@ -907,7 +939,7 @@ def delete_student(student_id):
         return jsonify({'error': 'Unauthorized'}), 403
     
     try:
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get user_id before deleting student
@@ -943,7 +975,7 @@ def delete_teacher(teacher_id):
         return jsonify({'error': 'Unauthorized'}), 403
     
     try:
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get user_id before deleting teacher
@@ -976,12 +1008,18 @@ def delete_teacher(teacher_id):
 @login_required
 @role_required('admin')
 def get_schedules():
-    """Get all schedules"""
+    """Get all schedules, in keyset pages with ?limit= and ?cursor= (see pagination)"""
     try:
-        conn = sqlite3.connect('school_system.db')
+        try:
+            page = parse_page(request.args, SCHEDULE_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        conn = get_db()
         cursor = conn.cursor()
         
-        cursor.execute('''SELECT t.*, 
+        after, params = page.where(['t.class_name', 't.section', 't.day_of_week', 't.period_number', 't.id'])
+        cursor.execute(f'''SELECT t.*, 
                          CASE 
                              WHEN te.first_name IS NOT NULL AND te.last_name IS NOT NULL 
                                  AND te.first_name != '' AND te.last_name != '' 
@@ -997,10 +1035,13 @@ def get_schedules():
                          FROM timetable t
                          LEFT JOIN teachers te ON t.teacher_id = te.user_id
                          LEFT JOIN users u ON t.teacher_id = u.id
-                         ORDER BY t.class_name, t.section, t.day_of_week, t.period_number''')
+                         {'WHERE ' + after if after else ''}
+                         ORDER BY t.class_name, t.section, t.day_of_week, t.period_number, t.id{page.limit_clause()}''',
+                       params)
         
+        rows, next_cursor = page.split(cursor.fetchall(), lambda row: [row[1], row[2], row[3], row[4], row[0]])
         schedules = []
-        for row in cursor.fetchall():
+        for row in rows:
             schedules.append({
                 'id': row[0],
                 'class_name': row[1],
@@ -1015,7 +1056,9 @@ def get_schedules():
             })
         
         conn.close()
-        return jsonify(schedules)
+        response = jsonify(page.project(schedules))
+        response.headers.update(page_headers(request, next_cursor))
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1028,7 +1071,7 @@ def add_schedule():
     try:
         data = request.get_json()
         
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # Check if schedule already exists for this slot
@@ -1098,7 +1141,7 @@ def handle_csv_bulk_schedule():
         stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
         csv_input = csv.DictReader(stream)
         
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # If replace_existing is true, delete existing schedules for this class
@@ -1205,7 +1248,7 @@ def handle_json_bulk_schedule():
     """Handle JSON bulk schedule creation (existing functionality)"""
     data = request.get_json()
     
-    conn = sqlite3.connect('school_system.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     created_count = 0
@@ -1253,7 +1296,7 @@ def handle_json_bulk_schedule():
 def get_teacher_schedules():
     """Get schedules grouped by teacher"""
     try:
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         cursor.execute('''SELECT t.*, 
@@ -1291,7 +1334,7 @@ def get_teacher_schedules():
 def check_schedule_conflicts():
     """Check for schedule conflicts"""
     try:
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         conflicts = []
@@ -1324,7 +1367,7 @@ def check_schedule_conflicts():
 def generate_schedule_report():
     """Generate a printable schedule report"""
     try:
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         cursor.execute('''SELECT t.*, 
@@ -1424,7 +1467,7 @@ def mark_attendance():
         
         class_name, section, subject, period = parts
         
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get student info
@@ -1479,7 +1522,7 @@ def generate_qr(class_name, section, subject, period):
 @app.route('/api/attendance_stats')
 @login_required
 def attendance_stats():
-    conn = sqlite3.connect('school_system.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Get attendance data for charts
@@ -1508,7 +1551,7 @@ def attendance_stats():
     })
 
 def populate_dummy_data():
-    conn = sqlite3.connect('school_system.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Check if data already exists
@@ -1640,7 +1683,7 @@ def update_student_profile():
         user_id = session['user_id']
         
         # Update user table
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # Update email in users table
@@ -1681,7 +1724,7 @@ def update_teacher_profile():
         user_id = session['user_id']
         
         # Update user table
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # Update email in users table
@@ -1726,7 +1769,7 @@ def upload_profile_picture():
             file.save(filepath)
             
             # Update database with image path
-            conn = sqlite3.connect('school_system.db')
+            conn = get_db()
             cursor = conn.cursor()
             
             # Check if user is student or teacher
@@ -1758,7 +1801,7 @@ def allowed_file(filename):
 def add_sample_timetable():
     """Debug route to add sample timetable data for testing"""
     try:
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # Check if teacher with ID 101 exists
@@ -1815,7 +1858,7 @@ def add_sample_timetable():
 @app.route('/debug/create_test_student')
 def create_test_student():
     try:
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # Create a test user for student
@@ -1876,7 +1919,7 @@ def get_student_schedule():
     try:
         student_id = session.get('user_id')
         
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get student's class and section
@@ -1949,7 +1992,7 @@ def timetable_management():
     """Timetable management page for admin"""
     # Get statistics for the timetable dashboard
     try:
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get counts for statistics
@@ -2003,7 +2046,7 @@ def populate_timetable_sample_data():
         create_timetable_tables()
         insert_sample_time_slots()
         
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # Check if sample data already exists
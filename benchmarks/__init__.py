@@ -0,0 +1,4 @@
+"""
+Performance benchmarks for the EduTrack timetable generation engine.
+Run individual benchmarks as modules, e.g. `python -m benchmarks.bench_conflict_checks`.
+"""
@@ -0,0 +1,118 @@
+"""
+Benchmark: constraint checking with and without the OccupancyIndex.
+
+Greedily places every session of a synthetic 50-group / 200-teacher institute,
+once with the legacy full scan over `assignments` and once with the incremental
+occupancy index, then times a fixed batch of random candidate checks against
+the resulting (near-full) timetable.
+
+    python -m benchmarks.bench_conflict_checks [--groups 50] [--teachers 200]
+"""
+
+import argparse
+import random
+import time
+from dataclasses import replace
+
+from timetable_generator import TimetableGenerator, OccupancyIndex
+from benchmarks.synthetic import build_institute
+
+
+def greedy_place(generator, sessions, data):
+    """Place each session in the first (slot, room) pair that satisfies all constraints"""
+    assignments = {}
+    occupancy = data.get('occupancy')
+    checks = 0
+
+    for session in sessions:
+        domain = generator.get_domain_values(session, data)
+        placed = False
+        for time_slot_id in domain['time_slots']:
+            for classroom_id in domain['classrooms']:
+                session.time_slot_id = time_slot_id
+                session.classroom_id = classroom_id
+                checks += 1
+                if generator.check_constraints(session, assignments, data)[0]:
+                    assignments[session.id] = session
+                    if occupancy is not None:
+                        occupancy.assign(session)
+                    placed = True
+                    break
+            if placed:
+                break
+        if not placed:
+            session.time_slot_id = None
+            session.classroom_id = None
+
+    return assignments, checks
+
+
+def time_probes(generator, probes, assignments, data):
+    """Check a fixed list of (session, slot, room) candidates against the placed timetable"""
+    start = time.perf_counter()
+    for session, time_slot_id, classroom_id in probes:
+        session.time_slot_id = time_slot_id
+        session.classroom_id = classroom_id
+        generator.check_constraints(session, assignments, data)
+    return time.perf_counter() - start
+
+
+def run(num_groups: int, num_teachers: int, num_probes: int, seed: int):
+    generator = TimetableGenerator()
+    results = {}
+
+    for mode in ('scan', 'indexed'):
+        data = build_institute(num_groups=num_groups, num_teachers=num_teachers, seed=seed)
+        if mode == 'indexed':
+            data['occupancy'] = OccupancyIndex(data['time_slots'])
+        sessions = generator.create_class_sessions(data)
+
+        start = time.perf_counter()
+        assignments, checks = greedy_place(generator, sessions, data)
+        place_time = time.perf_counter() - start
+
+        # Probe with detached copies so they are never part of the timetable being checked
+        rng = random.Random(seed)
+        slot_ids = list(data['time_slots'])
+        room_ids = list(data['classrooms'])
+        probes = [(replace(rng.choice(sessions), id=f"probe_{i}"), rng.choice(slot_ids), rng.choice(room_ids))
+                  for i in range(num_probes)]
+
+        probe_time = time_probes(generator, probes, assignments, data)
+
+        results[mode] = {
+            'sessions': len(sessions),
+            'placed': len(assignments),
+            'placement_checks': checks,
+            'placement_seconds': place_time,
+            'probe_seconds': probe_time,
+            'checks_per_second': num_probes / probe_time if probe_time else float('inf')
+        }
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--teachers', type=int, default=200)
+    parser.add_argument('--probes', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = run(args.groups, args.teachers, args.probes, args.seed)
+
+    print(f"Synthetic institute: {args.groups} groups, {args.teachers} teachers, "
+          f"{results['scan']['sessions']} sessions")
+    for mode, r in results.items():
+        print(f"  {mode:8s} placed {r['placed']:5d} in {r['placement_seconds']:.3f}s "
+              f"({r['placement_checks']} checks); "
+              f"{args.probes} probes in {r['probe_seconds']:.3f}s "
+              f"= {r['checks_per_second']:,.0f} checks/s")
+
+    speedup = results['scan']['probe_seconds'] / results['indexed']['probe_seconds']
+    print(f"  constraint check speedup: {speedup:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
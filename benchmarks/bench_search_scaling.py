@@ -0,0 +1,57 @@
+"""
+Benchmark: backtracking search on growing synthetic institutes.
+
+Solves institutes of increasing size, up to 10k+ weekly sessions, with the
+explicit-stack search. The search keeps a single Python frame however deep
+it goes, so it runs with a recursion limit far below the session count.
+
+    python -m benchmarks.bench_search_scaling [--groups 50 150 300 560] [--seed 0]
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from timetable_generator import TimetableGenerator, SearchMonitor
+from benchmarks.synthetic import build_institute
+
+# Lower than any session count below, to prove the search never recurses per session
+RECURSION_LIMIT = 500
+
+
+def run(num_groups: int, seed: int):
+    generator = TimetableGenerator()
+    data = build_institute(num_groups=num_groups, num_teachers=num_groups * 4, seed=seed)
+    sessions = generator.create_class_sessions(data)
+
+    random.seed(seed)
+    monitor = SearchMonitor()
+    assignments = {}
+    start = time.perf_counter()
+    solved = generator.backtrack_search(sessions, assignments, data, monitor)
+    elapsed = time.perf_counter() - start
+
+    print(f"  {num_groups:4d} groups  {len(sessions):6d} sessions  "
+          f"{'solved' if solved else 'FAILED':6s}  {monitor.backtracks:6d} backtracks  "
+          f"{elapsed:8.2f}s  ({len(sessions) / elapsed:,.0f} sessions/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--groups', type=int, nargs='+', default=[50, 150, 300, 560])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    previous_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(RECURSION_LIMIT)
+    try:
+        print(f"Backtracking search scaling (recursion limit {RECURSION_LIMIT})")
+        for num_groups in args.groups:
+            run(num_groups, args.seed)
+    finally:
+        sys.setrecursionlimit(previous_limit)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark: end-to-end timetable generation across institute sizes and seeds.
+
+Every run writes a synthetic institute into a fresh scratch SQLite file and
+generates its timetable through TimetableGenerator.generate_timetable, so
+loading and saving are measured along with the search. Each run reports
+time-to-solution, backtracks, backjumps, learned nogoods, constraint checks
+per second and peak Python memory (tracemalloc, measured in a second
+identical run so tracing doesn't slow the timed one). Results are printed as JSON; pass --baseline with the
+JSON of an earlier commit to print the change in time per run.
+
+    python -m benchmarks.bench_solver [--groups 10 50 150] [--seeds 0 1 2] [--output results.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import database
+from timetable_schema import create_timetable_tables
+from timetable_generator import TimetableGenerator, SearchMonitor, GENERATION_METHODS
+from benchmarks.synthetic import build_institute, write_institute
+
+ACADEMIC_YEAR = '2024-25'
+SEMESTER = 1
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def solve(method: str, seed: int, time_budget: float):
+    """Generate the scratch database's timetable once, counting constraint checks"""
+    generator = TimetableGenerator()
+    check_constraints = generator.check_constraints
+    checks = 0
+
+    def counted_check(session, assignments, data):
+        nonlocal checks
+        checks += 1
+        return check_constraints(session, assignments, data)
+
+    generator.check_constraints = counted_check
+    monitor = SearchMonitor()
+    start = time.perf_counter()
+    result = generator.generate_timetable(ACADEMIC_YEAR, SEMESTER, method=method, seed=seed,
+                                          time_budget=time_budget, monitor=monitor)
+    return result, time.perf_counter() - start, checks, monitor
+
+
+def run(num_groups: int, seed: int, method: str, time_budget: float, unavailable_ratio: float,
+        measure_memory: bool):
+    data = build_institute(num_groups=num_groups, num_teachers=num_groups * 4,
+                           unavailable_ratio=unavailable_ratio, seed=seed)
+    original_path = database.get_database_path()
+    scratch_dir = tempfile.mkdtemp(prefix='timetable-bench-')
+    database.configure(os.path.join(scratch_dir, 'bench.db'))
+    try:
+        # Keep stdout for the JSON report
+        with contextlib.redirect_stdout(sys.stderr):
+            create_timetable_tables()
+        write_institute(data, ACADEMIC_YEAR, SEMESTER)
+
+        result, seconds, checks, monitor = solve(method, seed, time_budget)
+        peak_memory = None
+        if measure_memory:
+            tracemalloc.start()
+            try:
+                solve(method, seed, time_budget)
+                peak_memory = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    finally:
+        database.configure(original_path)
+
+    return {
+        'groups': num_groups,
+        'teachers': len(data['teachers']),
+        'rooms': len(data['classrooms']),
+        'seed': seed,
+        'sessions': len(TimetableGenerator().create_class_sessions(data)),
+        'success': result['success'],
+        'success_rate': result.get('success_rate'),
+        'seconds': round(seconds, 4),
+        'backtracks': monitor.backtracks,
+        'backjumps': monitor.backjumps,
+        'nogoods': monitor.nogoods,
+        'constraint_checks': checks,
+        'checks_per_second': round(checks / seconds) if seconds else None,
+        'peak_memory_mb': round(peak_memory / 2 ** 20, 2) if peak_memory is not None else None,
+        'error': result.get('error')
+    }
+
+
+def compare(runs, baseline_path: str):
+    """Print each run's time against the matching run of an earlier result file"""
+    with open(baseline_path) as f:
+        baseline = {(r['groups'], r['seed']): r for r in json.load(f)['runs']}
+    print(f"Change against {baseline_path}:", file=sys.stderr)
+    for r in runs:
+        before = baseline.get((r['groups'], r['seed']))
+        if before and before['seconds']:
+            print(f"  {r['groups']:4d} groups seed {r['seed']}: {before['seconds']:.3f}s -> "
+                  f"{r['seconds']:.3f}s ({r['seconds'] / before['seconds']:.2f}x)", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--groups', type=int, nargs='+', default=[10, 50, 150])
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2])
+    parser.add_argument('--method', choices=GENERATION_METHODS, default='auto')
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help="seconds per run for the 'anneal' and 'portfolio' methods")
+    parser.add_argument('--unavailable-ratio', type=float, default=0.2,
+                        help='share of teachers unavailable for part of one day')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc run')
+    parser.add_argument('--output', help='write the JSON here instead of stdout')
+    parser.add_argument('--baseline', help='JSON from an earlier run to compare against')
+    args = parser.parse_args()
+
+    runs = []
+    for num_groups in args.groups:
+        for seed in args.seeds:
+            r = run(num_groups, seed, args.method, args.time_budget, args.unavailable_ratio,
+                    not args.no_memory)
+            print(f"  {num_groups:4d} groups seed {seed}: {'solved' if r['success'] else 'FAILED'} "
+                  f"in {r['seconds']:.3f}s", file=sys.stderr)
+            runs.append(r)
+
+    report = {
+        'benchmark': 'solver',
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'method': args.method,
+        'unavailable_ratio': args.unavailable_ratio,
+        'runs': runs
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        compare(runs, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""
+Synthetic institute builder for timetable benchmarks.
+Produces the same `data` dictionary that TimetableGenerator.load_data returns,
+without touching the database. write_institute() stores such an institute in
+a scratch SQLite file so the full load / solve / save path can be measured.
+"""
+
+import json
+import random
+from typing import Dict
+
+from timetable_generator import TimeSlot, Teacher, Subject, Classroom, StudentGroup
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+PERIOD_STARTS = [('09:00', '09:45'), ('09:45', '10:30'), ('10:45', '11:30'), ('11:30', '12:15'),
+                 ('13:30', '14:15'), ('14:15', '15:00'), ('15:15', '16:00'), ('16:00', '16:45')]
+SATURDAY_PERIODS = PERIOD_STARTS[:4]
+MAX_TEACHER_PERIODS = 20
+UNAVAILABLE_PERIODS = ['morning', 'afternoon', 'all_day']
+
+
+def build_time_slots() -> Dict[int, TimeSlot]:
+    """EduTrack academic periods: 8 per weekday plus a Saturday half-day"""
+    slots = {}
+    slot_id = 0
+    for day in DAYS + ['Saturday']:
+        periods = SATURDAY_PERIODS if day == 'Saturday' else PERIOD_STARTS
+        for start, end in periods:
+            slot_id += 1
+            slots[slot_id] = TimeSlot(
+                id=slot_id,
+                day=day,
+                start_time=start,
+                end_time=end,
+                duration=45,
+                slot_code=f"{day.upper()[:3]}_{start.replace(':', '')}_{end.replace(':', '')}",
+                slot_type='academic'
+            )
+    return slots
+
+
+def build_institute(num_groups: int = 50, num_teachers: int = 200, num_rooms: int = None,
+                    subjects_per_group: int = 6, lab_ratio: float = 0.25,
+                    unavailable_ratio: float = 0.0, seed: int = 0) -> Dict:
+    """Build a synthetic institute with the given number of groups and teachers.
+
+    `unavailable_ratio` of the teachers are unavailable for one morning,
+    afternoon or whole day a week.
+    """
+    rng = random.Random(seed)
+    num_rooms = num_rooms or max(10, int(num_groups * 1.3))
+
+    data = {
+        'teachers': {},
+        'subjects': {},
+        'classrooms': {},
+        'groups': {},
+        'time_slots': build_time_slots(),
+        'group_subjects': []
+    }
+
+    # Subjects: a shared pool, roughly a quarter of them needing a computer lab
+    num_subjects = max(subjects_per_group * 2, num_groups * subjects_per_group // 3)
+    for subject_id in range(1, num_subjects + 1):
+        is_lab = rng.random() < lab_ratio
+        data['subjects'][subject_id] = Subject(
+            id=subject_id,
+            code=f"SUB{subject_id:04d}",
+            name=f"Subject {subject_id}",
+            subject_type='practical' if is_lab else 'theory',
+            lecture_hours=3,
+            lab_hours=2 if is_lab else 0,
+            tutorial_hours=0,
+            special_room='computer_lab' if is_lab else None,
+            min_capacity=30
+        )
+
+    # Teachers: each qualified for a handful of subjects
+    subject_ids = list(data['subjects'])
+    for teacher_id in range(1, num_teachers + 1):
+        qualified = rng.sample(subject_ids, k=min(4, len(subject_ids)))
+        data['teachers'][teacher_id] = Teacher(
+            id=teacher_id,
+            code=f"T{teacher_id:04d}",
+            name=f"Teacher {teacher_id}",
+            qualifications=[data['subjects'][s].code for s in qualified],
+            max_hours=MAX_TEACHER_PERIODS,
+            unavailability={}
+        )
+
+    # Rooms: mostly lecture halls with a share of computer labs
+    for room_id in range(1, num_rooms + 1):
+        room_type = 'computer_lab' if room_id % 4 == 0 else 'lecture_hall'
+        data['classrooms'][room_id] = Classroom(
+            id=room_id,
+            number=f"R{room_id:03d}",
+            name=f"Room {room_id}",
+            room_type=room_type,
+            capacity=rng.choice([60, 60, 75, 90]),
+            facilities={}
+        )
+
+    # Student groups and their subject assignments
+    # Each group-subject goes to its least loaded qualified teacher, so teachers
+    # stay within their weekly periods at every institute size
+    teacher_load = {teacher_id: 0 for teacher_id in data['teachers']}
+    qualified_teachers = {}
+    for teacher in data['teachers'].values():
+        for code in teacher.qualifications:
+            qualified_teachers.setdefault(code, []).append(teacher.id)
+
+    for group_id in range(1, num_groups + 1):
+        data['groups'][group_id] = StudentGroup(
+            id=group_id,
+            code=f"G{group_id:03d}",
+            name=f"Group {group_id}",
+            student_count=rng.randint(40, 60),
+            coordinator_id=None
+        )
+        for subject_id in rng.sample(subject_ids, k=subjects_per_group):
+            subject = data['subjects'][subject_id]
+            periods = subject.lecture_hours + subject.lab_hours
+            teachers = qualified_teachers.setdefault(subject.code, [])
+            teacher_id = min(teachers, key=lambda t: (teacher_load[t], rng.random())) if teachers else None
+            if teacher_id is None or teacher_load[teacher_id] + periods > MAX_TEACHER_PERIODS:
+                # Everyone qualified is full: qualify the least loaded teacher overall
+                teacher_id = min(teacher_load, key=lambda t: (teacher_load[t], t))
+                data['teachers'][teacher_id].qualifications.append(subject.code)
+                teachers.append(teacher_id)
+            teacher_load[teacher_id] += periods
+            data['group_subjects'].append({
+                'group_id': group_id,
+                'subject_id': subject_id,
+                'assigned_teacher_id': teacher_id,
+                'weekly_hours': subject.lecture_hours,
+                'session_type': 'lecture'
+            })
+            if subject.lab_hours:
+                data['group_subjects'].append({
+                    'group_id': group_id,
+                    'subject_id': subject_id,
+                    'assigned_teacher_id': teacher_id,
+                    'weekly_hours': subject.lab_hours,
+                    'session_type': 'lab'
+                })
+
+    # Drawn from a separate generator so the rest of the institute doesn't depend on the ratio
+    unavailable_rng = random.Random(seed + 1)
+    for teacher in data['teachers'].values():
+        if unavailable_rng.random() < unavailable_ratio:
+            day = unavailable_rng.choice(DAYS).lower()
+            teacher.unavailability[day] = [unavailable_rng.choice(UNAVAILABLE_PERIODS)]
+
+    return data
+
+
+def write_institute(data: Dict, academic_year: str = '2024-25', semester: int = 1):
+    """Insert a synthetic institute into the configured database, keeping its ids.
+
+    Expects empty timetable tables, e.g. a scratch file set up with
+    database.configure() and create_timetable_tables().
+    """
+    from database import get_connection
+
+    conn = get_connection()
+    try:
+        conn.executemany('''
+            INSERT INTO timetable_teachers
+            (id, teacher_code, first_name, last_name, email, subject_qualifications,
+             weekly_unavailability, max_hours_per_week)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(
+            teacher.id, teacher.code, 'Teacher', str(teacher.id), f"{teacher.code.lower()}@bench.local",
+            json.dumps(teacher.qualifications), json.dumps(teacher.unavailability), teacher.max_hours
+        ) for teacher in data['teachers'].values()])
+
+        conn.executemany('''
+            INSERT INTO timetable_subjects
+            (id, subject_code, subject_name, subject_type, weekly_lecture_hours, weekly_lab_hours,
+             weekly_tutorial_hours, requires_special_room, min_room_capacity)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(
+            subject.id, subject.code, subject.name, subject.subject_type, subject.lecture_hours,
+            subject.lab_hours, subject.tutorial_hours, subject.special_room, subject.min_capacity
+        ) for subject in data['subjects'].values()])
+
+        conn.executemany('''
+            INSERT INTO timetable_classrooms
+            (id, room_number, room_name, room_type, seating_capacity, facilities)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(
+            room.id, room.number, room.name, room.room_type, room.capacity, json.dumps(room.facilities)
+        ) for room in data['classrooms'].values()])
+
+        conn.executemany('''
+            INSERT INTO timetable_student_groups
+            (id, group_code, group_name, academic_year, semester, student_count)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(
+            group.id, group.code, group.name, academic_year, semester, group.student_count
+        ) for group in data['groups'].values()])
+
+        conn.executemany('''
+            INSERT INTO group_subjects
+            (group_id, subject_id, assigned_teacher_id, weekly_hours, session_type)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(
+            gs['group_id'], gs['subject_id'], gs['assigned_teacher_id'], gs['weekly_hours'], gs['session_type']
+        ) for gs in data['group_subjects']])
+
+        conn.executemany('''
+            INSERT INTO time_slots
+            (id, slot_code, day_of_week, start_time, end_time, slot_type, duration_minutes)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(
+            slot.id, slot.slot_code, slot.day, slot.start_time, slot.end_time, slot.slot_type, slot.duration
+        ) for slot in data['time_slots'].values()])
+
+        conn.commit()
+    finally:
+        conn.close()
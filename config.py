@@ -14,6 +14,11 @@ class Config:
     
     # Database Configuration
     DATABASE_URL = os.environ.get('DATABASE_URL') or 'sqlite:///school_system.db'
+    # FK enforcement is opt-in until legacy data is cleaned up: older `timetable` rows store
+    # teachers.user_id in teacher_id, and some attendance/suggested_tasks rows point at deleted
+    # students. Run `python -c "import database; print(database.foreign_key_violations())"`,
+    # fix or delete the reported rows, then set SQLITE_FOREIGN_KEYS=True.
+    SQLITE_FOREIGN_KEYS = os.environ.get('SQLITE_FOREIGN_KEYS', 'False').lower() == 'true'
     
     # Upload Configuration
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'uploads'
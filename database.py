@@ -0,0 +1,240 @@
+"""
+Shared SQLite Access Layer
+Provides a pooled, pre-configured connection to the EduTrack database for the
+Flask app, the timetable API and the timetable generation engine.
+"""
+
+import os
+import sqlite3
+import threading
+from queue import Queue, Empty, Full
+
+from config import Config
+
+# Connection settings applied once when a pooled connection is created
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KB = 20000       # negative cache_size is interpreted as KiB by SQLite
+MMAP_SIZE_BYTES = 268435456  # 256MB
+MAX_IDLE_CONNECTIONS = 8
+
+
+def _database_path_from_url(url: str) -> str:
+    """Turn a 'sqlite:///file.db' URL into a filesystem path"""
+    if url.startswith('sqlite:///'):
+        return url[len('sqlite:///'):]
+    return url
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to the pool instead of closing it"""
+
+    def close(self):
+        pool = getattr(self, '_pool', None)
+        if pool is None:
+            super().close()
+        else:
+            pool.release(self)
+
+    def close_permanently(self):
+        """Really close the underlying SQLite handle"""
+        self._pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """Thread-safe pool of configured SQLite connections for one database file"""
+
+    def __init__(self, database: str, max_idle: int = MAX_IDLE_CONNECTIONS):
+        self.database = database
+        self.max_idle = max_idle
+        self._idle = Queue(maxsize=max_idle)
+        self._wal_lock = threading.Lock()
+        self._wal_enabled = False
+        self._pid = os.getpid()
+
+    def _create_connection(self) -> PooledConnection:
+        conn = sqlite3.connect(
+            self.database,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            factory=PooledConnection
+        )
+
+        # journal_mode is persistent in the database file, only switch it once
+        with self._wal_lock:
+            if not self._wal_enabled:
+                conn.execute('PRAGMA journal_mode = WAL')
+                self._wal_enabled = True
+
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE_BYTES}')
+        conn.execute(f"PRAGMA foreign_keys = {'ON' if Config.SQLITE_FOREIGN_KEYS else 'OFF'}")
+        conn.execute('PRAGMA temp_store = MEMORY')
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        """Take an idle connection from the pool, or open a new one"""
+        try:
+            conn = self._idle.get_nowait()
+        except Empty:
+            conn = self._create_connection()
+
+        conn._pool = self
+        conn._released = False
+        conn.row_factory = None
+        return conn
+
+    def release(self, conn: PooledConnection):
+        """Return a connection to the pool. Uncommitted work is rolled back."""
+        if getattr(conn, '_released', False):
+            return
+        conn._released = True
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            self._idle.put_nowait(conn)
+        except (sqlite3.Error, Full):
+            conn.close_permanently()
+
+    def close_all(self):
+        """Close every idle connection (used on shutdown and after fork)"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                break
+            conn.close_permanently()
+
+
+_pool_lock = threading.Lock()
+_pool = None
+_database_path = _database_path_from_url(Config.DATABASE_URL)
+
+
+def configure(database: str):
+    """Point the shared pool at a different database file (scripts, benchmarks, tests)"""
+    global _pool, _database_path
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = None
+        _database_path = database
+
+
+def get_database_path() -> str:
+    """Path of the database file the shared pool connects to"""
+    return _database_path
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, recreating it in forked worker processes"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._pid != os.getpid():
+            _pool = ConnectionPool(_database_path)
+        return _pool
+
+
+def get_connection(row_factory=None) -> PooledConnection:
+    """Get a pooled connection outside of a Flask request; close() returns it to the pool"""
+    conn = get_pool().acquire()
+    if row_factory is not None:
+        conn.row_factory = row_factory
+    return conn
+
+
+class ContextConnection:
+    """Handle on the connection shared by one Flask app context.
+
+    Every get_db() call gets its own handle with its own row factory, applied
+    to the cursors it creates, so helpers can't change the row format seen by
+    their callers. close() only discards the handle's uncommitted work; the
+    underlying connection goes back to the pool in close_db() on teardown.
+    """
+
+    def __init__(self, conn: PooledConnection, row_factory=None):
+        self._conn = conn
+        self.row_factory = row_factory
+
+    def cursor(self) -> sqlite3.Cursor:
+        cursor = self._conn.cursor()
+        cursor.row_factory = self.row_factory
+        return cursor
+
+    def execute(self, sql: str, parameters=()) -> sqlite3.Cursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters) -> sqlite3.Cursor:
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._conn.__exit__(exc_type, exc_value, traceback)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def get_db(row_factory=None):
+    """Get a handle on the connection bound to the current Flask app context.
+
+    The same pooled connection is reused for the rest of the request and
+    released by close_db() on teardown. Outside an app context a plain pooled
+    connection is returned instead.
+    """
+    from flask import g, has_app_context
+
+    if not has_app_context():
+        return get_connection(row_factory)
+
+    conn = g.get('_database')
+    if conn is None:
+        conn = g._database = get_connection()
+
+    return ContextConnection(conn, row_factory)
+
+
+def close_db(exception=None):
+    """Release the app-context connection back to the pool"""
+    from flask import g
+
+    conn = g.pop('_database', None)
+    if conn is not None:
+        conn.close()
+
+
+def foreign_key_violations() -> dict:
+    """Count rows per (table, parent table) that break a FOREIGN KEY.
+
+    Config.SQLITE_FOREIGN_KEYS should only be switched on once this is empty.
+    """
+    conn = get_connection()
+    try:
+        violations = {}
+        for table, rowid, parent, fk_index in conn.execute('PRAGMA foreign_key_check'):
+            key = f"{table} -> {parent}"
+            violations[key] = violations.get(key, 0) + 1
+        return violations
+    finally:
+        conn.close()
+
+
+def init_app(app):
+    """Register pooled connection handling with a Flask application"""
+    app.teardown_appcontext(close_db)
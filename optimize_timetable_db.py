@@ -30,6 +30,12 @@ def optimize_timetable_database():
         ('idx_teachers_code', 'timetable_teachers', 'teacher_code'),
         ('idx_teachers_active', 'timetable_teachers', 'is_active'),
         
+        # Sort orders of the paginated listings; the rowid the index ends with breaks ties
+        ('idx_teachers_name', 'timetable_teachers', 'first_name, last_name'),
+        ('idx_students_listing', 'students', 'class_name, section, first_name, last_name'),
+        ('idx_staff_listing', 'teachers', 'first_name, last_name'),
+        ('idx_schedules_listing', 'timetable', 'class_name, section, day_of_week, period_number'),
+        
         # Subjects for lookups
         ('idx_subjects_code', 'timetable_subjects', 'subject_code'),
         
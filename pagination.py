@@ -0,0 +1,111 @@
+"""
+Keyset Pagination and Field Projection for JSON Listings
+Listing endpoints page with ?limit=N and continue with the opaque ?cursor=
+of the previous page. A cursor holds the sort key of the last row sent,
+and the next page is the rows sorted after it, (a, b, id) > (?, ?, ?) in
+SQL. An index on the sort columns can seek straight to that key, so a deep
+page costs the same as the first, unlike OFFSET. The cursor of the next page
+comes back in an X-Next-Cursor header and a Link: rel="next" header, so a
+response body stays the plain JSON array it always was. Without limit or
+cursor an endpoint returns every row, as before.
+
+?fields=a,b projects each item onto those keys, so dashboards only download
+the columns they render.
+"""
+
+import base64
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+MAX_PAGE_SIZE = 1000
+
+
+@dataclass
+class Page:
+    """What a request asked for: page size, where to continue, and which fields"""
+    limit: Optional[int] = None
+    after: Optional[List[Any]] = None
+    fields: Optional[List[str]] = None
+
+    def where(self, columns: Sequence[str]) -> Tuple[str, List[Any]]:
+        """SQL condition and parameters for the rows after the cursor, or ('', []) for the first page.
+
+        `columns` are the ORDER BY columns, ending with a unique one.
+        """
+        if self.after is None:
+            return '', []
+        if len(self.after) != len(columns):
+            raise ValueError('Cursor does not belong to this listing')
+        placeholders = ', '.join('?' * len(columns))
+        return f"({', '.join(columns)}) > ({placeholders})", list(self.after)
+
+    def limit_clause(self) -> str:
+        # One row more than asked tells whether there is a next page
+        return f' LIMIT {self.limit + 1}' if self.limit else ''
+
+    def split(self, rows: List, key: Callable[[Any], Sequence[Any]]) -> Tuple[List, Optional[str]]:
+        """The rows of this page and the cursor of the next, None on the last page"""
+        if not self.limit or len(rows) <= self.limit:
+            return rows, None
+        rows = rows[:self.limit]
+        return rows, encode_cursor(key(rows[-1]))
+
+    def project(self, items: List[Dict]) -> List[Dict]:
+        if not self.fields:
+            return items
+        return [{field: item[field] for field in self.fields} for item in items]
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def parse_page(args, fields: Sequence[str]) -> Page:
+    """Read limit, cursor and fields from request arguments; ValueError if any is invalid.
+
+    `fields` are the keys an item of the listing has. A cursor without a limit
+    continues with pages of MAX_PAGE_SIZE.
+    """
+    page = Page()
+    limit = args.get('limit')
+    cursor = args.get('cursor')
+    if limit is not None:
+        try:
+            page.limit = int(limit)
+        except ValueError:
+            raise ValueError('limit must be a number')
+        if not 1 <= page.limit <= MAX_PAGE_SIZE:
+            raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    if cursor:
+        page.after = decode_cursor(cursor)
+        page.limit = page.limit or MAX_PAGE_SIZE
+    if args.get('fields'):
+        page.fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        unknown = [field for field in page.fields if field not in fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Use any of: {', '.join(fields)}")
+    return page
+
+
+def page_headers(request, next_cursor: Optional[str]) -> Dict[str, str]:
+    """X-Next-Cursor and Link headers pointing at the next page, if there is one"""
+    if next_cursor is None:
+        return {}
+    args = request.args.to_dict(flat=False)
+    args['cursor'] = [next_cursor]
+    return {
+        'X-Next-Cursor': next_cursor,
+        'Link': f'<{request.base_url}?{urlencode(args, doseq=True)}>; rel="next"'
+    }
@@ -63,6 +63,25 @@ function setupEventListeners() {
     document.getElementById('entityFilter').addEventListener('change', debouncedLoad);
 }
 
+// Decode the compact view format: dimension tables sent once, entries as parallel columns
+function decodeCompactView(view) {
+    const dimensions = Object.entries(view.dimensions);
+    const ownColumns = Object.keys(view.entries).filter(name => !(name in view.dimensions));
+    const entries = new Array(view.count);
+    
+    for (let i = 0; i < view.count; i++) {
+        const entry = {};
+        ownColumns.forEach(name => { entry[name] = view.entries[name][i]; });
+        dimensions.forEach(([name, table]) => {
+            const row = table.rows[view.entries[name][i]];
+            table.columns.forEach((column, c) => { entry[column] = row[c]; });
+        });
+        entries[i] = entry;
+    }
+    
+    return entries;
+}
+
 // Optimized timetable data loading with caching
 async function loadOptimizedTimetableData() {
     // Prevent excessive API calls
@@ -78,7 +97,7 @@ async function loadOptimizedTimetableData() {
         const entityId = document.getElementById('entityFilter').value;
         
         // Build optimized URL
-        let url = `/timetable/api/view?academic_year=${academicYear}&semester=${semester}`;
+        let url = `/api/timetable/view?academic_year=${academicYear}&semester=${semester}&format=compact`;
         
         if (entityId) {
             const filterParam = currentView === 'group' ? 'group_id' : 
@@ -99,7 +118,7 @@ async function loadOptimizedTimetableData() {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
         
-        timetableData = await response.json();
+        timetableData = decodeCompactView(await response.json());
         
         // Load entities only if not cached
         await loadEntitiesOptimized();
@@ -136,13 +155,13 @@ async function loadEntitiesOptimized() {
         let endpoint;
         switch (currentView) {
             case 'teacher':
-                endpoint = '/timetable/api/teachers';
+                endpoint = '/api/timetable/teachers';
                 break;
             case 'group':
-                endpoint = '/timetable/api/student-groups';
+                endpoint = '/api/timetable/student-groups';
                 break;
             case 'room':
-                endpoint = '/timetable/api/classrooms';
+                endpoint = '/api/timetable/classrooms';
                 break;
         }
         
@@ -280,7 +299,7 @@ async function loadConflictsOptimized() {
         const academicYear = document.getElementById('academicYearFilter').value;
         const semester = document.getElementById('semesterFilter').value;
         
-        const response = await fetch(`/timetable/api/conflicts?academic_year=${academicYear}&semester=${semester}`, {
+        const response = await fetch(`/api/timetable/conflicts?academic_year=${academicYear}&semester=${semester}`, {
             headers: { 'Cache-Control': 'max-age=30' } // 30 second cache for conflicts
         });
         
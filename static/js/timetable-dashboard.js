@@ -9,6 +9,7 @@ let currentEntityId = null;
 let timetableData = [];
 let conflictsData = [];
 let draggedElement = null;
+let moveChecks = new Map(); // Validation results of the dragged entry, by target cell
 
 // Time slots configuration
 const TIME_SLOTS = [
@@ -87,11 +88,22 @@ function setupDragAndDrop(cell) {
 
 function handleDragOver(e) {
     e.preventDefault();
-    e.currentTarget.classList.add('drag-over');
+    const cell = e.currentTarget;
+    cell.classList.add('drag-over');
+    
+    // Validate each cell once per drag while hovering; the server answers from memory
+    if (draggedElement && !moveChecks.has(cell)) {
+        moveChecks.set(cell, checkMove(draggedElement.dataset.entryId, cell));
+        moveChecks.get(cell).then(result => {
+            const invalid = result.conflicts && result.conflicts.length > 0;
+            cell.classList.toggle('conflict-warning', invalid);
+            cell.title = invalid ? result.conflicts.map(conflict => conflict.description).join('\n') : '';
+        }).catch(() => {});
+    }
 }
 
 function handleDragLeave(e) {
-    e.currentTarget.classList.remove('drag-over');
+    e.currentTarget.classList.remove('drag-over', 'conflict-warning');
 }
 
 async function handleDrop(e) {
@@ -100,46 +112,57 @@ async function handleDrop(e) {
     
     if (!draggedElement) return;
     
-    const sourceCell = draggedElement.parentElement;
+    // dragend can fire while the move is checked, so hold on to the card
+    const card = draggedElement;
     const targetCell = e.currentTarget;
     
     // Get entry data
-    const entryId = draggedElement.dataset.entryId;
+    const entryId = card.dataset.entryId;
     const newTimeSlotId = getTimeSlotIdFromCell(targetCell);
-    const newDay = targetCell.dataset.day;
     
     // Validate the move
     const isValid = await validateMove(entryId, newTimeSlotId, targetCell);
     
     if (isValid) {
         // Move the element
-        targetCell.appendChild(draggedElement);
+        targetCell.appendChild(card);
         
         // Update database
-        await updateClassSchedule(entryId, newTimeSlotId);
-        
-        showAlert('Class rescheduled successfully!', 'success');
+        if (await updateClassSchedule(entryId, targetCell)) {
+            showAlert('Class rescheduled successfully!', 'success');
+        }
     } else {
         showAlert('Cannot reschedule: Conflict detected!', 'danger');
     }
     
-    draggedElement.classList.remove('dragging');
+    card.classList.remove('dragging');
     draggedElement = null;
+    moveChecks = new Map();
+}
+
+// Ask the server what moving an entry to a cell would conflict with
+async function checkMove(entryId, targetCell) {
+    const response = await fetch('/api/timetable/validate-move', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            entry_id: entryId,
+            day_of_week: targetCell.dataset.day,
+            start_time: targetCell.dataset.start
+        })
+    });
+    
+    if (!response.ok) {
+        throw new Error(`Validation failed with status ${response.status}`);
+    }
+    return response.json();
 }
 
 // Validate if a move is allowed (check constraints)
 async function validateMove(entryId, newTimeSlotId, targetCell) {
     try {
-        const response = await fetch('/api/timetable/validate-move', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                entry_id: entryId,
-                new_time_slot_id: newTimeSlotId
-            })
-        });
-        
-        const result = await response.json();
+        // Reuse the check made while hovering over the cell
+        const result = await (moveChecks.get(targetCell) || checkMove(entryId, targetCell));
         
         if (result.conflicts && result.conflicts.length > 0) {
             // Show conflicts in the cell
@@ -155,28 +178,34 @@ async function validateMove(entryId, newTimeSlotId, targetCell) {
     }
 }
 
-// Update class schedule in database
-async function updateClassSchedule(entryId, newTimeSlotId) {
+// Update class schedule in database; true if it was saved
+async function updateClassSchedule(entryId, targetCell) {
+    let saved = false;
     try {
         const response = await fetch(`/api/timetable/entries/${entryId}`, {
             method: 'PUT',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
-                time_slot_id: newTimeSlotId
+                day_of_week: targetCell.dataset.day,
+                start_time: targetCell.dataset.start
             })
         });
         
         if (!response.ok) {
-            throw new Error('Failed to update schedule');
+            const result = await response.json();
+            throw new Error(result.conflicts ? result.conflicts.map(conflict => conflict.description).join('; ')
+                                             : result.error || 'Failed to update schedule');
         }
-        
-        // Reload timetable data to reflect changes
-        await loadTimetableData();
+        saved = true;
         
     } catch (error) {
         console.error('Update error:', error);
-        showAlert('Failed to update schedule', 'danger');
+        showAlert(`Failed to update schedule: ${error.message}`, 'danger');
     }
+    
+    // Reload timetable data to reflect changes, or put the card back
+    await loadTimetableData();
+    return saved;
 }
 
 // Get time slot ID from cell data
@@ -184,6 +213,26 @@ function getTimeSlotIdFromCell(cell) {
     return parseInt(cell.dataset.timeSlot);
 }
 
+// Fetch every page of a paginated listing, following its X-Next-Cursor header
+async function fetchAllPages(url, pageSize = 1000) {
+    const items = [];
+    const separator = url.includes('?') ? '&' : '?';
+    let pageUrl = `${url}${separator}limit=${pageSize}`;
+    
+    while (pageUrl) {
+        const response = await fetch(pageUrl);
+        if (!response.ok) {
+            throw new Error(`Request failed with status ${response.status}`);
+        }
+        items.push(...await response.json());
+        
+        const cursor = response.headers.get('X-Next-Cursor');
+        pageUrl = cursor ? `${url}${separator}limit=${pageSize}&cursor=${encodeURIComponent(cursor)}` : null;
+    }
+    
+    return items;
+}
+
 // Load timetable data from API
 async function loadTimetableData() {
     const loading = showLoading('Loading timetable data...');
@@ -200,8 +249,7 @@ async function loadTimetableData() {
             url += `&${filterParam}=${currentEntityId}`;
         }
         
-        const response = await fetch(url);
-        timetableData = await response.json();
+        timetableData = await fetchAllPages(url);
         
         // Also load entities for the filter dropdown
         await loadEntities();
@@ -232,7 +280,7 @@ async function loadEntities() {
                 labelField = 'group_name';
                 break;
             case 'teacher':
-                endpoint = '/api/timetable/teachers';
+                endpoint = '/api/timetable/teachers?fields=id,first_name,last_name';
                 labelField = 'first_name';
                 break;
             case 'room':
@@ -241,8 +289,7 @@ async function loadEntities() {
                 break;
         }
         
-        const response = await fetch(endpoint);
-        const entities = await response.json();
+        const entities = currentView === 'teacher' ? await fetchAllPages(endpoint) : await (await fetch(endpoint)).json();
         
         const select = document.getElementById('entityFilter');
         select.innerHTML = `<option value="">All ${currentView}s...</option>`;
@@ -275,8 +322,8 @@ function renderTimetable() {
     
     // Render each class
     Object.entries(groupedData).forEach(([key, classes]) => {
-        const [day, timeSlotId] = key.split('_');
-        const cell = document.querySelector(`[data-day="${day}"][data-time-slot="${timeSlotId}"]`);
+        const [day, start] = key.split('_');
+        const cell = document.querySelector(`[data-day="${day}"][data-start="${start}"]`);
         
         if (cell) {
             classes.forEach((classData, index) => {
@@ -294,7 +341,8 @@ function groupTimetableData(data) {
     const grouped = {};
     
     data.forEach(entry => {
-        const key = `${entry.day_of_week}_${entry.time_slot_id}`;
+        // Grid cells are found by start time: their period numbers are not time slot ids
+        const key = `${entry.day_of_week}_${entry.start_time.padStart(5, '0').slice(0, 5)}`;
         if (!grouped[key]) {
             grouped[key] = [];
         }
@@ -335,6 +383,7 @@ function createClassCard(classData, index = 0) {
 
 function handleDragStart(e) {
     draggedElement = e.target;
+    moveChecks = new Map();
     e.target.classList.add('dragging');
     e.dataTransfer.effectAllowed = 'move';
 }
@@ -44,56 +44,84 @@ function hideLoading(modalInstance) {
     }
 }
 
+// Initial page load: every table and the statistics from one request
+async function loadAllData() {
+    try {
+        const response = await fetch(`${API_BASE}/bootstrap`);
+        const data = await response.json();
+        
+        renderTeachers(data.teachers);
+        renderSubjects(data.subjects);
+        renderClassrooms(data.classrooms);
+        renderStudentGroups(data.student_groups);
+        renderStats(data.stats);
+        
+    } catch (error) {
+        console.error('Error loading timetable data:', error);
+        showAlert('Error loading timetable data', 'danger');
+    }
+}
+
+function renderStats(stats) {
+    ['teachers', 'subjects', 'classrooms', 'student_groups'].forEach(key => {
+        const element = document.getElementById(`stat-${key}`);
+        if (element) {
+            element.textContent = stats[key];
+        }
+    });
+}
+
 // Teachers Management
 async function loadTeachers() {
     try {
         const response = await fetch(`${API_BASE}/teachers`);
-        const teachers = await response.json();
-        
-        const tbody = document.getElementById('teachersTableBody');
-        tbody.innerHTML = '';
-        
-        teachers.forEach(teacher => {
-            const unavailability = JSON.parse(teacher.weekly_unavailability || '{}');
-            const unavailableDays = Object.keys(unavailability).join(', ') || 'None';
-            
-            const row = `
-                <tr>
-                    <td><strong>${teacher.teacher_code}</strong></td>
-                    <td>${teacher.first_name} ${teacher.last_name}</td>
-                    <td>
-                        <small class="text-muted">
-                            ${JSON.parse(teacher.subject_qualifications || '[]').join(', ')}
-                        </small>
-                    </td>
-                    <td>${teacher.max_hours_per_week} hrs</td>
-                    <td>
-                        <small class="text-warning">
-                            ${unavailableDays}
-                        </small>
-                    </td>
-                    <td>
-                        <button class="btn btn-sm btn-outline-primary me-1" onclick="editTeacher(${teacher.id})">
-                            <i class="fas fa-edit"></i>
-                        </button>
-                        <button class="btn btn-sm btn-outline-danger" onclick="deleteTeacher(${teacher.id})">
-                            <i class="fas fa-trash"></i>
-                        </button>
-                    </td>
-                </tr>
-            `;
-            tbody.innerHTML += row;
-        });
-        
-        // Update coordinator dropdown in student group modal
-        updateTeacherDropdown(teachers);
-        
+        renderTeachers(await response.json());
     } catch (error) {
         console.error('Error loading teachers:', error);
         showAlert('Error loading teachers data', 'danger');
     }
 }
 
+function renderTeachers(teachers) {
+    const tbody = document.getElementById('teachersTableBody');
+    tbody.innerHTML = '';
+    
+    teachers.forEach(teacher => {
+        const unavailability = JSON.parse(teacher.weekly_unavailability || '{}');
+        const unavailableDays = Object.keys(unavailability).join(', ') || 'None';
+        
+        const row = `
+            <tr>
+                <td><strong>${teacher.teacher_code}</strong></td>
+                <td>${teacher.first_name} ${teacher.last_name}</td>
+                <td>
+                    <small class="text-muted">
+                        ${JSON.parse(teacher.subject_qualifications || '[]').join(', ')}
+                    </small>
+                </td>
+                <td>${teacher.max_hours_per_week} hrs</td>
+                <td>
+                    <small class="text-warning">
+                        ${unavailableDays}
+                    </small>
+                </td>
+                <td>
+                    <button class="btn btn-sm btn-outline-primary me-1" onclick="editTeacher(${teacher.id})">
+                        <i class="fas fa-edit"></i>
+                    </button>
+                    <button class="btn btn-sm btn-outline-danger" onclick="deleteTeacher(${teacher.id})">
+                        <i class="fas fa-trash"></i>
+                    </button>
+                </td>
+            </tr>
+        `;
+        tbody.innerHTML += row;
+    });
+    
+    // Update coordinator dropdown in student group modal
+    updateTeacherDropdown(teachers);
+}
+
 async function submitTeacher(event) {
     event.preventDefault();
     const loading = showLoading('Saving Teacher', 'Adding teacher to the system...');
@@ -160,56 +188,57 @@ async function submitTeacher(event) {
 async function loadSubjects() {
     try {
         const response = await fetch(`${API_BASE}/subjects`);
-        const subjects = await response.json();
-        
-        const tbody = document.getElementById('subjectsTableBody');
-        tbody.innerHTML = '';
-        
-        subjects.forEach(subject => {
-            const totalHours = subject.weekly_lecture_hours + subject.weekly_lab_hours + subject.weekly_tutorial_hours;
-            const roomReq = subject.requires_special_room || 'Any';
-            
-            const row = `
-                <tr>
-                    <td><strong>${subject.subject_code}</strong></td>
-                    <td>${subject.subject_name}</td>
-                    <td>
-                        <span class="badge bg-secondary">${subject.subject_type}</span>
-                    </td>
-                    <td>
-                        <small>
-                            L:${subject.weekly_lecture_hours} 
-                            Lab:${subject.weekly_lab_hours} 
-                            T:${subject.weekly_tutorial_hours}
-                            <br><strong>Total: ${totalHours}hrs</strong>
-                        </small>
-                    </td>
-                    <td>
-                        <small class="text-info">${roomReq}</small>
-                        <br><small class="text-muted">Min: ${subject.min_room_capacity}</small>
-                    </td>
-                    <td>
-                        <button class="btn btn-sm btn-outline-success me-1" onclick="editSubject(${subject.id})">
-                            <i class="fas fa-edit"></i>
-                        </button>
-                        <button class="btn btn-sm btn-outline-danger" onclick="deleteSubject(${subject.id})">
-                            <i class="fas fa-trash"></i>
-                        </button>
-                    </td>
-                </tr>
-            `;
-            tbody.innerHTML += row;
-        });
-        
-        // Update subject checkboxes in teacher modal
-        updateSubjectCheckboxes(subjects);
-        
+        renderSubjects(await response.json());
     } catch (error) {
         console.error('Error loading subjects:', error);
         showAlert('Error loading subjects data', 'danger');
     }
 }
 
+function renderSubjects(subjects) {
+    const tbody = document.getElementById('subjectsTableBody');
+    tbody.innerHTML = '';
+    
+    subjects.forEach(subject => {
+        const totalHours = subject.weekly_lecture_hours + subject.weekly_lab_hours + subject.weekly_tutorial_hours;
+        const roomReq = subject.requires_special_room || 'Any';
+        
+        const row = `
+            <tr>
+                <td><strong>${subject.subject_code}</strong></td>
+                <td>${subject.subject_name}</td>
+                <td>
+                    <span class="badge bg-secondary">${subject.subject_type}</span>
+                </td>
+                <td>
+                    <small>
+                        L:${subject.weekly_lecture_hours} 
+                        Lab:${subject.weekly_lab_hours} 
+                        T:${subject.weekly_tutorial_hours}
+                        <br><strong>Total: ${totalHours}hrs</strong>
+                    </small>
+                </td>
+                <td>
+                    <small class="text-info">${roomReq}</small>
+                    <br><small class="text-muted">Min: ${subject.min_room_capacity}</small>
+                </td>
+                <td>
+                    <button class="btn btn-sm btn-outline-success me-1" onclick="editSubject(${subject.id})">
+                        <i class="fas fa-edit"></i>
+                    </button>
+                    <button class="btn btn-sm btn-outline-danger" onclick="deleteSubject(${subject.id})">
+                        <i class="fas fa-trash"></i>
+                    </button>
+                </td>
+            </tr>
+        `;
+        tbody.innerHTML += row;
+    });
+    
+    // Update subject checkboxes in teacher modal
+    updateSubjectCheckboxes(subjects);
+}
+
 async function submitSubject(event) {
     event.preventDefault();
     const loading = showLoading('Saving Subject', 'Adding subject to the curriculum...');
@@ -260,48 +289,49 @@ async function submitSubject(event) {
 async function loadClassrooms() {
     try {
         const response = await fetch(`${API_BASE}/classrooms`);
-        const classrooms = await response.json();
-        
-        const tbody = document.getElementById('classroomsTableBody');
-        tbody.innerHTML = '';
-        
-        classrooms.forEach(classroom => {
-            const facilities = JSON.parse(classroom.facilities || '{}');
-            const facilityList = Object.keys(facilities).filter(key => facilities[key]).join(', ') || 'Basic';
-            
-            const row = `
-                <tr>
-                    <td><strong>${classroom.room_number}</strong></td>
-                    <td>${classroom.room_name}</td>
-                    <td>
-                        <span class="badge bg-warning text-dark">${classroom.room_type.replace('_', ' ')}</span>
-                    </td>
-                    <td>
-                        <strong>${classroom.seating_capacity}</strong> seats
-                        <br><small class="text-muted">Floor ${classroom.floor_number || 'N/A'}</small>
-                    </td>
-                    <td>
-                        <small class="text-info">${facilityList}</small>
-                    </td>
-                    <td>
-                        <button class="btn btn-sm btn-outline-warning me-1" onclick="editClassroom(${classroom.id})">
-                            <i class="fas fa-edit"></i>
-                        </button>
-                        <button class="btn btn-sm btn-outline-danger" onclick="deleteClassroom(${classroom.id})">
-                            <i class="fas fa-trash"></i>
-                        </button>
-                    </td>
-                </tr>
-            `;
-            tbody.innerHTML += row;
-        });
-        
+        renderClassrooms(await response.json());
     } catch (error) {
         console.error('Error loading classrooms:', error);
         showAlert('Error loading classrooms data', 'danger');
     }
 }
 
+function renderClassrooms(classrooms) {
+    const tbody = document.getElementById('classroomsTableBody');
+    tbody.innerHTML = '';
+    
+    classrooms.forEach(classroom => {
+        const facilities = JSON.parse(classroom.facilities || '{}');
+        const facilityList = Object.keys(facilities).filter(key => facilities[key]).join(', ') || 'Basic';
+        
+        const row = `
+            <tr>
+                <td><strong>${classroom.room_number}</strong></td>
+                <td>${classroom.room_name}</td>
+                <td>
+                    <span class="badge bg-warning text-dark">${classroom.room_type.replace('_', ' ')}</span>
+                </td>
+                <td>
+                    <strong>${classroom.seating_capacity}</strong> seats
+                    <br><small class="text-muted">Floor ${classroom.floor_number || 'N/A'}</small>
+                </td>
+                <td>
+                    <small class="text-info">${facilityList}</small>
+                </td>
+                <td>
+                    <button class="btn btn-sm btn-outline-warning me-1" onclick="editClassroom(${classroom.id})">
+                        <i class="fas fa-edit"></i>
+                    </button>
+                    <button class="btn btn-sm btn-outline-danger" onclick="deleteClassroom(${classroom.id})">
+                        <i class="fas fa-trash"></i>
+                    </button>
+                </td>
+            </tr>
+        `;
+        tbody.innerHTML += row;
+    });
+}
+
 async function submitClassroom(event) {
     event.preventDefault();
     const loading = showLoading('Saving Classroom', 'Adding classroom to the system...');
@@ -356,50 +386,51 @@ async function submitClassroom(event) {
 async function loadStudentGroups() {
     try {
         const response = await fetch(`${API_BASE}/student-groups`);
-        const groups = await response.json();
-        
-        const tbody = document.getElementById('groupsTableBody');
-        tbody.innerHTML = '';
-        
-        groups.forEach(group => {
-            const coordinator = group.coordinator_name || 'Not assigned';
-            
-            const row = `
-                <tr>
-                    <td><strong>${group.group_code}</strong></td>
-                    <td>${group.group_name}</td>
-                    <td>
-                        ${group.academic_year}
-                        <br><small class="text-muted">Semester ${group.semester}</small>
-                    </td>
-                    <td>
-                        <strong>${group.student_count}</strong> students
-                    </td>
-                    <td>
-                        <small class="text-success">${coordinator}</small>
-                    </td>
-                    <td>
-                        <button class="btn btn-sm btn-outline-info me-1" onclick="manageGroupSubjects(${group.id})">
-                            <i class="fas fa-book"></i>
-                        </button>
-                        <button class="btn btn-sm btn-outline-primary me-1" onclick="editGroup(${group.id})">
-                            <i class="fas fa-edit"></i>
-                        </button>
-                        <button class="btn btn-sm btn-outline-danger" onclick="deleteGroup(${group.id})">
-                            <i class="fas fa-trash"></i>
-                        </button>
-                    </td>
-                </tr>
-            `;
-            tbody.innerHTML += row;
-        });
-        
+        renderStudentGroups(await response.json());
     } catch (error) {
         console.error('Error loading student groups:', error);
         showAlert('Error loading student groups data', 'danger');
     }
 }
 
+function renderStudentGroups(groups) {
+    const tbody = document.getElementById('groupsTableBody');
+    tbody.innerHTML = '';
+    
+    groups.forEach(group => {
+        const coordinator = group.coordinator_name || 'Not assigned';
+        
+        const row = `
+            <tr>
+                <td><strong>${group.group_code}</strong></td>
+                <td>${group.group_name}</td>
+                <td>
+                    ${group.academic_year}
+                    <br><small class="text-muted">Semester ${group.semester}</small>
+                </td>
+                <td>
+                    <strong>${group.student_count}</strong> students
+                </td>
+                <td>
+                    <small class="text-success">${coordinator}</small>
+                </td>
+                <td>
+                    <button class="btn btn-sm btn-outline-info me-1" onclick="manageGroupSubjects(${group.id})">
+                        <i class="fas fa-book"></i>
+                    </button>
+                    <button class="btn btn-sm btn-outline-primary me-1" onclick="editGroup(${group.id})">
+                        <i class="fas fa-edit"></i>
+                    </button>
+                    <button class="btn btn-sm btn-outline-danger" onclick="deleteGroup(${group.id})">
+                        <i class="fas fa-trash"></i>
+                    </button>
+                </td>
+            </tr>
+        `;
+        tbody.innerHTML += row;
+    });
+}
+
 async function submitGroup(event) {
     event.preventDefault();
     const loading = showLoading('Saving Student Group', 'Creating student group...');
@@ -479,8 +510,10 @@ function updateTeacherDropdown(teachers) {
 }
 
 // Timetable Generation
+const GENERATION_POLL_INTERVAL = 2000;
+
 async function generateTimetable() {
-    const loading = showLoading('Generating Timetable', 'This may take a few minutes. Please do not close this page.');
+    const loading = showLoading('Generating Timetable', 'Starting generation...');
     
     try {
         const response = await fetch(`${API_BASE}/generate`, {
@@ -497,15 +530,24 @@ async function generateTimetable() {
         
         const result = await response.json();
         
-        if (response.ok) {
-            showAlert(`Timetable generated successfully! ${result.total_classes} classes scheduled with ${result.success_rate}% success rate.`, 'success');
+        if (!response.ok) {
+            showAlert(result.error || 'Error generating timetable', 'danger');
+            return;
+        }
+        
+        const generation = await waitForGeneration(result.generation_id);
+        
+        if (generation.status === 'completed') {
+            showAlert(`Timetable generated successfully! ${generation.total_classes_scheduled} classes scheduled with ${generation.success_rate}% success rate.`, 'success');
             
             // Redirect to timetable view after 2 seconds
             setTimeout(() => {
                 window.location.href = '/admin/timetable/view';
             }, 2000);
+        } else if (generation.status === 'cancelled') {
+            showAlert('Timetable generation was cancelled.', 'warning');
         } else {
-            showAlert(result.error || 'Error generating timetable', 'danger');
+            showAlert(generation.error || 'Error generating timetable', 'danger');
         }
         
     } catch (error) {
@@ -516,6 +558,32 @@ async function generateTimetable() {
     }
 }
 
+// Poll a background generation until it finishes, showing its progress
+async function waitForGeneration(generationId) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, GENERATION_POLL_INTERVAL));
+        
+        const response = await fetch(`${API_BASE}/generations/${generationId}`);
+        const generation = await response.json();
+        
+        if (!response.ok || generation.status !== 'in_progress') {
+            return generation;
+        }
+        
+        const progress = generation.progress;
+        if (progress) {
+            document.getElementById('loadingDescription').textContent =
+                `${progress.sessions_placed} sessions placed, ${progress.backtracks} backtracks, ${Math.round(progress.elapsed)}s elapsed`;
+        }
+    }
+}
+
+async function cancelGeneration(generationId) {
+    const response = await fetch(`${API_BASE}/generations/${generationId}/cancel`, { method: 'POST' });
+    const result = await response.json();
+    showAlert(result.message || result.error, response.ok ? 'info' : 'warning');
+}
+
 // Edit/Delete functions (placeholders for now)
 function editTeacher(id) {
     // TODO: Implement teacher editing
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for batch generation of several terms that share teachers and classrooms
+"""
+
+import copy
+from collections import Counter
+
+import database
+from timetable_generator import TimetableGenerator
+from timetable_batch import BatchSolver
+from benchmarks.synthetic import build_institute
+from test_timetable_generator import make_institute, assert_conflict_free
+from test_timetable_jobs import scratch_database
+
+
+def test_components_are_solved_apart_and_merged_without_clashes():
+    print("🧩 Testing the batch solver splits on shared teachers and merges room clashes...")
+    generator, data, sessions = make_institute(num_groups=8, num_teachers=80, seed=1)
+    components = BatchSolver.components(sessions)
+    assert len(components) > 1
+    teachers = [{session.teacher_id for session in component} for component in components]
+    groups = [{session.group_id for session in component} for component in components]
+    for first in range(len(components)):
+        for second in range(first + 1, len(components)):
+            assert not teachers[first] & teachers[second]
+            assert not groups[first] & groups[second]
+
+    assignments = {}
+    stats = BatchSolver(data, workers=2, seed=1).solve(sessions, assignments)
+
+    assert stats['success'] and stats['components'] == len(components)
+    assert len(assignments) == len(sessions)
+    assert_conflict_free(assignments, data)
+    print(f"   ✅ {stats['components']} components, {stats['coupled_components']} after coupling, "
+          f"{len(stats['rounds'])} rounds")
+
+
+def test_batch_generation_shares_teachers_across_terms():
+    print("📚 Testing batch generation of two terms sharing teachers...")
+    data = build_institute(num_groups=6, num_teachers=24, seed=1)
+    group_ids = sorted(data['groups'])
+    terms = {('2024-25', 1): set(group_ids[:3]), ('2024-25', 3): set(group_ids[3:])}
+
+    def load_data(self, academic_year, semester):
+        term_data = copy.deepcopy(data)
+        term_data['group_subjects'] = [gs for gs in term_data['group_subjects']
+                                       if gs['group_id'] in terms[(academic_year, semester)]]
+        return term_data
+
+    with scratch_database():
+        TimetableGenerator.load_data = load_data
+        result = TimetableGenerator().generate_batch(list(terms), workers=2, seed=0)
+        conn = database.get_connection()
+        try:
+            entries = conn.execute('''
+                SELECT semester, group_id, teacher_id, classroom_id, time_slot_id
+                FROM timetable_entries WHERE status = 'active'
+            ''').fetchall()
+        finally:
+            conn.close()
+
+    assert result['success'], result
+    assert [(term['academic_year'], term['semester']) for term in result['terms']] == list(terms)
+    for semester, group_id, _, _, _ in entries:
+        assert group_id in terms[('2024-25', semester)]
+    # No teacher or room is booked twice in a slot, across both terms
+    for column in (2, 3):
+        bookings = Counter((entry[column], entry[4]) for entry in entries)
+        assert max(bookings.values()) == 1
+    assert sum(term['total_classes'] for term in result['terms']) == \
+        len(TimetableGenerator().create_class_sessions(data))
+    print(f"   ✅ {len(entries)} entries over {len(result['terms'])} terms, "
+          f"{result['components']} components")
+
+
+if __name__ == '__main__':
+    test_components_are_solved_apart_and_merged_without_clashes()
+    test_batch_generation_shares_teachers_across_terms()
+    print("\n🎉 All batch generation tests passed!")
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Tests for the versioned timetable view cache and paged listings (uses a scratch SQLite database)
+"""
+
+from flask import Flask
+
+import database
+from timetable_cache import response_cache
+from timetable_generator import TimetableGenerator
+from timetable_routes import timetable_bp
+from benchmarks.synthetic import build_institute, write_institute
+from test_timetable_jobs import scratch_database
+
+VIEW_INDEXES = {
+    'idx_timetable_entries_academic': 'academic_year, semester, status',
+    'idx_timetable_entries_group': 'group_id, status',
+    'idx_timetable_entries_teacher': 'teacher_id, status',
+    'idx_timetable_entries_classroom': 'classroom_id, status',
+}
+
+
+def prepare_views():
+    """Create the indexes the views use and give every teacher a login"""
+    conn = database.get_connection()
+    try:
+        for name, columns in VIEW_INDEXES.items():
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON timetable_entries ({columns})')
+        # The teachers listing leaves out teachers without one
+        conn.execute('UPDATE timetable_teachers SET user_id = id')
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def admin_client():
+    """A test client of the timetable API logged in as an admin"""
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(timetable_bp)
+    database.init_app(app)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+        session['role'] = 'admin'
+    return client
+
+
+def test_view_is_cached_per_data_version():
+    print("🏷️  Testing ETags and invalidation of the timetable view...")
+    institute = dict(num_groups=4, num_teachers=16, seed=1)
+    with scratch_database(**institute):
+        data = build_institute(**institute)
+        write_institute(data)
+        prepare_views()
+        assert TimetableGenerator().generate_timetable('2024-25', 1, seed=0)['success']
+        response_cache.clear()
+        client = admin_client()
+        url = '/api/timetable/view?academic_year=2024-25&semester=1'
+
+        first = client.get(url)
+        etag = first.headers['ETag']
+        assert first.status_code == 200 and first.get_json()
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+        again = client.get(url)
+        assert again.headers['ETag'] == etag and again.data == first.data
+        assert (response_cache.hits, response_cache.misses) == (1, 1)
+
+        # A student group of another term leaves this one's view valid
+        created = client.post('/api/timetable/student-groups', json={
+            'group_code': 'S2-NEW', 'group_name': 'New group', 'academic_year': '2024-25',
+            'semester': 2, 'student_count': 30})
+        assert created.status_code == 201
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+        # A teacher is shown by every term
+        teacher = next(iter(data['teachers'].values()))
+        first_name, last_name = teacher.name.split(' ', 1)
+        updated = client.put(f'/api/timetable/teachers/{teacher.id}', json={
+            'first_name': first_name, 'last_name': 'Renamed', 'email': f'{teacher.code}@example.com'})
+        assert updated.status_code == 200
+        renamed = client.get(url, headers={'If-None-Match': etag})
+        assert renamed.status_code == 200 and renamed.headers['ETag'] != etag
+        assert any(entry['teacher_name'] == f'{first_name} Renamed' for entry in renamed.get_json())
+
+        # Saving a timetable invalidates the view only if an entry changed
+        etag = renamed.headers['ETag']
+        result = TimetableGenerator().generate_timetable('2024-25', 1, seed=1)
+        assert result['success']
+        regenerated = client.get(url, headers={'If-None-Match': etag})
+        assert (regenerated.status_code == 200) == bool(result['inserted'] or result['deleted'])
+
+    print(f"   ✅ {len(first.get_json())} entries served, "
+          f"{result['inserted']} inserted and {result['deleted']} deleted by regeneration")
+
+
+def test_listings_page_by_cursor():
+    print("📄 Testing keyset pages and field projection of listings...")
+    institute = dict(num_groups=4, num_teachers=16, seed=1)
+    with scratch_database(**institute):
+        write_institute(build_institute(**institute))
+        prepare_views()
+        assert TimetableGenerator().generate_timetable('2024-25', 1, seed=0)['success']
+        response_cache.clear()
+        client = admin_client()
+
+        for url in ('/api/timetable/view?academic_year=2024-25&semester=1', '/api/timetable/teachers'):
+            everything = client.get(url).get_json()
+            pages, page_url = [], f'{url}&limit=7' if '?' in url else f'{url}?limit=7'
+            while page_url:
+                response = client.get(page_url)
+                assert response.status_code == 200 and len(response.get_json()) <= 7
+                pages.extend(response.get_json())
+                cursor = response.headers.get('X-Next-Cursor')
+                page_url = response.headers['Link'][1:-len('>; rel="next"')] if cursor else None
+            assert pages == everything and len(pages) > 7
+
+        projected = client.get('/api/timetable/teachers?fields=id,first_name').get_json()
+        assert projected and all(set(teacher) == {'id', 'first_name'} for teacher in projected)
+
+        for bad in ('limit=0', 'limit=x', 'cursor=not-a-cursor', 'fields=password'):
+            assert client.get(f'/api/timetable/teachers?{bad}').status_code == 400, bad
+
+    print(f"   ✅ {len(pages)} teachers and their view entries paged in sevens")
+
+
+def decode_compact(view):
+    """The entry objects of a compact view, as the dashboard decodes them"""
+    entries = []
+    for i in range(view['count']):
+        entry = {name: column[i] for name, column in view['entries'].items() if name not in view['dimensions']}
+        for name, table in view['dimensions'].items():
+            entry.update(zip(table['columns'], table['rows'][view['entries'][name][i]]))
+        entries.append(entry)
+    return entries
+
+
+def test_compact_view_matches_objects():
+    print("🗜️  Testing the compact timetable view format...")
+    institute = dict(num_groups=6, num_teachers=20, seed=2)
+    with scratch_database(**institute):
+        write_institute(build_institute(**institute))
+        prepare_views()
+        assert TimetableGenerator().generate_timetable('2024-25', 1, seed=0)['success']
+        response_cache.clear()
+        client = admin_client()
+        url = '/api/timetable/view?academic_year=2024-25&semester=1'
+
+        objects = client.get(url)
+        compact = client.get(f'{url}&format=compact')
+        view = compact.get_json()
+        assert view['format'] == 'compact' and decode_compact(view) == objects.get_json()
+        assert len(view['dimensions']['teachers']['rows']) <= institute['num_teachers']
+        assert len(compact.data) * 2 < len(objects.data)
+        assert compact.headers['ETag'] != objects.headers['ETag']
+
+        # Fields drop the dimensions none of them are in
+        projected = client.get(f'{url}&format=compact&fields=id,teacher_name&limit=5').get_json()
+        assert set(projected['dimensions']) == {'teachers'} and set(projected['entries']) == {'id', 'teachers'}
+        assert decode_compact(projected) == [{'id': entry['id'], 'teacher_name': entry['teacher_name']}
+                                             for entry in objects.get_json()[:5]]
+
+        assert client.get(f'{url}&format=xml').status_code == 400
+
+    print(f"   ✅ {view['count']} entries in {len(compact.data)} bytes instead of {len(objects.data)}")
+
+
+def test_bootstrap_matches_listings():
+    print("🚀 Testing the management page bootstrap...")
+    institute = dict(num_groups=4, num_teachers=16, seed=1)
+    with scratch_database(**institute):
+        write_institute(build_institute(**institute))
+        prepare_views()
+        response_cache.clear()
+        client = admin_client()
+
+        bootstrap = client.get('/api/timetable/bootstrap')
+        etag = bootstrap.headers['ETag']
+        assert bootstrap.get_json() == {
+            'teachers': client.get('/api/timetable/teachers').get_json(),
+            'subjects': client.get('/api/timetable/subjects').get_json(),
+            'classrooms': client.get('/api/timetable/classrooms').get_json(),
+            'student_groups': client.get('/api/timetable/student-groups').get_json(),
+            'stats': client.get('/api/timetable/stats').get_json(),
+        }
+        assert client.get('/api/timetable/bootstrap', headers={'If-None-Match': etag}).status_code == 304
+
+        # A write to any term changes the bootstrap, which lists the groups of all of them
+        created = client.post('/api/timetable/student-groups', json={
+            'group_code': 'S2-NEW', 'group_name': 'New group', 'academic_year': '2024-25',
+            'semester': 2, 'student_count': 30})
+        assert created.status_code == 201
+        changed = client.get('/api/timetable/bootstrap', headers={'If-None-Match': etag})
+        assert changed.status_code == 200 and changed.get_json()['stats']['student_groups'] == \
+            bootstrap.get_json()['stats']['student_groups'] + 1
+
+        # So does a completed generation, whose time the statistics show
+        assert TimetableGenerator().generate_timetable('2024-25', 1, seed=0)['success']
+        generated = client.get('/api/timetable/bootstrap', headers={'If-None-Match': changed.headers['ETag']})
+        assert generated.status_code == 200 and generated.get_json()['stats']['last_generation']
+
+    print(f"   ✅ {len(bootstrap.data)} bytes in one response instead of five")
+
+
+if __name__ == '__main__':
+    test_view_is_cached_per_data_version()
+    test_listings_page_by_cursor()
+    test_compact_view_matches_objects()
+    test_bootstrap_matches_listings()
+    print("\n🎉 All timetable cache tests passed!")
@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+"""
+Tests for the timetable generation engine (runs without the Flask app or database)
+"""
+
+import json
+import random
+import sys
+from collections import defaultdict
+from dataclasses import replace
+
+from timetable_generator import (TimetableGenerator, OccupancyIndex, WorkloadConstraint,
+                                 SearchMonitor, GenerationCancelled, GenerationPaused,
+                                 contiguous_runs, covered_slots, slot_availability, TRACE_LIMIT)
+from timetable_annealing import AnnealingSolver
+from timetable_portfolio import PortfolioSolver
+from timetable_scoring import SoftScorer, score_timetable
+from benchmarks.synthetic import build_institute
+
+
+def make_institute(**kwargs):
+    generator = TimetableGenerator()
+    data = build_institute(**kwargs)
+    sessions = generator.create_class_sessions(data)
+    return generator, data, sessions
+
+
+def test_occupancy_index_assign_unassign():
+    print("🧮 Testing occupancy index bookkeeping...")
+    generator, data, sessions = make_institute(num_groups=2, num_teachers=6, seed=1)
+    occupancy = OccupancyIndex(data['time_slots'])
+
+    session = sessions[0]
+    session.time_slot_id = next(iter(data['time_slots']))
+    session.classroom_id = next(iter(data['classrooms']))
+
+    occupancy.assign(session)
+    assert occupancy.teacher_busy(session.teacher_id, session.time_slot_id)
+    assert occupancy.room_busy(session.classroom_id, session.time_slot_id)
+    assert occupancy.group_busy(session.group_id, session.time_slot_id)
+    assert occupancy.teacher_load[session.teacher_id] == 1
+
+    occupancy.unassign(session)
+    assert not occupancy.teacher_busy(session.teacher_id, session.time_slot_id)
+    assert not occupancy.room_busy(session.classroom_id, session.time_slot_id)
+    assert not occupancy.group_busy(session.group_id, session.time_slot_id)
+    assert occupancy.teacher_load[session.teacher_id] == 0
+    print("   ✅ Occupancy index updates correctly")
+
+
+def test_indexed_checks_match_full_scan():
+    print("🔍 Testing indexed constraint checks against the full scan...")
+    generator, data, sessions = make_institute(num_groups=6, num_teachers=20, seed=2)
+    occupancy = OccupancyIndex(data['time_slots'])
+    indexed_data = dict(data, occupancy=occupancy)
+
+    slot_ids = list(data['time_slots'])
+    room_ids = list(data['classrooms'])
+    assignments = {}
+    for i, session in enumerate(sessions):
+        session.time_slot_id = slot_ids[i % len(slot_ids)]
+        session.classroom_id = room_ids[i % len(room_ids)]
+        if generator.check_constraints(session, assignments, indexed_data)[0]:
+            assignments[session.id] = session
+            occupancy.assign(session)
+
+    mismatches = 0
+    for i, session in enumerate(sessions):
+        probe = replace(session, id=f"probe_{i}",
+                        time_slot_id=slot_ids[(i * 7) % len(slot_ids)],
+                        classroom_id=room_ids[(i * 3) % len(room_ids)])
+        # Reasons may name a different clashing entity, the verdict must match
+        scanned, _ = generator.check_constraints(probe, assignments, data)
+        indexed, _ = generator.check_constraints(probe, assignments, indexed_data)
+        if scanned != indexed:
+            mismatches += 1
+
+    assert mismatches == 0, f"{mismatches} indexed checks disagree with the full scan"
+    print(f"   ✅ {len(sessions)} probes agree between scan and index")
+
+
+def test_indexed_checks_ignore_own_booking():
+    print("🔁 Testing re-checks of sessions that are already placed...")
+    generator, data, sessions = make_institute(num_groups=4, num_teachers=12, seed=6)
+    occupancy = OccupancyIndex(data['time_slots'])
+    indexed_data = dict(data, occupancy=occupancy)
+    assert generator.backtrack_search(sessions, {}, data)
+
+    assignments = {session.id: session for session in sessions}
+    for session in sessions:
+        occupancy.assign(session)
+
+    for session in sessions:
+        scanned, _ = generator.check_constraints(session, assignments, data)
+        indexed, _ = generator.check_constraints(session, assignments, indexed_data)
+        assert scanned and indexed, f"{session.id} conflicts with its own booking"
+
+    # A clash between two fixed entries survives removing one of them
+    first, second = sessions[0], replace(sessions[0], id="clash")
+    occupancy.assign(second)
+    assert occupancy.teacher_busy(first.teacher_id, first.time_slot_id, first.id)
+    occupancy.unassign(second)
+    assert not occupancy.teacher_busy(first.teacher_id, first.time_slot_id, first.id)
+    assert occupancy.teacher_busy(first.teacher_id, first.time_slot_id)
+    print(f"   ✅ {len(sessions)} placed sessions re-check as conflict-free")
+
+
+def test_domains_are_shared_and_sorted_by_fit():
+    print("📐 Testing cached candidate domains...")
+    generator, data, sessions = make_institute(num_groups=6, num_teachers=24, seed=2)
+
+    for session in sessions:
+        group = data['groups'][session.group_id]
+        subject = data['subjects'][session.subject_id]
+        expected = {classroom_id for classroom_id, classroom in data['classrooms'].items()
+                    if classroom.capacity >= group.student_count and
+                    (not subject.special_room or subject.special_room == classroom.room_type)}
+        rooms = generator.suitable_rooms(session, data)
+        assert set(rooms) == expected
+        capacities = [data['classrooms'][classroom_id].capacity for classroom_id in rooms]
+        assert capacities == sorted(capacities)
+
+    # The weekly lectures of one subject for one group share a single domain object
+    lectures = [session for session in sessions
+                if (session.group_id, session.subject_id, session.session_type) ==
+                (sessions[0].group_id, sessions[0].subject_id, sessions[0].session_type)]
+    assert len(lectures) > 1
+    domains = [generator.unary_domain(session, data) for session in lectures]
+    assert all(domain is domains[0] for domain in domains)
+    print(f"   ✅ Rooms sorted by fit; {len(lectures)} lectures share one domain")
+
+
+def test_compact_session_domains():
+    print("🗜️  Testing compact session and domain storage...")
+    generator, data, sessions = make_institute(num_groups=4, num_teachers=16, seed=3)
+    assert not hasattr(sessions[0], '__dict__')
+    occupancy = OccupancyIndex(data['time_slots'])
+    domains = generator.initialize_domains(sessions, dict(data, occupancy=occupancy))
+    before = {session.id: domains.slots(session.id) for session in sessions}
+    assert all(before[session.id] == sorted(generator.unary_domain(session, data)[0])
+               for session in sessions)
+
+    # Placing a session prunes its slot from the sessions sharing its group; undoing restores it
+    first = sessions[0]
+    first.time_slot_id, first.classroom_id = domains.candidates(first.id)[0]
+    occupancy.assign(first)
+    assert domains.assign(first)
+    sibling = next(session for session in sessions[1:] if session.group_id == first.group_id)
+    assert first.time_slot_id not in domains.slots(sibling.id)
+    assert domains.sizes[sibling.id] == len(domains.slots(sibling.id))
+    domains.unassign(first)
+    occupancy.unassign(first)
+    assert {session.id: domains.slots(session.id) for session in sessions} == before
+    print(f"   ✅ {len(sessions)} slotted sessions with bitmask domains restored after undo")
+
+
+def assert_conflict_free(assignments, data):
+    """Every teacher, room and group appears at most once per time slot"""
+    seen = set()
+    for session in assignments.values():
+        for time_slot_id in covered_slots(data, session.time_slot_id, session.periods):
+            for key in (('teacher', session.teacher_id), ('room', session.classroom_id),
+                        ('group', session.group_id)):
+                booking = key + (time_slot_id,)
+                assert booking not in seen, f"Double booking: {booking}"
+                seen.add(booking)
+
+
+def test_unavailability_is_compiled_to_slot_masks():
+    print("🚫 Testing teacher unavailability and room closures compiled to slot masks...")
+    generator, data, sessions = make_institute(num_groups=6, num_teachers=24, seed=2)
+    session = sessions[0]
+    teacher = data['teachers'][session.teacher_id]
+    # Monday 09:00-09:45 and 09:45-10:30 overlap the range; 10:30-10:45 is the break between slots
+    teacher.unavailability = {'Monday': ['09:30-10:00', '10:30-10:45'], 'tuesday': ['morning']}
+    room_id = generator.suitable_rooms(session, data)[0]
+    data['classrooms'][room_id].availability = {'maintenance': ['wednesday', 'thursday_13:30-16:45']}
+
+    availability = slot_availability(data)
+    assert sorted(availability.teacher_slots[teacher.id]) == [1, 2, 9, 10, 11, 12]
+    assert availability.teacher_slots[teacher.id][2] == 'from 09:30 to 10:00 on monday'
+    assert sorted(availability.room_slots[room_id]) == list(range(17, 25)) + list(range(29, 33))
+    assert availability.teacher_masks[teacher.id] == sum(1 << (slot_id - 1) for slot_id in (1, 2, 9, 10, 11, 12))
+
+    session.time_slot_id, session.classroom_id = 2, room_id
+    satisfied, violations = generator.check_constraints(session, {}, data)
+    assert not satisfied and violations == ['Teacher Availability: Teacher '
+                                            f'{teacher.name} is unavailable from 09:30 to 10:00 on monday']
+    session.time_slot_id = 30
+    assert generator.check_constraints(session, {}, data)[1] == [
+        f"Room Availability: Classroom {data['classrooms'][room_id].name} is closed for maintenance "
+        "from 13:30 to 16:45 on thursday"]
+    session.time_slot_id = session.classroom_id = None
+
+    blocked_teacher = set(availability.teacher_slots[teacher.id])
+    blocked_room = set(availability.room_slots[room_id])
+    for solve in (lambda assignments: generator.backtrack_search(sessions, assignments, data),
+                  lambda assignments: AnnealingSolver(generator, data, time_budget=5, seed=2)
+                  .solve(sessions, assignments)['unscheduled'] == []):
+        assignments = {}
+        assert solve(assignments)
+        assert_conflict_free(assignments, data)
+        for placed in assignments.values():
+            covered = set(covered_slots(data, placed.time_slot_id, placed.periods))
+            assert placed.teacher_id != teacher.id or not covered & blocked_teacher
+            assert placed.classroom_id != room_id or not covered & blocked_room
+        for placed in sessions:
+            placed.time_slot_id = placed.classroom_id = None
+    print(f"   ✅ {len(blocked_teacher)} teacher slots and {len(blocked_room)} room slots kept free")
+
+
+def test_backtracking_solves_synthetic_department():
+    print("🗓️ Testing forward-checking search on a synthetic department...")
+    random.seed(3)
+    generator, data, sessions = make_institute(num_groups=10, num_teachers=40, seed=3)
+    assignments = {}
+
+    assert generator.backtrack_search(sessions, assignments, data)
+    assert len(assignments) == len(sessions)
+    assert_conflict_free(assignments, data)
+    print(f"   ✅ Scheduled {len(sessions)} sessions without conflicts")
+
+
+def test_labs_occupy_consecutive_periods():
+    print("🧪 Testing two-period labs placed on runs of consecutive slots...")
+    generator, data, sessions = make_institute(num_groups=10, num_teachers=40, seed=3)
+    time_slots = data['time_slots']
+    runs = contiguous_runs(time_slots, 2)
+    # Six runs a weekday (through the short breaks, not lunch) and three on Saturday
+    assert len(runs) == 5 * 6 + 3
+    assert all(time_slots[first].day == time_slots[second].day for first, second in runs.values())
+    assert not any(time_slots[first].start_time == '11:30' for first, _ in runs.values())
+
+    labs = [session for session in sessions if session.session_type == 'lab']
+    assert labs and all(session.periods == 2 for session in labs)
+    assert set(generator.unary_domain(labs[0], data)[0]) <= set(runs)
+
+    random.seed(5)
+    assignments = {}
+    assert generator.backtrack_search(sessions, assignments, data)
+    assert_conflict_free(assignments, data)
+    assert all(lab.time_slot_id in runs for lab in labs)
+
+    # The index books both periods and counts them against the teacher's week
+    occupancy = OccupancyIndex(time_slots)
+    lab = labs[0]
+    occupancy.assign(lab)
+    second = runs[lab.time_slot_id][1]
+    assert occupancy.room_busy(lab.classroom_id, second) and occupancy.group_busy(lab.group_id, second)
+    assert occupancy.teacher_load[lab.teacher_id] == 2
+    assert not occupancy.room_busy(lab.classroom_id, lab.time_slot_id, lab.id, periods=2)
+    print(f"   ✅ {len(labs)} labs placed on {len(runs)} possible runs without conflicts")
+
+
+def test_forward_checking_detects_overloaded_teacher():
+    print("⛔ Testing early failure when a teacher has more sessions than periods allowed...")
+    generator, data, sessions = make_institute(num_groups=2, num_teachers=6, seed=4)
+    teacher_id = sessions[0].teacher_id
+    data['teachers'][teacher_id].max_hours = 1
+    data['teachers'][teacher_id].qualifications = [s.code for s in data['subjects'].values()]
+    for session in sessions[:3]:
+        session.teacher_id = teacher_id
+
+    assert not generator.backtrack_search(sessions, {}, data)
+    assert all(session.time_slot_id is None for session in sessions)
+    print("   ✅ Search fails cleanly and leaves no partial assignment")
+
+
+def test_backjumping_skips_unrelated_sessions():
+    print("↩️ Testing conflict-directed backjumping past sessions that don't matter...")
+    data = build_institute(num_groups=2, num_teachers=4, seed=6)
+    subject = next(s for s in data['subjects'].values() if not s.special_room)
+    group, teacher = next(iter(data['groups'].values())), next(iter(data['teachers'].values()))
+    weekdays = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']
+    data['group_subjects'] = []
+
+    def add(teacher_id, unavailability, weekly_hours):
+        group_id = max(data['groups']) + 1
+        data['groups'][group_id] = replace(group, id=group_id, code=f"G{group_id}")
+        data['teachers'][teacher_id] = replace(teacher, id=teacher_id, qualifications=[subject.code],
+                                               unavailability=unavailability)
+        data['group_subjects'].append({'group_id': group_id, 'subject_id': subject.id,
+                                       'assigned_teacher_id': teacher_id, 'weekly_hours': weekly_hours,
+                                       'session_type': 'lecture'})
+
+    # Saturday-only sessions (fewer slots, so placed first), then a teacher with six sessions
+    # and only five Monday slots
+    for teacher_id in range(100, 106):
+        add(teacher_id, {day: ['all_day'] for day in weekdays}, 1)
+    add(200, {**{day: ['all_day'] for day in weekdays[1:] + ['saturday']}, 'monday': ['afternoon']}, 6)
+
+    generator = TimetableGenerator()
+    sessions = generator.create_class_sessions(data)
+    monitor = SearchMonitor()
+    assert not generator.backtrack_search(sessions, {}, data, monitor, max_backtracks=20000)
+    # Plain backtracking retries every placement of the Saturday sessions, and every room
+    # of every Monday slot, before giving up; nothing but the teacher's own sessions is to blame
+    assert monitor.backtracks < 1000
+    print(f"   ✅ Proved unsolvable after {monitor.backtracks} backtracks")
+
+
+def test_search_state_is_not_shared_between_runs():
+    print("♻️ Testing repeated searches over the same loaded data...")
+    generator, data, sessions = make_institute(num_groups=3, num_teachers=10, seed=5)
+    assert generator.backtrack_search(sessions, {}, data)
+
+    fresh_sessions = generator.create_class_sessions(data)[:5]
+    for i, session in enumerate(fresh_sessions):
+        session.id = f"rerun_{i}"
+    assignments = {}
+    assert generator.backtrack_search(fresh_sessions, assignments, data)
+    assert len(assignments) == len(fresh_sessions)
+    assert 'domains' not in data and 'occupancy' not in data
+    print("   ✅ Each search builds its own domains and occupancy")
+
+
+def test_search_depth_is_not_limited_by_recursion():
+    print("📚 Testing the explicit-stack search below a tiny recursion limit...")
+    generator, data, sessions = make_institute(num_groups=50, num_teachers=200, seed=0)
+    previous_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(200)
+    try:
+        assignments = {}
+        assert generator.backtrack_search(sessions, assignments, data)
+    finally:
+        sys.setrecursionlimit(previous_limit)
+
+    assert len(assignments) == len(sessions) > 200
+    assert_conflict_free(assignments, data)
+    print(f"   ✅ {len(sessions)} sessions deep with a recursion limit of 200")
+
+
+def test_warm_start_keeps_previous_placements():
+    print("♨️  Testing warm-start value ordering...")
+    random.seed(3)
+    generator, data, sessions = make_institute(num_groups=10, num_teachers=40, seed=3)
+    previous = {}
+    assert generator.backtrack_search(sessions, previous, data)
+    hints = {session_id: (session.time_slot_id, session.classroom_id) for session_id, session in previous.items()}
+
+    # Same requirements: every session lands on its hint without a single backtrack
+    random.seed(11)
+    generator, data, sessions = make_institute(num_groups=10, num_teachers=40, seed=3)
+    monitor = SearchMonitor()
+    assignments = {}
+    assert generator.backtrack_search(sessions, assignments, dict(data, hints=hints), monitor)
+    assert monitor.backtracks == 0
+    assert all((s.time_slot_id, s.classroom_id) == hints[s.id] for s in assignments.values())
+
+    # One lecture hall closed: only the sessions that used it need to move
+    closed = next(room_id for room_id, room in sorted(data['classrooms'].items())
+                  if room.room_type == 'lecture_hall')
+    random.seed(11)
+    generator, data, sessions = make_institute(num_groups=10, num_teachers=40, seed=3)
+    del data['classrooms'][closed]
+    assignments = {}
+    assert generator.backtrack_search(sessions, assignments, dict(data, hints=hints))
+    assert_conflict_free(assignments, data)
+    moved = sum(1 for s in assignments.values() if (s.time_slot_id, s.classroom_id) != hints[s.id])
+    in_closed = sum(1 for hint in hints.values() if hint[1] == closed)
+    assert moved < 3 * in_closed
+    print(f"   ✅ {moved} of {len(sessions)} sessions moved after closing a room that held {in_closed}")
+
+
+def run_until_paused(steps, checkpoint=None):
+    """Search a tight institute, pausing after `steps` search steps"""
+    generator, data, sessions = make_institute(num_groups=10, num_teachers=40, num_rooms=7, seed=3)
+    calls = []
+
+    def on_progress(monitor):
+        calls.append(1)
+        if len(calls) == steps:
+            monitor.pause()
+
+    monitor = SearchMonitor(on_progress=on_progress, interval=0)
+    try:
+        generator.backtrack_search(sessions, {}, data, monitor, checkpoint=checkpoint)
+    except GenerationPaused as paused:
+        return json.loads(json.dumps(paused.checkpoint))
+    assert False, "search finished before it was paused"
+
+
+def test_paused_search_resumes_where_it_stopped():
+    print("⏸️ Testing checkpoint and resume of a paused search...")
+    random.seed(11)
+    straight = run_until_paused(3999)
+
+    random.seed(11)
+    first_half = run_until_paused(2000)
+    random.seed(12345)  # the resumed search must not depend on the global generator
+    resumed = run_until_paused(2000, first_half)
+
+    # The step a pause interrupts is redone on resume, so 2000 + 2000 steps cover 3999
+    assert first_half['backtracks'] > 0
+    assert resumed == straight
+    print(f"   ✅ Resumed search matches an uninterrupted one after {straight['backtracks']} backtracks")
+
+
+def test_annealing_schedules_synthetic_department():
+    print("🔥 Testing simulated annealing on a synthetic department...")
+    generator, data, sessions = make_institute(num_groups=10, num_teachers=40, seed=7)
+    assignments = {}
+    stats = AnnealingSolver(generator, data, time_budget=5, seed=7).solve(sessions, assignments)
+
+    assert len(assignments) == len(sessions)
+    assert stats['unscheduled'] == []
+    assert_conflict_free(assignments, data)
+    print(f"   ✅ Scheduled {len(sessions)} sessions in {stats['elapsed']}s")
+
+
+def test_annealing_returns_partial_timetable_when_tight():
+    print("🧩 Testing annealing keeps a conflict-free partial timetable on a tight instance...")
+    generator, data, sessions = make_institute(num_groups=20, num_teachers=30, num_rooms=9, seed=0)
+    data['teachers'][sessions[0].teacher_id].max_hours = 2
+    assignments = {}
+    stats = AnnealingSolver(generator, data, time_budget=2, seed=1).solve(sessions, assignments)
+
+    assert assignments and stats['unscheduled']
+    assert len(assignments) + len(stats['unscheduled']) == len(sessions)
+    assert stats['elapsed'] < 4
+    assert_conflict_free(assignments, data)
+
+    load = defaultdict(int)
+    for session in assignments.values():
+        load[session.teacher_id] += 1
+    for teacher_id, periods in load.items():
+        assert periods <= WorkloadConstraint.max_periods(data['teachers'][teacher_id])
+    print(f"   ✅ {len(assignments)}/{len(sessions)} sessions placed within the budget")
+
+
+def test_annealing_replays_from_seed_and_iterations():
+    print("🎲 Testing annealing runs replay from their seed and iteration count...")
+    runs = []
+    for _ in range(2):
+        generator, data, sessions = make_institute(num_groups=10, num_teachers=12, num_rooms=5, seed=3)
+        assignments = {}
+        AnnealingSolver(generator, data, time_budget=30, seed=9, max_iterations=20000).solve(sessions, assignments)
+        runs.append({sid: (s.time_slot_id, s.classroom_id) for sid, s in assignments.items()})
+    assert runs[0] == runs[1]
+    print(f"   ✅ Two runs placed the same {len(runs[0])} sessions identically")
+
+
+def test_soft_score_deltas_match_full_rescoring():
+    print("⚖️  Testing soft constraint deltas against scoring from scratch...")
+    generator, data, sessions = make_institute(num_groups=6, num_teachers=24, seed=4)
+    for classroom in data['classrooms'].values():
+        classroom.building = 'north' if classroom.id % 2 else 'south'
+    teacher = data['teachers'][sessions[0].teacher_id]
+    teacher.preferred_rooms = [next(iter(data['classrooms']))]
+    assignments = {}
+    assert generator.backtrack_search(sessions, assignments, data)
+
+    weights = {'teacher_gaps': 3, 'preferred_rooms': 0}
+    scorer = SoftScorer(data, sessions, weights)
+    for session in sessions:
+        scorer.place(session, session.time_slot_id, session.classroom_id)
+    assert scorer.summary() == score_timetable(data, assignments, weights)
+
+    rng = random.Random(4)
+    domains = {session.id: generator.unary_domain(session, data) for session in sessions}
+    for _ in range(300):
+        session = rng.choice(sessions)
+        time_slot_ids, rooms = domains[session.id]
+        new = (rng.choice(time_slot_ids), rng.choice(rooms))
+        before = dict(scorer.penalties)
+        scorer.trial(session, *new)
+        assert scorer.penalties == before
+        scorer.remove(session, session.time_slot_id, session.classroom_id)
+        session.time_slot_id, session.classroom_id = new
+        scorer.place(session, *new)
+
+    rescored = score_timetable(data, assignments, weights)
+    assert scorer.summary() == rescored
+    assert rescored['penalties']['preferred_rooms'] == 0
+    assert rescored['total'] == sum(rescored['penalties'][name] * weight
+                                    for name, weight in rescored['weights'].items())
+    print(f"   ✅ Score {rescored['total']} after 300 moves, penalties {rescored['penalties']}")
+
+
+def test_portfolio_reports_reproducible_winner():
+    print("🏁 Testing the parallel solver portfolio...")
+    generator, data, sessions = make_institute(num_groups=6, num_teachers=24, seed=8)
+    assignments = {}
+    stats = PortfolioSolver(data, workers=2, time_budget=5, seed=100).solve(sessions, assignments)
+
+    winner = stats['winner']
+    assert winner['complete'] and winner['seed'] == 100 + winner['worker']
+    assert len(assignments) == len(sessions)
+    assert_conflict_free(assignments, data)
+
+    # Re-running the winning strategy with its seed gives the same timetable
+    _, _, replay = make_institute(num_groups=6, num_teachers=24, seed=8)
+    replayed = {}
+    if winner['strategy'] == 'anneal':
+        AnnealingSolver(generator, data, 5, winner['seed'],
+                        max_iterations=winner['stats']['iterations']).solve(replay, replayed)
+    else:
+        random.seed(winner['seed'])
+        generator.backtrack_search(replay, replayed, data)
+    assert {sid: (s.time_slot_id, s.classroom_id) for sid, s in replayed.items()} == \
+        {sid: (s.time_slot_id, s.classroom_id) for sid, s in assignments.items()}
+    print(f"   ✅ Worker {winner['worker']} ({winner['strategy']}, seed {winner['seed']}) won and replays identically")
+
+
+def test_monitor_reports_progress_and_cancels_search():
+    print("🛑 Testing progress reports and cancellation of a running search...")
+    generator, data, sessions = make_institute(num_groups=10, num_teachers=12, num_rooms=5, seed=3)
+    reports = []
+
+    def on_progress(monitor):
+        reports.append(monitor.snapshot())
+        monitor.cancel()
+
+    monitor = SearchMonitor(on_progress=on_progress, interval=0.2)
+    try:
+        AnnealingSolver(generator, data, time_budget=30, seed=1, monitor=monitor).solve(sessions, {})
+        assert False, "search was not cancelled"
+    except GenerationCancelled:
+        pass
+
+    assert len(reports) == 1 and reports[0]['sessions_placed'] == len(sessions)
+    assert reports[0]['elapsed'] < 5
+    print(f"   ✅ Cancelled after {reports[0]['elapsed']}s with best score {reports[0]['best_score']}")
+
+
+def test_monitor_instruments_backtracking_search():
+    print("🔬 Testing search instrumentation: tree stats, constraint timing and trace...")
+    generator, data, sessions = make_institute(num_groups=20, num_teachers=60, seed=5)
+    monitor = SearchMonitor()
+    monitor.trace_interval = 1
+    assert generator.backtrack_search(sessions, {}, data, monitor)
+    report = json.loads(json.dumps(monitor.report()))
+
+    search = report['search']
+    assert search['nodes'] >= len(sessions) > TRACE_LIMIT
+    assert search['max_depth'] == len(sessions)
+    assert set(report['constraints']) == {type(c).__name__ for c in generator.constraints}
+    # Every constraint is checked for each candidate, and for the unary domains before the search
+    calls = {stats['calls'] for stats in report['constraints'].values()}
+    assert len(calls) == 1 and calls.pop() > search['constraint_checks']
+    # The trace was thinned out to stay within its limit, still covering the whole search
+    assert len(report['trace']) < TRACE_LIMIT and report['trace_interval'] > 1
+    assert [sample['node'] for sample in report['trace']] == sorted(sample['node'] for sample in report['trace'])
+    assert report['trace'][-1]['node'] > search['nodes'] // 2
+    slowest = next(iter(report['constraints']))
+    print(f"   ✅ {search['nodes']} nodes, slowest constraint {slowest}, {len(report['trace'])} trace samples")
+
+
+if __name__ == '__main__':
+    test_occupancy_index_assign_unassign()
+    test_indexed_checks_match_full_scan()
+    test_indexed_checks_ignore_own_booking()
+    test_domains_are_shared_and_sorted_by_fit()
+    test_compact_session_domains()
+    test_unavailability_is_compiled_to_slot_masks()
+    test_backtracking_solves_synthetic_department()
+    test_labs_occupy_consecutive_periods()
+    test_forward_checking_detects_overloaded_teacher()
+    test_backjumping_skips_unrelated_sessions()
+    test_search_state_is_not_shared_between_runs()
+    test_search_depth_is_not_limited_by_recursion()
+    test_warm_start_keeps_previous_placements()
+    test_paused_search_resumes_where_it_stopped()
+    test_annealing_schedules_synthetic_department()
+    test_annealing_returns_partial_timetable_when_tight()
+    test_annealing_replays_from_seed_and_iterations()
+    test_soft_score_deltas_match_full_rescoring()
+    test_portfolio_reports_reproducible_winner()
+    test_monitor_reports_progress_and_cancels_search()
+    test_monitor_instruments_backtracking_search()
+    print("\n🎉 All timetable generator tests passed!")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental timetable regeneration (uses a scratch SQLite database)
+"""
+
+import copy
+from dataclasses import replace
+
+import database
+from timetable_generator import TimetableGenerator
+from benchmarks.synthetic import build_institute
+from test_timetable_jobs import scratch_database
+
+
+def saved_entries():
+    conn = database.get_connection()
+    try:
+        rows = conn.execute('''
+            SELECT id, group_id, subject_id, teacher_id, classroom_id, time_slot_id, session_type
+            FROM timetable_entries WHERE status = 'active'
+        ''').fetchall()
+    finally:
+        conn.close()
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+
+def serve(data):
+    """Make load_data return a fresh copy of `data`, so tests can edit the institute in between"""
+    TimetableGenerator.load_data = lambda self, academic_year, semester: copy.deepcopy(data)
+
+
+def test_teacher_leaving_only_moves_their_sessions():
+    print("🔁 Testing regeneration after a teacher leaves...")
+    data = build_institute(num_groups=6, num_teachers=24, seed=1)
+    with scratch_database():
+        serve(data)
+        generator = TimetableGenerator()
+        assert generator.generate_timetable('2024-25', 1, seed=0)['success']
+        before = saved_entries()
+
+        # Hand every subject of the leaving teacher to a new colleague
+        leaving = data['group_subjects'][0]['assigned_teacher_id']
+        leaving_sessions = [session for session in generator.create_class_sessions(data)
+                            if session.teacher_id == leaving]
+        replacement = max(data['teachers']) + 1
+        data['teachers'][replacement] = replace(data['teachers'][leaving], id=replacement,
+                                                code=f"T{replacement:04d}")
+        for gs in data['group_subjects']:
+            if gs['assigned_teacher_id'] == leaving:
+                gs['assigned_teacher_id'] = replacement
+
+        result = generator.regenerate_timetable('2024-25', 1, teacher_ids=[leaving], seed=0)
+        after = saved_entries()
+
+    assert result['success'], result
+    moved = {entry_id for entry_id, entry in before.items() if entry[2] == leaving}
+    # Labs are saved as one entry per period
+    assert result['resolved_sessions'] == len(leaving_sessions)
+    assert len(moved) == sum(session.periods for session in leaving_sessions)
+    assert result['inserted'] == result['deleted'] == len(moved)
+    assert len(after) == len(before)
+    for entry_id, entry in before.items():
+        if entry_id not in moved:
+            assert after[entry_id] == entry
+    assert all(entry[2] != leaving for entry in after.values())
+    print(f"   ✅ Re-solved {len(leaving_sessions)} sessions, {result['fixed_sessions']} left in place")
+
+
+def test_closed_room_and_removed_subject():
+    print("🚪 Testing regeneration after a room closes and a subject is dropped...")
+    data = build_institute(num_groups=6, num_teachers=24, seed=1)
+    with scratch_database():
+        serve(data)
+        generator = TimetableGenerator()
+        assert generator.generate_timetable('2024-25', 1, seed=0)['success']
+        before = saved_entries()
+
+        # A lecture hall: there is not enough computer lab time to lose one
+        closed = next(entry[3] for entry in before.values()
+                      if data['classrooms'][entry[3]].room_type == 'lecture_hall')
+        del data['classrooms'][closed]
+        dropped = data['group_subjects'].pop()
+        dropped_key = (dropped['group_id'], dropped['subject_id'], dropped['session_type'])
+
+        result = generator.regenerate_timetable('2024-25', 1, seed=0)
+        after = saved_entries()
+        # Nothing left to change: a second run writes nothing
+        again = generator.regenerate_timetable('2024-25', 1, seed=0)
+
+    assert result['success'], result
+    assert all(entry[3] != closed for entry in after.values())
+    assert all((entry[0], entry[1], entry[5]) != dropped_key for entry in after.values())
+    dropped_count = sum(1 for entry in before.values() if (entry[0], entry[1], entry[5]) == dropped_key)
+    assert len(after) == len(before) - dropped_count
+    # Rows that kept their id were not rewritten
+    kept = [entry_id for entry_id in after if entry_id in before]
+    assert all(after[entry_id] == before[entry_id] for entry_id in kept)
+    assert len(kept) == len(after) - result['inserted']
+    assert again['success'] and again['resolved_sessions'] == 0
+    assert again['inserted'] == again['deleted'] == 0
+    print(f"   ✅ {result['inserted']} entries moved, {len(kept)} left in place")
+
+
+def test_warm_start_from_saved_timetable():
+    print("♨️  Testing a full generation warm-started from the saved timetable...")
+    data = build_institute(num_groups=6, num_teachers=24, seed=1)
+    with scratch_database():
+        serve(data)
+        generator = TimetableGenerator()
+        assert generator.generate_timetable('2024-25', 1, seed=0)['success']
+        before = saved_entries()
+
+        result = generator.generate_timetable('2024-25', 1, seed=7, warm_start=True)
+        after = saved_entries()
+
+    assert result['success'], result
+    # Saving diffs against the old entries, so none of them is rewritten
+    assert after == before
+    assert result['inserted'] == result['deleted'] == 0
+    print(f"   ✅ All {len(after)} placements carried over")
+
+
+if __name__ == '__main__':
+    test_teacher_leaving_only_moves_their_sessions()
+    test_closed_room_and_removed_subject()
+    test_warm_start_from_saved_timetable()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for background timetable generation jobs (uses a scratch SQLite database)
+"""
+
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+import database
+from timetable_schema import create_timetable_tables
+from timetable_generator import TimetableGenerator
+from benchmarks.synthetic import build_institute
+import timetable_jobs
+
+
+@contextmanager
+def scratch_database(**institute):
+    """Point the pool at an empty timetable schema and serve a synthetic institute"""
+    original_path = database.get_database_path()
+    original_load_data = TimetableGenerator.load_data
+    database.configure(os.path.join(tempfile.mkdtemp(), 'jobs.db'))
+    create_timetable_tables()
+    TimetableGenerator.load_data = lambda self, academic_year, semester: build_institute(**institute)
+    try:
+        yield
+    finally:
+        TimetableGenerator.load_data = original_load_data
+        database.configure(original_path)
+
+
+def wait_for_job(generation_id, timeout=30):
+    deadline = time.time() + timeout
+    while generation_id in timetable_jobs._running_jobs and time.time() < deadline:
+        time.sleep(0.05)
+    return timetable_jobs.get_generation_status(generation_id)
+
+
+def test_job_completes_and_records_progress():
+    print("⏳ Testing a background generation job runs to completion...")
+    with scratch_database(num_groups=6, num_teachers=24, seed=1):
+        generation_id = timetable_jobs.start_generation_job('2024-25', 1, 1, method='auto',
+                                                            weights={'teacher_gaps': 5})
+        status = wait_for_job(generation_id)
+        instrumentation = timetable_jobs.get_generation_instrumentation(generation_id)
+
+    assert status['status'] == 'completed'
+    assert status['success_rate'] == 100.0
+    assert status['progress']['sessions_placed'] == status['total_classes_scheduled']
+    assert status['soft_weights']['teacher_gaps'] == 5 and status['soft_score'] is not None
+    stats = instrumentation['instrumentation']
+    assert instrumentation['solver'] == 'backtracking'
+    assert stats['search']['max_depth'] == status['total_classes_scheduled']
+    assert stats['constraints']['NoDoubleBookingConstraint']['calls'] > 0
+    print(f"   ✅ Generation {generation_id} scheduled {status['total_classes_scheduled']} classes")
+
+
+def test_cancel_stops_running_job():
+    print("🛑 Testing cancellation of a running generation job...")
+    with scratch_database(num_groups=10, num_teachers=12, num_rooms=5, seed=3):
+        generation_id = timetable_jobs.start_generation_job('2024-25', 1, 1, method='anneal', time_budget=30)
+        time.sleep(0.5)
+        assert timetable_jobs.get_generation_status(generation_id)['status'] == 'in_progress'
+
+        started = time.time()
+        assert timetable_jobs.cancel_generation(generation_id)
+        status = wait_for_job(generation_id)
+
+        assert status['status'] == 'cancelled'
+        assert time.time() - started < 2
+        assert not timetable_jobs.cancel_generation(generation_id)
+    print(f"   ✅ Generation {generation_id} stopped {time.time() - started:.2f}s after cancel")
+
+
+def test_paused_job_resumes_to_completion():
+    print("⏸️  Testing pause and resume of a backtracking generation job...")
+    with scratch_database(num_groups=6, num_teachers=24, seed=1):
+        generation_id = timetable_jobs.start_generation_job('2024-25', 1, 1, method='auto', seed=0)
+        assert timetable_jobs.pause_generation(generation_id)
+        status = wait_for_job(generation_id)
+        assert status['status'] == 'cancelled' and status['paused']
+
+        assert timetable_jobs.resume_generation(generation_id)
+        status = wait_for_job(generation_id)
+        assert status['status'] == 'completed' and not status['paused']
+        assert status['success_rate'] == 100.0
+        assert not timetable_jobs.resume_generation(generation_id)
+
+        # Annealing runs have no checkpoint to pause at
+        generation_id = timetable_jobs.start_generation_job('2024-25', 1, 1, method='anneal', time_budget=1)
+        assert not timetable_jobs.pause_generation(generation_id)
+        wait_for_job(generation_id)
+    print(f"   ✅ Generation resumed and scheduled {status['total_classes_scheduled']} classes")
+
+
+if __name__ == '__main__':
+    test_job_completes_and_records_progress()
+    test_cancel_stops_running_job()
+    test_paused_job_resumes_to_completion()
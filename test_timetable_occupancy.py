@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for drag-and-drop moves checked against the live occupancy (uses a scratch SQLite database)
+"""
+
+import database
+import timetable_occupancy
+from timetable_cache import bump_version
+from timetable_generator import TimetableGenerator
+from timetable_validator import validate_timetable
+from benchmarks.synthetic import build_institute, write_institute
+from test_timetable_jobs import scratch_database
+from test_timetable_cache import admin_client, prepare_views
+
+TERM = ('2024-25', 1)
+
+
+def free_slot(occupancy, entry):
+    """A teaching period other than the entry's own where the move has no conflicts"""
+    return next(time_slot_id for time_slot_id in occupancy.data['time_slots']
+                if time_slot_id != entry['time_slot_id'] and not occupancy.check_move(entry['id'], time_slot_id))
+
+
+def test_moves_are_checked_in_memory():
+    print("🖱️  Testing validate-move and entry moves...")
+    institute = dict(num_groups=4, num_teachers=16, unavailable_ratio=0.5, seed=3)
+    with scratch_database(**institute):
+        write_institute(build_institute(**institute))
+        prepare_views()
+        assert TimetableGenerator().generate_timetable(*TERM, seed=0)['success']
+        timetable_occupancy.clear()
+        client = admin_client()
+
+        conn = database.get_connection()
+        try:
+            occupancy = timetable_occupancy.term_occupancy(conn, *TERM)
+        finally:
+            conn.close()
+        entries = sorted(occupancy.entries.values(), key=lambda entry: entry['id'])
+        # A class of a teacher who is away some of the week
+        away = occupancy.availability.teacher_slots
+        entry = next(entry for entry in entries if entry['teacher_id'] in away)
+        # Another class of the same teacher at another time
+        busy = next(other['time_slot_id'] for other in entries
+                    if other['teacher_id'] == entry['teacher_id'] and other['time_slot_id'] != entry['time_slot_id'])
+
+        clash = client.post('/api/timetable/validate-move', json={'entry_id': entry['id'], 'new_time_slot_id': busy})
+        assert clash.status_code == 200 and not clash.get_json()['valid']
+        assert 'teacher_double_booking' in {conflict['conflict_type'] for conflict in clash.get_json()['conflicts']}
+        blocked = client.post('/api/timetable/validate-move', json={
+            'entry_id': entry['id'], 'new_time_slot_id': next(iter(away[entry['teacher_id']]))})
+        assert 'teacher_unavailable' in {conflict['conflict_type'] for conflict in blocked.get_json()['conflicts']}
+        refused = client.put(f"/api/timetable/entries/{entry['id']}", json={'time_slot_id': busy})
+        assert refused.status_code == 409
+
+        # A free period, named the way the dashboard does, by day and start time
+        target = occupancy.data['time_slots'][free_slot(occupancy, entry)]
+        move = {'day_of_week': target.day, 'start_time': target.start_time}
+        checked = client.post('/api/timetable/validate-move', json=dict(move, entry_id=entry['id']))
+        assert checked.get_json() == {'valid': True, 'time_slot_id': target.id, 'conflicts': []}
+        moved = client.put(f"/api/timetable/entries/{entry['id']}", json=move)
+        assert moved.status_code == 200 and moved.get_json()['time_slot_id'] == target.id
+
+        # The loaded occupancy followed the move instead of being reloaded
+        conn = database.get_connection()
+        try:
+            assert timetable_occupancy.term_occupancy(conn, *TERM) is occupancy
+            assert occupancy.entries[entry['id']]['time_slot_id'] == target.id
+            assert conn.execute('SELECT time_slot_id FROM timetable_entries WHERE id = ?',
+                                (entry['id'],)).fetchone()[0] == target.id
+
+            # A write made elsewhere, here to the teachers every term shows, makes it stale
+            bump_version(conn)
+            conn.commit()
+            reloaded = timetable_occupancy.term_occupancy(conn, *TERM)
+            assert reloaded is not occupancy and reloaded.entries[entry['id']]['time_slot_id'] == target.id
+        finally:
+            conn.close()
+
+        assert validate_timetable(*TERM, record=False)['counts'].get('teacher_double_booking', 0) == 0
+        assert client.put('/api/timetable/entries/999999', json={'time_slot_id': busy}).status_code == 404
+        assert client.post('/api/timetable/validate-move', json={'entry_id': entry['id']}).status_code == 400
+
+    print(f"   ✅ Entry {entry['id']} moved to {target.day} {target.start_time}")
+
+
+if __name__ == '__main__':
+    test_moves_are_checked_in_memory()
+    print("\n🎉 All timetable occupancy tests passed!")
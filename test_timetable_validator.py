@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for the whole-timetable validator (uses a scratch SQLite database)
+"""
+
+import json
+
+import database
+from timetable_generator import TimetableGenerator
+from timetable_validator import validate_timetable
+from benchmarks.synthetic import build_institute, write_institute
+from test_timetable_jobs import scratch_database
+
+
+def recorded_conflicts():
+    conn = database.get_connection()
+    try:
+        rows = conn.execute('''
+            SELECT entry_id, conflict_type, resolution_status FROM timetable_conflicts
+        ''').fetchall()
+    finally:
+        conn.close()
+    return {(row[0], row[1]): row[2] for row in rows}
+
+
+def test_validator_finds_and_records_conflicts():
+    print("🔍 Testing the vectorized timetable validator...")
+    institute = dict(num_groups=6, num_teachers=24, seed=1)
+    with scratch_database(**institute):
+        write_institute(build_institute(**institute))
+        assert TimetableGenerator().generate_timetable('2024-25', 1, seed=0)['success']
+        clean = validate_timetable('2024-25', 1)
+        assert clean['entries'] > 0 and clean['conflicts'] == []
+
+        conn = database.get_connection()
+        try:
+            entries = conn.execute('''
+                SELECT e.id, e.group_id, e.subject_id, e.teacher_id, e.classroom_id, e.session_type,
+                       ts.day_of_week, ts.start_time
+                FROM timetable_entries e JOIN time_slots ts ON e.time_slot_id = ts.id
+                ORDER BY e.id
+            ''').fetchall()
+            copied, shrunk, absent, closed = entries[0], entries[1], entries[2], entries[3]
+
+            # A half-hour-shifted slot overlapping the copied entry's, booked with the same teacher, room and group
+            hour = int(copied[7][:2])
+            slot_id = conn.execute('''
+                INSERT INTO time_slots (slot_code, day_of_week, start_time, end_time, slot_type, duration_minutes)
+                VALUES ('OVERLAP', ?, ?, ?, 'academic', 60)
+            ''', (copied[6], f"{hour:02d}:30", f"{hour + 1:02d}:30")).lastrowid
+            overlap_id = conn.execute('''
+                INSERT INTO timetable_entries
+                (academic_year, semester, group_id, subject_id, teacher_id, classroom_id, time_slot_id, session_type)
+                VALUES ('2024-25', 1, ?, ?, ?, ?, ?, ?)
+            ''', copied[1:5] + (slot_id, copied[5])).lastrowid
+
+            conn.execute('UPDATE timetable_classrooms SET seating_capacity = 1 WHERE id = ?', (shrunk[4],))
+            conn.execute('UPDATE timetable_teachers SET weekly_unavailability = ? WHERE id = ?',
+                         (json.dumps({absent[6].lower(): ['all_day']}), absent[3]))
+            conn.execute('UPDATE timetable_classrooms SET availability_constraints = ? WHERE id = ?',
+                         (json.dumps({'maintenance': [f"{closed[6].lower()}_{closed[7]}-23:00"]}), closed[4]))
+            conn.commit()
+        finally:
+            conn.close()
+
+        result = validate_timetable('2024-25', 1)
+        found = {(c['entry_id'], c['conflict_type']) for c in result['conflicts']}
+        for entry_id in (copied[0], overlap_id):
+            for conflict_type in ('teacher_double_booking', 'room_double_booking', 'group_double_booking'):
+                assert (entry_id, conflict_type) in found
+        in_shrunk_room = {entry[0] for entry in entries if entry[4] == shrunk[4]} | (
+            {overlap_id} if copied[4] == shrunk[4] else set())
+        assert {e for e, t in found if t == 'capacity_exceeded'} == in_shrunk_room
+        unavailable = {entry[0] for entry in entries if entry[3] == absent[3] and entry[6] == absent[6]}
+        if copied[3] == absent[3] and copied[6] == absent[6]:
+            unavailable.add(overlap_id)
+        assert {e for e, t in found if t == 'teacher_unavailable'} == unavailable
+        in_closed_room = {entry[0] for entry in entries
+                          if entry[4] == closed[4] and entry[6] == closed[6] and entry[7] >= closed[7]}
+        if copied[4] == closed[4] and copied[6] == closed[6] and f"{hour + 1:02d}:30" > closed[7]:
+            in_closed_room.add(overlap_id)
+        assert closed[0] in in_closed_room
+        assert {e for e, t in found if t == 'room_unsuitable'} == in_closed_room
+        assert recorded_conflicts() == {key: 'unresolved' for key in found}
+
+        # An ignored conflict is not raised again; the rest are replaced, not duplicated
+        conn = database.get_connection()
+        try:
+            conn.execute('''
+                UPDATE timetable_conflicts SET resolution_status = 'ignored'
+                WHERE entry_id = ? AND conflict_type = 'room_double_booking'
+            ''', (copied[0],))
+            conn.commit()
+        finally:
+            conn.close()
+        validate_timetable('2024-25', 1)
+        recorded = recorded_conflicts()
+
+    assert len(recorded) == len(found)
+    assert recorded[(copied[0], 'room_double_booking')] == 'ignored'
+    print(f"   ✅ {len(found)} conflicts found in {result['entries']} entries "
+          f"in {result['validation_time'] * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    test_validator_finds_and_records_conflicts()
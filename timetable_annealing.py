@@ -0,0 +1,315 @@
+"""
+Simulated Annealing Timetable Solver
+Local-search alternative to the backtracking engine. Starts from a greedy
+assignment, then moves and swaps sessions to repair double bookings while
+spreading each subject across the week, until the time budget runs out.
+Sessions still in conflict at the end are left unscheduled, so a tight
+instance gives a partial timetable instead of no timetable.
+"""
+
+import math
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from timetable_generator import ClassSession, SearchMonitor, WorkloadConstraint, covered_slots, slot_availability
+from timetable_scoring import SoftScorer
+
+DEFAULT_TIME_BUDGET = 30.0  # seconds
+HARD_WEIGHT = 1000          # one double booking outweighs any amount of soft cost
+INITIAL_TEMPERATURE = 2.0
+FINAL_TEMPERATURE = 0.05
+COOLING_CYCLE = 200000      # iterations from initial to final temperature before reheating
+SWAP_PROBABILITY = 0.3
+CLOCK_CHECK_INTERVAL = 256  # iterations between wall-clock checks
+GREEDY_SCORED_SLOTS = 32    # conflict-free slots the greedy start compares by soft cost
+
+
+class AnnealingSolver:
+    """Simulated annealing over complete (time slot, classroom) assignments.
+
+    Hard cost counts surplus bookings per teacher, room and group in a slot;
+    a session of several periods books each slot of its run, and a closed
+    classroom is booked in the slots it is closed.
+    Soft cost is the weighted score of the soft constraints in
+    timetable_scoring, with weights from data['soft_weights'] when given.
+    Both are kept in counters so every move is evaluated by its delta only.
+    """
+
+    def __init__(self, generator, data: Dict, time_budget: float = DEFAULT_TIME_BUDGET,
+                 seed: Optional[int] = None, max_iterations: Optional[int] = None,
+                 monitor: Optional[SearchMonitor] = None):
+        self.generator = generator
+        self.monitor = monitor
+        self.data = data
+        self.time_budget = time_budget
+        self.max_iterations = max_iterations
+        self.random = random.Random(seed)
+
+        self.teacher_count = defaultdict(int)
+        self.room_count = defaultdict(int)
+        self.group_count = defaultdict(int)
+        self.scorer = None
+        self.hard_cost = 0
+        self.soft_cost = 0
+        self.teacher_capacity = {}
+
+        self.iterations = 0
+        self.accepted = 0
+
+    def _bookings(self, session: ClassSession, time_slot_id: int, classroom_id: int):
+        bookings = []
+        for covered_id in covered_slots(self.data, time_slot_id, session.periods):
+            bookings += [
+                (self.teacher_count, (session.teacher_id, covered_id)),
+                (self.room_count, (classroom_id, covered_id)),
+                (self.group_count, (session.group_id, covered_id)),
+            ]
+        return bookings
+
+    def _place(self, session: ClassSession, time_slot_id: int, classroom_id: int) -> Tuple[int, float]:
+        """Book a session and return the (hard, soft) cost it added"""
+        hard = 0
+        for counts, key in self._bookings(session, time_slot_id, classroom_id):
+            if counts[key]:
+                hard += 1
+            counts[key] += 1
+        soft = self.scorer.place(session, time_slot_id, classroom_id)
+
+        session.time_slot_id = time_slot_id
+        session.classroom_id = classroom_id
+        self.hard_cost += hard
+        self.soft_cost += soft
+        return hard, soft
+
+    def _remove(self, session: ClassSession) -> Tuple[int, float]:
+        """Release a session's booking and return the (hard, soft) cost it removed"""
+        hard = 0
+        for counts, key in self._bookings(session, session.time_slot_id, session.classroom_id):
+            counts[key] -= 1
+            if counts[key]:
+                hard += 1
+        soft = -self.scorer.remove(session, session.time_slot_id, session.classroom_id)
+
+        session.time_slot_id = None
+        session.classroom_id = None
+        self.hard_cost -= hard
+        self.soft_cost -= soft
+        return hard, soft
+
+    def _conflicted(self, session: ClassSession) -> bool:
+        bookings = self._bookings(session, session.time_slot_id, session.classroom_id)
+        return any(counts[key] > 1 for counts, key in bookings)
+
+    def _cost(self) -> int:
+        return self.hard_cost * HARD_WEIGHT + self.soft_cost
+
+    def _greedy_start(self, sessions: List[ClassSession], domains: Dict[str, List[Tuple[int, int]]]):
+        """Place sessions most-constrained first, each at its cheapest (slot, room).
+        A warm-start hint in data['hints'] is taken if it is free of conflicts.
+        Soft cost is scored for one free room in each of the first
+        GREEDY_SCORED_SLOTS free slots; annealing improves on the rest.
+        """
+        hints = self.data.get('hints') or {}
+        for session in sorted(sessions, key=lambda s: (len(domains[s.id]), s.id)):
+            best, best_cost = None, None
+            values = domains[session.id]
+            hint = hints.get(session.id)
+            if hint in values:
+                values = [hint] + values
+            scored = set()
+            for time_slot_id, classroom_id in values:
+                bookings = self._bookings(session, time_slot_id, classroom_id)
+                cost = sum(HARD_WEIGHT for counts, key in bookings if counts[key])
+                if cost == 0:
+                    if (time_slot_id, classroom_id) == hint:
+                        best = hint
+                        break
+                    if time_slot_id in scored:
+                        continue
+                    scored.add(time_slot_id)
+                    cost = self.scorer.trial(session, time_slot_id, classroom_id)
+                if best_cost is None or cost < best_cost:
+                    best, best_cost = (time_slot_id, classroom_id), cost
+                if best_cost <= 0 or len(scored) == GREEDY_SCORED_SLOTS:
+                    break
+            self._place(session, *best)
+
+    def _try_move(self, session: ClassSession, domain: List[Tuple[int, int]], temperature: float) -> bool:
+        old = (session.time_slot_id, session.classroom_id)
+        new = self.random.choice(domain)
+        if new == old:
+            return False
+
+        before = self._cost()
+        self._remove(session)
+        self._place(session, *new)
+        if self._accept(self._cost() - before, temperature):
+            return True
+
+        self._remove(session)
+        self._place(session, *old)
+        return False
+
+    def _try_swap(self, first: ClassSession, second: ClassSession, slot_rooms: Dict, temperature: float) -> bool:
+        """Exchange the slots of two sessions of the same group, each keeping a legal room"""
+        first_old = (first.time_slot_id, first.classroom_id)
+        second_old = (second.time_slot_id, second.classroom_id)
+        if first_old[0] == second_old[0]:
+            return False
+
+        first_new = self._room_in_slot(slot_rooms[first.id], second_old[0], second_old[1])
+        second_new = self._room_in_slot(slot_rooms[second.id], first_old[0], first_old[1])
+        if first_new is None or second_new is None:
+            return False
+
+        before = self._cost()
+        self._remove(first)
+        self._remove(second)
+        self._place(first, *first_new)
+        self._place(second, *second_new)
+        if self._accept(self._cost() - before, temperature):
+            return True
+
+        self._remove(first)
+        self._remove(second)
+        self._place(first, *first_old)
+        self._place(second, *second_old)
+        return False
+
+    def _room_in_slot(self, slot_rooms: Dict[int, List[int]], time_slot_id: int,
+                      preferred_room: int) -> Optional[Tuple[int, int]]:
+        rooms = slot_rooms.get(time_slot_id)
+        if not rooms:
+            return None
+        if preferred_room in rooms:
+            return time_slot_id, preferred_room
+        return time_slot_id, self.random.choice(rooms)
+
+    def _accept(self, delta: int, temperature: float) -> bool:
+        if delta <= 0:
+            return True
+        return self.random.random() < math.exp(-delta / temperature)
+
+    def _drop_infeasible(self, placed: List[ClassSession]) -> List[ClassSession]:
+        """Unschedule sessions until no double booking or workload overrun is left"""
+        dropped = []
+        for session in sorted(placed, key=lambda s: s.id, reverse=True):
+            if self._conflicted(session):
+                self._remove(session)
+                dropped.append(session)
+
+        teacher_load = defaultdict(int)
+        for session in placed:
+            if session.time_slot_id is None:
+                continue
+            teacher_load[session.teacher_id] += session.periods
+            capacity = self.teacher_capacity.get(session.teacher_id)
+            if capacity is not None and teacher_load[session.teacher_id] > capacity:
+                self._remove(session)
+                dropped.append(session)
+        return dropped
+
+    def solve(self, sessions: List[ClassSession], assignments: Dict) -> Dict:
+        """Anneal until the budget or max_iterations runs out, or a zero-cost timetable is found.
+
+        Sessions already in `assignments` stay fixed. Conflict-free sessions are
+        added to `assignments`; the returned stats list those left unscheduled.
+        """
+        start = time.time()
+        time_slots = self.data['time_slots']
+        self.scorer = SoftScorer(self.data, list(assignments.values()) + sessions,
+                                 self.data.get('soft_weights'))
+
+        # A closed classroom counts as booked, so using it is a double booking
+        for classroom_id, blocked in slot_availability(self.data).room_slots.items():
+            for time_slot_id in blocked:
+                self.room_count[(classroom_id, time_slot_id)] += 1
+        for fixed_session in assignments.values():
+            self._place(fixed_session, fixed_session.time_slot_id, fixed_session.classroom_id)
+
+        fixed_load = defaultdict(int)
+        for fixed_session in assignments.values():
+            fixed_load[fixed_session.teacher_id] += fixed_session.periods
+        self.teacher_capacity = {
+            teacher_id: WorkloadConstraint.max_periods(teacher) - fixed_load[teacher_id]
+            for teacher_id, teacher in self.data['teachers'].items()
+        }
+
+        domains = {}
+        slot_rooms = {}
+        unplaceable = []
+        for session in sessions:
+            time_slot_ids, rooms = self.generator.unary_domain(session, self.data)
+            slot_rooms[session.id] = dict.fromkeys(time_slot_ids, rooms)
+            domains[session.id] = [(time_slot_id, classroom_id)
+                                   for time_slot_id in time_slot_ids
+                                   for classroom_id in rooms]
+            if not domains[session.id]:
+                unplaceable.append(session)
+        movable = [session for session in sessions if domains[session.id]]
+
+        self._greedy_start(movable, domains)
+        if self.monitor:
+            self.monitor.placed = len(movable)
+        by_group = defaultdict(list)
+        for session in movable:
+            by_group[session.group_id].append(session)
+
+        best_cost = self._cost()
+        best = {session.id: (session.time_slot_id, session.classroom_id) for session in movable}
+        deadline = start + self.time_budget
+
+        while movable and best_cost > 0:
+            if self.iterations == self.max_iterations:
+                break
+            if self.iterations % CLOCK_CHECK_INTERVAL == 0:
+                if time.time() >= deadline:
+                    break
+                if self.monitor:
+                    self.monitor.best_score = best_cost
+                    self.monitor.tick()
+            # Geometric cooling driven by the iteration count (not the clock),
+            # so a seed and an iteration count replay the same run
+            progress = (self.iterations % COOLING_CYCLE) / COOLING_CYCLE
+            temperature = INITIAL_TEMPERATURE * (FINAL_TEMPERATURE / INITIAL_TEMPERATURE) ** progress
+            self.iterations += 1
+
+            session = self.random.choice(movable)
+            if self.random.random() < SWAP_PROBABILITY:
+                other = self.random.choice(by_group[session.group_id])
+                accepted = other is not session and self._try_swap(session, other, slot_rooms, temperature)
+            else:
+                accepted = self._try_move(session, domains[session.id], temperature)
+
+            if accepted:
+                self.accepted += 1
+                cost = self._cost()
+                if cost < best_cost:
+                    best_cost = cost
+                    best = {s.id: (s.time_slot_id, s.classroom_id) for s in movable}
+
+        # Restore the best timetable seen, then make it conflict-free
+        for session in movable:
+            self._remove(session)
+        for session in movable:
+            self._place(session, *best[session.id])
+        dropped = self._drop_infeasible(movable)
+
+        for session in movable:
+            if session.time_slot_id is not None:
+                time_slot = time_slots[session.time_slot_id]
+                session.day = time_slot.day
+                session.start_time = time_slot.start_time
+                assignments[session.id] = session
+
+        return {
+            'solver': 'anneal',
+            'iterations': self.iterations,
+            'accepted_moves': self.accepted,
+            'soft_cost': self.soft_cost,
+            'soft_penalties': self.scorer.penalties,
+            'unscheduled': sorted(session.id for session in unplaceable + dropped),
+            'elapsed': round(time.time() - start, 3)
+        }
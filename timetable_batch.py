@@ -0,0 +1,246 @@
+"""
+Batch Timetable Generation
+Generates the timetables of several terms (academic year, semester) in one
+run, so teachers and classrooms shared between them are never booked twice.
+The sessions of all terms are split into components that share no teacher
+and no student group: in practice the departments. Classrooms are then
+allotted to components by their demand, scarcest rooms first; components
+that cannot get enough rooms of their own share them and are merged. The
+remaining components are solved in parallel, one per process, each in its
+own rooms. A component that fails in its rooms is solved again with every
+room, around the placements of the others; components that then book the
+same room at the same time are merged and solved jointly, warm-started
+from their previous placements, until no room is double booked.
+"""
+
+import math
+import multiprocessing
+import os
+import random
+import time
+from collections import Counter
+from multiprocessing import TimeoutError as PoolTimeout
+from typing import Dict, List, Optional, Tuple
+
+from timetable_generator import (TimetableGenerator, ClassSession, SearchMonitor, covered_slots,
+                                 INCREMENTAL_BACKTRACK_LIMIT)
+
+ROOM_SLACK = 1.5  # room periods allotted to a component per period of sessions it has to place
+
+
+def _solve_component(task: Tuple) -> Tuple[int, bool, Dict[str, Tuple[int, int]], float]:
+    """Backtracking search over one component, around the fixed placements of the others"""
+    component_id, sessions, fixed, data, seed, max_backtracks, monitor = task
+    generator = TimetableGenerator()
+    assignments = {session.id: session for session in fixed}
+    for session in sessions:
+        session.time_slot_id = session.classroom_id = None  # Placements of an earlier round
+    start = time.time()
+    random.seed(seed)
+    success = generator.backtrack_search(sessions, assignments, data, monitor,
+                                         max_backtracks=max_backtracks)
+    placements = {session.id: (session.time_slot_id, session.classroom_id)
+                  for session in sessions if session.id in assignments}
+    return component_id, success, placements, round(time.time() - start, 3)
+
+
+class BatchSolver:
+    """Solve independent components in parallel and coupled ones jointly"""
+
+    def __init__(self, data: Dict, workers: Optional[int] = None, seed: Optional[int] = None,
+                 monitor: Optional[SearchMonitor] = None):
+        self.data = data
+        self.monitor = monitor
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.base_seed = seed if seed is not None else random.randrange(2 ** 31)
+
+    @staticmethod
+    def components(sessions: List[ClassSession]) -> List[List[ClassSession]]:
+        """Sessions linked through a shared teacher or student group, largest first"""
+        parent = {}
+
+        def find(key):
+            parent.setdefault(key, key)
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        for session in sessions:
+            parent[find(('group', session.group_id))] = find(('teacher', session.teacher_id))
+        grouped = {}
+        for session in sessions:
+            grouped.setdefault(find(('group', session.group_id)), []).append(session)
+        return sorted(grouped.values(), key=lambda component: (-len(component), component[0].id))
+
+    def _allot_rooms(self, components: List[List[ClassSession]]) -> Tuple[List[List[ClassSession]], List[set]]:
+        """Give each component rooms of its own, merging components that have to share.
+
+        Each component asks, per class of suitable rooms, for ROOM_SLACK times
+        the periods its sessions need there, in whole rooms; classes with the
+        fewest rooms go first, and rooms still free take the shortfall before
+        those of another component are shared. Rooms nobody asked for go to
+        every component. Returns the merged components and their rooms.
+        """
+        generator = TimetableGenerator()
+        slots = max(1, len(self.data['time_slots']))
+        owners = {}
+        merged = list(range(len(components)))
+
+        def find(index):
+            while merged[index] != index:
+                merged[index] = merged[merged[index]]
+                index = merged[index]
+            return index
+
+        for index, component in enumerate(components):
+            demand = Counter()
+            for session in component:
+                demand[generator.suitable_rooms(session, self.data)] += session.periods
+            owned = set()
+            for rooms, periods in sorted(demand.items(), key=lambda item: (len(item[0]), item[0])):
+                wanted = math.ceil(periods * ROOM_SLACK / slots) - len(owned.intersection(rooms))
+                for room in sorted(rooms, key=lambda room: room in owners):
+                    if wanted <= 0:
+                        break
+                    if room in owned:
+                        continue
+                    if room in owners:
+                        merged[find(owners[room])] = find(index)
+                    else:
+                        owners[room] = index
+                    owned.add(room)
+                    wanted -= 1
+
+        shared = set(self.data['classrooms']) - set(owners)
+        joined = {}
+        for index, component in enumerate(components):
+            root = find(index)
+            joined.setdefault(root, ([], set(shared)))
+            joined[root][0].extend(component)
+        for room, index in owners.items():
+            joined[find(index)][1].add(room)
+        allotted = sorted(joined.values(), key=lambda item: (-len(item[0]), item[0][0].id))
+        return [sessions for sessions, _ in allotted], [rooms for _, rooms in allotted]
+
+    def _room_clashes(self, components: List[List[ClassSession]],
+                      placements: Dict[str, Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Pairs of components that booked the same classroom in the same time slot"""
+        booked = {}
+        clashes = set()
+        for index, component in enumerate(components):
+            for session in component:
+                time_slot_id, classroom_id = placements[session.id]
+                for covered_id in covered_slots(self.data, time_slot_id, session.periods):
+                    other = booked.setdefault((classroom_id, covered_id), index)
+                    if other != index:
+                        clashes.add((min(other, index), max(other, index)))
+        return sorted(clashes)
+
+    def _run(self, tasks: List[Tuple]) -> List[Tuple]:
+        if len(tasks) == 1 or self.workers == 1:
+            return [_solve_component(task[:-1] + (self.monitor,)) for task in tasks]
+        results = []
+        with multiprocessing.Pool(min(self.workers, len(tasks))) as pool:
+            pending = pool.imap_unordered(_solve_component, tasks)
+            while len(results) < len(tasks):
+                if self.monitor:
+                    self.monitor.tick()
+                try:
+                    results.append(pending.next(timeout=self.monitor.interval if self.monitor else None))
+                except PoolTimeout:
+                    continue
+        return results
+
+    def solve(self, sessions: List[ClassSession], assignments: Dict) -> Dict:
+        """Place every session and copy the placements into `assignments`.
+
+        Returns stats with the number of components, how many were left after
+        merging coupled ones, and the component sizes solved in each round;
+        'success' is False if some component has no timetable even on its
+        own, in which case nothing is placed. A joint re-solve that fails
+        around the settled components is retried once over all sessions.
+        """
+        start = time.time()
+        components = self.components(sessions)
+        initial_components = len(components)
+        components, allotted = self._allot_rooms(components)
+        if len(components) == 1:
+            allotted = None  # Every room is its own anyway
+        placements = {}
+        hints = dict(self.data.get('hints') or {})
+        pending = list(range(len(components)))
+        rounds = []
+        success = True
+
+        while pending:
+            settled = [session for index, component in enumerate(components)
+                       if index not in pending for session in component]
+            for session in settled:
+                session.time_slot_id, session.classroom_id = placements[session.id]
+            seed = self.base_seed + len(rounds) * initial_components
+            # Only the search over every session runs to the end; the others give up early
+            whole = len(components) == 1 and not allotted
+            max_backtracks = None if whole else INCREMENTAL_BACKTRACK_LIMIT
+            tasks = []
+            for index in pending:
+                data = dict(self.data, hints=hints)
+                if allotted:
+                    # Domains depend on the rooms, so the cache of the full data can't be shared
+                    data.pop('domain_cache', None)
+                    data['classrooms'] = {room: self.data['classrooms'][room] for room in allotted[index]}
+                tasks.append((index, components[index], settled, data, seed + index, max_backtracks, None))
+            results = self._run(tasks)
+            rounds.append([{'sessions': len(components[index]), 'solved': solved, 'elapsed': elapsed}
+                           for index, solved, _, elapsed in sorted(results)])
+            for _, solved, component_placements, _ in results:
+                if solved:
+                    placements.update(component_placements)
+                    hints.update(component_placements)
+            failed = [index for index, solved, _, _ in results if not solved]
+            if failed:
+                if whole:
+                    success = False
+                    break
+                if allotted:
+                    # Components short of rooms of their own try again with every room
+                    pending, allotted = sorted(failed), None
+                else:
+                    # The settled components left no room: solve everything jointly
+                    components, pending = [list(sessions)], [0]
+                continue
+            allotted = None
+
+            # Merge components that clashed over a room and solve them again together
+            merged = {index: {index} for index in range(len(components))}
+            for first, second in self._room_clashes(components, placements):
+                union = merged[first] | merged[second]
+                for index in union:
+                    merged[index] = union
+            pending = []
+            next_components = []
+            for index in range(len(components)):
+                group = merged[index]
+                if min(group) != index:
+                    continue
+                if len(group) > 1:
+                    pending.append(len(next_components))
+                next_components.append([session for member in sorted(group) for session in components[member]])
+            components = next_components
+
+        if success:
+            time_slots = self.data['time_slots']
+            for session in sessions:
+                session.time_slot_id, session.classroom_id = placements[session.id]
+                session.day = time_slots[session.time_slot_id].day
+                session.start_time = time_slots[session.time_slot_id].start_time
+                assignments[session.id] = session
+
+        return {
+            'solver': 'batch',
+            'success': success,
+            'components': initial_components,
+            'coupled_components': len(components),
+            'rounds': rounds,
+            'elapsed': round(time.time() - start, 3)
+        }
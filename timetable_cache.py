@@ -0,0 +1,127 @@
+"""
+Timetable Data Versions and Response Cache
+Every write that changes what a timetable view shows bumps a version counter
+in timetable_data_versions, inside the write's own transaction: the row of
+the term (academic year, semester) for its entries and student groups, and
+the shared row for teachers, subjects and classrooms, which every term
+shows. The counters live in the database, so a write made by any web worker
+or background job is seen by all of them.
+
+Views keep their serialized responses in an in-process LRU cache keyed by
+the request and both versions. The same key gives a strong ETag, so a client
+whose copy is still current gets 304 Not Modified without the view's query
+running, and a client whose copy is stale never gets it from the cache.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+SHARED_TERM = ('*', 0)  # version row of the data every term shows
+CACHE_SIZE = 256        # responses kept per process
+
+
+def bump_version(conn, academic_year: Optional[str] = None, semester: Optional[int] = None):
+    """Increment a term's data version, or the shared one when no term is given.
+
+    Runs on the caller's connection so it commits, or rolls back, with the write.
+    """
+    term = (academic_year, int(semester)) if academic_year is not None else SHARED_TERM
+    conn.execute('''
+        INSERT INTO timetable_data_versions (academic_year, semester, version)
+        VALUES (?, ?, 1)
+        ON CONFLICT (academic_year, semester) DO UPDATE SET version = version + 1
+    ''', term)
+
+
+def data_version(conn, academic_year: str, semester: int) -> Tuple[int, int]:
+    """(term version, shared version); 0 for a version never bumped"""
+    versions = dict.fromkeys(((academic_year, int(semester)), SHARED_TERM), 0)
+    for row in conn.execute('''
+        SELECT academic_year, semester, version FROM timetable_data_versions
+        WHERE (academic_year = ? AND semester = ?) OR (academic_year = ? AND semester = ?)
+    ''', (academic_year, int(semester)) + SHARED_TERM):
+        versions[(row[0], row[1])] = row[2]
+    return versions[(academic_year, int(semester))], versions[SHARED_TERM]
+
+
+def all_data_version(conn) -> int:
+    """A version that changes whenever any term's or the shared version does.
+
+    Every bump adds one to a single counter, so their sum only grows.
+    """
+    return conn.execute('SELECT COALESCE(SUM(version), 0) FROM timetable_data_versions').fetchone()[0]
+
+
+class ResponseCache:
+    """Serialized responses, with their extra headers, by key; least recently used dropped first"""
+
+    def __init__(self, size: int = CACHE_SIZE):
+        self.size = size
+        self.responses = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple) -> Optional[Tuple[bytes, Dict[str, str]]]:
+        with self.lock:
+            cached = self.responses.get(key)
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.responses.move_to_end(key)
+            return cached
+
+    def put(self, key: Tuple, body: bytes, headers: Dict[str, str]):
+        with self.lock:
+            self.responses[key] = (body, headers)
+            self.responses.move_to_end(key)
+            while len(self.responses) > self.size:
+                self.responses.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.responses.clear()
+            self.hits = self.misses = 0
+
+
+response_cache = ResponseCache()
+
+
+def cached_json(conn, view: str, academic_year: Optional[str], semester: Optional[int], params: Dict,
+                build: Callable[[], Tuple[Any, Dict[str, str]]]):
+    """The JSON response of a view over one term, built at most once per data version.
+
+    A view over every term passes no academic year and is rebuilt after a
+    write to any of them. `params` are the request's filters; `build` runs the view's query and
+    returns what to serialize plus extra response headers (e.g. the next
+    page's cursor). Responses carry a strong ETag and must be revalidated,
+    which costs the client one version lookup and no query.
+    """
+    # Flask only here, so the generation engine can bump versions without it
+    from flask import current_app, request
+    
+    if academic_year is None:
+        term, version = None, all_data_version(conn)
+    else:
+        term, version = (academic_year, int(semester)), data_version(conn, academic_year, semester)
+    key = (view, term, tuple(sorted(params.items())), version)
+    etag = hashlib.sha1(json.dumps(key, default=str).encode()).hexdigest()
+
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        cached = response_cache.get(key)
+        if cached is None:
+            payload, headers = build()
+            cached = (json.dumps(payload, separators=(',', ':')).encode(), headers)
+            response_cache.put(key, *cached)
+        body, headers = cached
+        response = current_app.response_class(body, mimetype='application/json')
+        response.headers.update(headers)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
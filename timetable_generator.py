@@ -6,13 +6,44 @@ Uses techniques like constraint satisfaction, backtracking, and heuristic optimi
 
 import sqlite3
 import json
+import heapq
 import random
+import threading
 import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional, Set
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
 from collections import defaultdict
 
+from database import get_connection
+from timetable_cache import bump_version
+
+# 'auto' is exhaustive backtracking, 'anneal' the time-budgeted local search and
+# 'portfolio' races both across CPU cores with different seeds
+GENERATION_METHODS = ('auto', 'anneal', 'portfolio')
+PROGRESS_INTERVAL = 1.0  # seconds between progress reports of a running search
+INCREMENTAL_BACKTRACK_LIMIT = 5000  # backtracks before an incremental re-solve widens its scope
+NOGOOD_MAX_SIZE = 4    # nogoods over more placements than this are too specific to recur
+NOGOOD_LIMIT = 100000  # nogoods learned per search
+PERIOD_MINUTES = 60  # session minutes per timetable period: weekly hours are counted in periods
+RUN_MAX_GAP = 15     # minutes of break a multi-period session may run through (a short break, not lunch)
+TRACE_INTERVAL = 64  # search nodes between samples of the search trace, to start with
+TRACE_LIMIT = 256    # trace samples kept; on reaching it every other one is dropped and the interval doubles
+DAY_PARTS = {'morning': (9 * 60, 12 * 60), 'afternoon': (14 * 60, 17 * 60)}  # minutes a slot may start in
+
+def _slotted(cls):
+    """Rebuild a dataclass with __slots__, dropping the per-instance __dict__.
+
+    Equivalent to dataclass(slots=True), which needs Python 3.10. Defaults live
+    in the generated __init__, so the class attributes holding them can go.
+    """
+    names = tuple(f.name for f in fields(cls))
+    namespace = {key: value for key, value in cls.__dict__.items()
+                 if key not in names and key not in ('__dict__', '__weakref__')}
+    namespace['__slots__'] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+@_slotted
 @dataclass
 class TimeSlot:
     """Represents a time slot in the timetable"""
@@ -24,6 +55,7 @@ class TimeSlot:
     slot_code: str
     slot_type: str = 'academic'  # academic, break, lunch_break, extra_curricular
 
+@_slotted
 @dataclass
 class Teacher:
     """Represents a teacher with constraints"""
@@ -33,7 +65,9 @@ class Teacher:
     qualifications: List[str]
     max_hours: int
     unavailability: Dict[str, List[str]]
+    preferred_rooms: List[int] = field(default_factory=list)
     
+@_slotted
 @dataclass
 class Subject:
     """Represents a subject with requirements"""
@@ -47,6 +81,7 @@ class Subject:
     special_room: Optional[str]
     min_capacity: int
 
+@_slotted
 @dataclass
 class Classroom:
     """Represents a classroom with facilities"""
@@ -56,7 +91,10 @@ class Classroom:
     room_type: str
     capacity: int
     facilities: Dict[str, bool]
+    building: Optional[str] = None
+    availability: Dict[str, List[str]] = field(default_factory=dict)
 
+@_slotted
 @dataclass
 class StudentGroup:
     """Represents a student group/class"""
@@ -66,6 +104,7 @@ class StudentGroup:
     student_count: int
     coordinator_id: Optional[int]
 
+@_slotted
 @dataclass
 class ClassSession:
     """Represents a single class session to be scheduled"""
@@ -77,6 +116,7 @@ class ClassSession:
     duration: int
     required_room_type: Optional[str]
     min_capacity: int
+    periods: int = 1  # consecutive time slots the session occupies, from its time slot on
     
     # Assigned values (to be filled during scheduling)
     classroom_id: Optional[int] = None
@@ -84,6 +124,160 @@ class ClassSession:
     day: Optional[str] = None
     start_time: Optional[str] = None
 
+def _minutes(clock: str) -> int:
+    hours, minutes = clock.split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+def contiguous_runs(time_slots: Dict[int, TimeSlot], periods: int) -> Dict[int, Tuple[int, ...]]:
+    """Runs of `periods` consecutive time slots on one day, keyed by their first slot.
+
+    A slot follows the previous one if it starts at most RUN_MAX_GAP minutes
+    after that one ends, so a lab may run through a short break but not
+    through lunch.
+    """
+    by_day = defaultdict(list)
+    for time_slot in time_slots.values():
+        by_day[time_slot.day].append(time_slot)
+    runs = {}
+    for day_slots in by_day.values():
+        day_slots.sort(key=lambda time_slot: time_slot.start_time)
+        first = 0
+        for index, time_slot in enumerate(day_slots):
+            if index and _minutes(time_slot.start_time) - _minutes(day_slots[index - 1].end_time) > RUN_MAX_GAP:
+                first = index
+            if index - first + 1 >= periods:
+                run = day_slots[index - periods + 1:index + 1]
+                runs[run[0].id] = tuple(time_slot.id for time_slot in run)
+    return runs
+
+def _slot_runs(data: Dict, periods: int) -> Dict[int, Tuple[int, ...]]:
+    """contiguous_runs of data['time_slots'], cached in data['domain_cache'] once there is one"""
+    cache = data.get('domain_cache')
+    if cache is None:
+        return contiguous_runs(data['time_slots'], periods)
+    runs = cache['runs'].get(periods)
+    if runs is None:
+        runs = cache['runs'][periods] = contiguous_runs(data['time_slots'], periods)
+    return runs
+
+def covered_slots(data: Dict, time_slot_id: int, periods: int) -> Tuple[int, ...]:
+    """Time slots a session of `periods` periods placed at `time_slot_id` occupies.
+    A slot that starts no run of that length stands for itself alone."""
+    if periods == 1:
+        return (time_slot_id,)
+    return _slot_runs(data, periods).get(time_slot_id, (time_slot_id,))
+
+def _bits(mask: int):
+    """Single-bit masks set in `mask`, lowest first"""
+    while mask:
+        bit = mask & -mask
+        yield bit
+        mask ^= bit
+
+def _unavailable_window(entry: str) -> Optional[Tuple[int, int, bool, str]]:
+    """(first minute, past-the-end minute, whether any overlap counts, label) of an unavailability entry"""
+    if entry == 'all_day':
+        return 0, 24 * 60, False, ''
+    if entry in DAY_PARTS:
+        # Day parts rule out the slots starting in them
+        return DAY_PARTS[entry] + (False, f'in the {entry}')
+    first, separator, last = entry.partition('-')
+    if not separator:
+        return None
+    try:
+        return _minutes(first), _minutes(last), True, f'from {first} to {last}'
+    except ValueError:
+        return None
+
+def unavailable_slots(unavailability: Dict[str, List[str]], time_slots: Dict[int, TimeSlot]) -> Dict[int, str]:
+    """The time slots a weekly unavailability rules out, each with the reason.
+
+    `unavailability` maps a day to entries that are 'all_day', 'morning' or
+    'afternoon' (the slots starting 9:00-12:00 or 14:00-17:00), or a time
+    range 'HH:MM-HH:MM', which rules out every slot overlapping it. Other
+    entries are ignored.
+    """
+    windows = {}
+    for day, entries in unavailability.items():
+        windows[day.lower()] = [window for window in map(_unavailable_window, entries) if window]
+    blocked = {}
+    for time_slot in time_slots.values():
+        day = time_slot.day.lower()
+        if not windows.get(day):
+            continue
+        start, end = _minutes(time_slot.start_time), _minutes(time_slot.end_time)
+        for first, last, overlap, label in windows[day]:
+            if (first < end and start < last) if overlap else first <= start < last:
+                blocked[time_slot.id] = f'{label} on {day}'.strip()
+                break
+    return blocked
+
+def closed_slots(availability: Dict[str, List[str]], time_slots: Dict[int, TimeSlot]) -> Dict[int, str]:
+    """The time slots a classroom's availability constraints close it in, each with the reason.
+
+    `availability` maps a reason to 'day_entry' strings, e.g.
+    {"maintenance": ["monday_09:00-10:00", "friday"]}, where the entry is any
+    unavailable_slots() takes; a bare day closes the whole day.
+    """
+    blocked = {}
+    for reason, entries in availability.items():
+        by_day = defaultdict(list)
+        for entry in entries:
+            day, _, window = entry.partition('_')
+            by_day[day].append(window or 'all_day')
+        for time_slot_id, when in unavailable_slots(by_day, time_slots).items():
+            blocked.setdefault(time_slot_id, f'for {reason} {when}')
+    return blocked
+
+class Availability:
+    """Teacher and classroom unavailability compiled into time slot bitmasks.
+
+    Compiled once per loaded data set (see slot_availability), so checking a
+    placement is one AND of the entity's mask with the bits of the slots it
+    covers. Bits follow the order of data['time_slots'], like
+    OccupancyIndex.slot_bits. The blocked slots of each entity, with their
+    reasons, are kept for error messages.
+    """
+    def __init__(self, data: Dict):
+        time_slots = data['time_slots']
+        self.slot_bits = {time_slot_id: 1 << index for index, time_slot_id in enumerate(time_slots)}
+        self.spans = {}
+        self.teacher_slots = {}
+        self.room_slots = {}
+        for teacher_id, teacher in data['teachers'].items():
+            blocked = unavailable_slots(teacher.unavailability, time_slots)
+            if blocked:
+                self.teacher_slots[teacher_id] = blocked
+        for classroom_id, classroom in data['classrooms'].items():
+            blocked = closed_slots(classroom.availability, time_slots)
+            if blocked:
+                self.room_slots[classroom_id] = blocked
+        self.teacher_masks = {teacher_id: self.mask(blocked) for teacher_id, blocked in self.teacher_slots.items()}
+        self.room_masks = {classroom_id: self.mask(blocked) for classroom_id, blocked in self.room_slots.items()}
+
+    def mask(self, time_slot_ids) -> int:
+        return sum(self.slot_bits[time_slot_id] for time_slot_id in time_slot_ids)
+
+    def span(self, data: Dict, time_slot_id: int, periods: int) -> int:
+        """Slots, as a bitmask, a session of `periods` periods placed at a slot covers"""
+        span = self.spans.get((time_slot_id, periods))
+        if span is None:
+            span = self.spans[(time_slot_id, periods)] = self.mask(covered_slots(data, time_slot_id, periods))
+        return span
+
+    @staticmethod
+    def reason(blocked: Dict[int, str], data: Dict, time_slot_id: int, periods: int) -> str:
+        """Why the first blocked slot a session placed at a slot covers is blocked"""
+        return next(blocked[covered_id] for covered_id in covered_slots(data, time_slot_id, periods)
+                    if covered_id in blocked)
+
+def slot_availability(data: Dict) -> Availability:
+    """The compiled unavailability of `data`, kept in data['availability']"""
+    availability = data.get('availability')
+    if availability is None:
+        availability = data['availability'] = Availability(data)
+    return availability
+
 class Constraint:
     """Base class for scheduling constraints"""
     def __init__(self, name: str, severity: str = 'critical'):
@@ -93,6 +287,11 @@ class Constraint:
     def check(self, session: ClassSession, assignments: Dict, data: Dict) -> Tuple[bool, str]:
         """Check if the constraint is satisfied. Returns (is_satisfied, reason)"""
         raise NotImplementedError
+    
+    def culprits(self, session: ClassSession, domains: 'DomainStore') -> Optional[Set[str]]:
+        """Ids of the placed sessions that make `session` fail this constraint, for
+        backjumping. None means unknown, and the search then blames every placed session."""
+        return None
 
 class NoDoubleBookingConstraint(Constraint):
     """Ensures no teacher, room, or group is double-booked"""
@@ -105,13 +304,27 @@ class NoDoubleBookingConstraint(Constraint):
         
         time_slot_id = session.time_slot_id
         
+        # Constant-time lookup when the search maintains an occupancy index
+        occupancy = data.get('occupancy')
+        if occupancy is not None:
+            periods = session.periods
+            if occupancy.teacher_busy(session.teacher_id, time_slot_id, session.id, periods):
+                return False, f"Teacher double-booked at time slot {time_slot_id}"
+            if occupancy.room_busy(session.classroom_id, time_slot_id, session.id, periods):
+                return False, f"Classroom {session.classroom_id} double-booked at time slot {time_slot_id}"
+            if occupancy.group_busy(session.group_id, time_slot_id, session.id, periods):
+                return False, f"Student group {session.group_id} double-booked at time slot {time_slot_id}"
+            return True, ""
+        
         # Check for conflicts with already scheduled sessions
+        time_slot_ids = set(covered_slots(data, time_slot_id, session.periods))
         for scheduled_id, scheduled_session in assignments.items():
-            if scheduled_id == session.id:
+            if scheduled_id == session.id or scheduled_session.time_slot_id is None:
                 continue
                 
-            if scheduled_session.time_slot_id == time_slot_id:
-                # Same time slot - check for conflicts
+            if time_slot_ids.intersection(covered_slots(data, scheduled_session.time_slot_id,
+                                                        scheduled_session.periods)):
+                # Overlapping time slots - check for conflicts
                 
                 # Teacher conflict
                 if scheduled_session.teacher_id == session.teacher_id:
@@ -126,6 +339,9 @@ class NoDoubleBookingConstraint(Constraint):
                     return False, f"Student group {session.group_id} double-booked at time slot {time_slot_id}"
         
         return True, ""
+    
+    def culprits(self, session: ClassSession, domains: 'DomainStore') -> Optional[Set[str]]:
+        return domains.holders(session, session.time_slot_id)
 
 class TeacherAvailabilityConstraint(Constraint):
     """Ensures teachers are scheduled only when available"""
@@ -136,34 +352,19 @@ class TeacherAvailabilityConstraint(Constraint):
         if not session.time_slot_id or not session.teacher_id:
             return True, ""
         
-        teacher = data['teachers'].get(session.teacher_id)
-        time_slot = data['time_slots'].get(session.time_slot_id)
-        
-        if not teacher or not time_slot:
+        availability = slot_availability(data)
+        mask = availability.teacher_masks.get(session.teacher_id)
+        # Every period of a multi-period session must be free
+        if not mask or not mask & availability.span(data, session.time_slot_id, session.periods):
             return True, ""
         
-        # Check teacher unavailability
-        unavailability = teacher.unavailability
-        day = time_slot.day.lower()
-        
-        if day in unavailability:
-            unavailable_slots = unavailability[day]
-            
-            # Check if teacher is unavailable all day
-            if 'all_day' in unavailable_slots:
-                return False, f"Teacher {teacher.name} is unavailable on {day}"
-            
-            # Check specific time slots
-            for slot in unavailable_slots:
-                if slot in ['morning', 'afternoon']:
-                    # Implementation for morning/afternoon checks
-                    slot_hour = int(time_slot.start_time.split(':')[0])
-                    if slot == 'morning' and 9 <= slot_hour < 12:
-                        return False, f"Teacher {teacher.name} is unavailable in the morning on {day}"
-                    elif slot == 'afternoon' and 14 <= slot_hour < 17:
-                        return False, f"Teacher {teacher.name} is unavailable in the afternoon on {day}"
-        
-        return True, ""
+        teacher = data['teachers'][session.teacher_id]
+        reason = availability.reason(availability.teacher_slots[session.teacher_id], data,
+                                     session.time_slot_id, session.periods)
+        return False, f"Teacher {teacher.name} is unavailable {reason}"
+    
+    def culprits(self, session: ClassSession, domains: 'DomainStore') -> Optional[Set[str]]:
+        return set()
 
 class RoomSuitabilityConstraint(Constraint):
     """Ensures rooms meet subject requirements"""
@@ -194,6 +395,31 @@ class RoomSuitabilityConstraint(Constraint):
                 return False, f"Subject {subject.name} requires {subject.special_room} but classroom {classroom.name} is {classroom.room_type}"
         
         return True, ""
+    
+    def culprits(self, session: ClassSession, domains: 'DomainStore') -> Optional[Set[str]]:
+        return set()
+
+class RoomAvailabilityConstraint(Constraint):
+    """Ensures classrooms are not used while closed, e.g. for maintenance"""
+    def __init__(self):
+        super().__init__("Room Availability", "critical")
+    
+    def check(self, session: ClassSession, assignments: Dict, data: Dict) -> Tuple[bool, str]:
+        if not session.time_slot_id or not session.classroom_id:
+            return True, ""
+        
+        availability = slot_availability(data)
+        mask = availability.room_masks.get(session.classroom_id)
+        if not mask or not mask & availability.span(data, session.time_slot_id, session.periods):
+            return True, ""
+        
+        classroom = data['classrooms'][session.classroom_id]
+        reason = availability.reason(availability.room_slots[session.classroom_id], data,
+                                     session.time_slot_id, session.periods)
+        return False, f"Classroom {classroom.name} is closed {reason}"
+    
+    def culprits(self, session: ClassSession, domains: 'DomainStore') -> Optional[Set[str]]:
+        return set()
 
 class TeacherQualificationConstraint(Constraint):
     """Ensures teachers are qualified for assigned subjects"""
@@ -215,12 +441,20 @@ class TeacherQualificationConstraint(Constraint):
             return False, f"Teacher {teacher.name} is not qualified to teach {subject.name}"
         
         return True, ""
+    
+    def culprits(self, session: ClassSession, domains: 'DomainStore') -> Optional[Set[str]]:
+        return set()
 
 class WorkloadConstraint(Constraint):
     """Ensures teachers don't exceed maximum weekly periods (EduTrack: 20 periods of 45 min each)"""
     def __init__(self):
         super().__init__("Teacher Workload", "major")
     
+    @staticmethod
+    def max_periods(teacher: Teacher) -> int:
+        """EduTrack specific: Maximum 20 academic periods (45 min each) per week"""
+        return min(teacher.max_hours, 20)
+    
     def check(self, session: ClassSession, assignments: Dict, data: Dict) -> Tuple[bool, str]:
         if not session.teacher_id:
             return True, ""
@@ -229,21 +463,893 @@ class WorkloadConstraint(Constraint):
         if not teacher:
             return True, ""
         
-        # Count current weekly academic periods for this teacher (excluding breaks)
-        weekly_periods = 0
-        for scheduled_session in assignments.values():
-            if (scheduled_session.teacher_id == session.teacher_id and
-                hasattr(scheduled_session, 'time_slot_type') and
-                scheduled_session.time_slot_type == 'academic'):
-                weekly_periods += 1
+        # Count current weekly academic periods for this teacher (only academic slots are scheduled)
+        occupancy = data.get('occupancy')
+        if occupancy is not None:
+            weekly_periods = occupancy.load_excluding(session.teacher_id, session.id)
+        else:
+            weekly_periods = 0
+            for scheduled_id, scheduled_session in assignments.items():
+                if (scheduled_id != session.id and
+                    scheduled_session.teacher_id == session.teacher_id and
+                    scheduled_session.time_slot_id is not None):
+                    weekly_periods += scheduled_session.periods
         
-        # EduTrack specific: Maximum 20 academic periods (45 min each) per week
-        max_periods = min(teacher.max_hours, 20)  # Enforce 20-period limit for EduTrack
+        max_periods = self.max_periods(teacher)
         
-        if weekly_periods >= max_periods:
+        if weekly_periods + session.periods > max_periods:
             return False, f"Teacher {teacher.name} would exceed maximum weekly periods ({max_periods})"
         
         return True, ""
+    
+    def culprits(self, session: ClassSession, domains: 'DomainStore') -> Optional[Set[str]]:
+        return domains.teacher_sessions(session.teacher_id)
+
+class OccupancyIndex:
+    """Incremental teacher/room/group x time slot occupancy for O(1) conflict checks.
+
+    Each entity owns an integer bitset with one bit per time slot, plus a
+    per-teacher count of scheduled periods. The search updates the index on
+    every assign/unassign instead of rescanning all assignments. The index
+    remembers where each session was placed so that checking a session that
+    is already booked ignores its own booking, like the full scan does. A
+    session of several periods books the whole run of slots it starts (see
+    contiguous_runs) as one bitmask, so checking it costs no more than
+    checking a single period.
+    """
+    # Positions in a placement tuple (time_slot_id, teacher_id, classroom_id, group_id, span)
+    TEACHER, ROOM, GROUP, SPAN = 1, 2, 3, 4
+    
+    def __init__(self, time_slots: Dict[int, TimeSlot]):
+        self.time_slots = time_slots
+        self.slot_bits = {slot_id: 1 << index for index, slot_id in enumerate(time_slots)}
+        self.bit_slots = {bit: slot_id for slot_id, bit in self.slot_bits.items()}
+        self.teacher_slots = defaultdict(int)
+        self.room_slots = defaultdict(int)
+        self.group_slots = defaultdict(int)
+        self.teacher_load = defaultdict(int)
+        self.placements = {}
+        # Bookings per (kind, entity, slot); only above 1 when fixed entries already clash
+        self.holders = defaultdict(int)
+        # Slot bitmask of every run, by run length and first slot
+        self.spans = {}
+    
+    def runs(self, periods: int) -> Dict[int, int]:
+        """Slot bitmasks of the runs of `periods` consecutive slots, by their first slot"""
+        runs = self.spans.get(periods)
+        if runs is None:
+            runs = self.spans[periods] = {
+                first: sum(self.slot_bits[time_slot_id] for time_slot_id in run)
+                for first, run in contiguous_runs(self.time_slots, periods).items()
+            }
+        return runs
+    
+    def span(self, time_slot_id: int, periods: int = 1) -> int:
+        """Slots, as a bitmask, occupied by a session of `periods` periods placed at a slot"""
+        if periods == 1:
+            return self.slot_bits[time_slot_id]
+        return self.runs(periods).get(time_slot_id) or self.slot_bits[time_slot_id]
+    
+    def _busy(self, kind: int, slots: Dict, entity_id: int, time_slot_id: int,
+              session_id: Optional[str], periods: int) -> bool:
+        busy = slots[entity_id] & self.span(time_slot_id, periods)
+        if not busy:
+            return False
+        placement = self.placements.get(session_id)
+        if placement and placement[kind] == entity_id:
+            # Slots the session holds itself only count if someone else holds them too
+            for bit in _bits(busy & placement[self.SPAN]):
+                if self.holders[(kind, entity_id, self.bit_slots[bit])] < 2:
+                    busy ^= bit
+        return bool(busy)
+    
+    def teacher_busy(self, teacher_id: int, time_slot_id: int, session_id: Optional[str] = None,
+                     periods: int = 1) -> bool:
+        return self._busy(self.TEACHER, self.teacher_slots, teacher_id, time_slot_id, session_id, periods)
+    
+    def room_busy(self, classroom_id: int, time_slot_id: int, session_id: Optional[str] = None,
+                  periods: int = 1) -> bool:
+        return self._busy(self.ROOM, self.room_slots, classroom_id, time_slot_id, session_id, periods)
+    
+    def group_busy(self, group_id: int, time_slot_id: int, session_id: Optional[str] = None,
+                   periods: int = 1) -> bool:
+        return self._busy(self.GROUP, self.group_slots, group_id, time_slot_id, session_id, periods)
+    
+    def load_excluding(self, teacher_id: int, session_id: Optional[str] = None) -> int:
+        """Scheduled periods of a teacher, not counting the given session's own booking"""
+        load = self.teacher_load[teacher_id]
+        placement = self.placements.get(session_id)
+        if placement and placement[self.TEACHER] == teacher_id:
+            load -= bin(placement[self.SPAN]).count('1')
+        return load
+    
+    def assign(self, session: ClassSession):
+        """Mark the session's teacher, room and group as busy in each of its time slots"""
+        if session.id in self.placements:
+            self.unassign(session)
+        span = self.span(session.time_slot_id, session.periods)
+        placement = (session.time_slot_id, session.teacher_id, session.classroom_id, session.group_id, span)
+        self.teacher_slots[session.teacher_id] |= span
+        self.room_slots[session.classroom_id] |= span
+        self.group_slots[session.group_id] |= span
+        for bit in _bits(span):
+            time_slot_id = self.bit_slots[bit]
+            for kind in (self.TEACHER, self.ROOM, self.GROUP):
+                self.holders[(kind, placement[kind], time_slot_id)] += 1
+        self.teacher_load[session.teacher_id] += bin(span).count('1')
+        self.placements[session.id] = placement
+    
+    def close_room(self, classroom_id: int, mask: int):
+        """Book a room for the slots of `mask` (same bits as slot_bits), like a fixed
+        assignment, so the search counts it as taken while it is closed"""
+        self.room_slots[classroom_id] |= mask
+        for bit in _bits(mask):
+            self.holders[(self.ROOM, classroom_id, self.bit_slots[bit])] += 1
+    
+    def unassign(self, session: ClassSession):
+        """Release the slots held by a session that is being backtracked"""
+        placement = self.placements.pop(session.id, None)
+        if placement is None:
+            return
+        span = placement[self.SPAN]
+        for bit in _bits(span):
+            time_slot_id = self.bit_slots[bit]
+            for kind, slots in ((self.TEACHER, self.teacher_slots), (self.ROOM, self.room_slots),
+                                (self.GROUP, self.group_slots)):
+                key = (kind, placement[kind], time_slot_id)
+                self.holders[key] -= 1
+                if not self.holders[key]:
+                    del self.holders[key]
+                    slots[placement[kind]] &= ~bit
+        self.teacher_load[placement[self.TEACHER]] -= bin(span).count('1')
+
+class DomainStore:
+    """Live domains for every session, pruned by forward checking.
+
+    A session's domain is the set of time slots it can still use plus its room
+    class: the set of rooms suitable for it, shared by every session that
+    accepts exactly the same rooms. Instead of pruning single rooms from every
+    session, the store counts free rooms per (room class, time slot) and drops
+    the slot from a class's sessions only once that count reaches zero, so an
+    assignment costs O(sessions sharing its teacher or group) rather than
+    O(all sessions). Every change is pushed onto a trail so unassign() restores
+    it exactly. A session's time slots are kept as an integer bitmask over the
+    occupancy index's slot bits rather than a set, which keeps the store a few
+    dozen bytes per session on large institutes. The store also tracks, per
+    teacher, how many periods are still pending against how many they have
+    left, so an overloaded teacher fails the search at once. `hints` holds
+    each session's warm-start (time slot, classroom), which the search tries
+    before its other values.
+
+    For a session of several periods a time slot stands for the run of slots
+    starting there. Room classes are per run length as well, and a room
+    counts as free for a run only if it is free in all of its slots, so an
+    assignment removes from each neighbour exactly the runs that overlap it.
+
+    Every assignment is also numbered with its level, the number of store
+    assignments below it, which is its frame's depth in the search stack.
+    culprits() returns the levels of the assignments that took values from a
+    session's domain as a bitmask, which the search uses to backjump.
+    """
+    def __init__(self, sessions: List[ClassSession], teacher_capacity: Dict[int, int],
+                 occupancy: 'OccupancyIndex', hints: Optional[Dict[str, Tuple[int, int]]] = None):
+        self.sessions = {session.id: session for session in sessions}
+        self.occupancy = occupancy
+        self.hints = hints or {}
+        # Slot bits in slot id order, for turning a bitmask back into slot ids
+        self.slot_order = sorted(occupancy.slot_bits.items())
+        self.values = {}
+        self.initial = {}
+        self.sizes = {}
+        self.degree = {}
+        self.unassigned = set()
+        self.trail = []
+        # MRV heap of (size, tie-break key); entries go stale when a size changes
+        self.order = {}
+        self.heap = []
+        
+        self.by_teacher = defaultdict(list)
+        self.by_group = defaultdict(list)
+        for session in sessions:
+            self.by_teacher[session.teacher_id].append(session.id)
+            self.by_group[session.group_id].append(session.id)
+        
+        # Room classes: (rooms tuple, periods) -> class id, with members and free rooms per run
+        self.class_ids = {}
+        self.class_rooms = []
+        self.class_periods = []
+        self.class_members = []
+        self.classes_by_room = defaultdict(list)
+        self.session_class = {}
+        self.free_rooms = {}
+        # Per run length, the runs covering each slot bit, as a bitmask of their first slots
+        self.covering = {}
+        
+        # Level of each assigned session; levels holding a room per (room class, slot), as a bitmask
+        self.level = {}
+        self.room_holder = {}
+        self.class_levels = defaultdict(int)
+        
+        # Weekly periods each teacher still has free, and periods still waiting for one
+        self.teacher_free = dict(teacher_capacity)
+        self.teacher_pending = defaultdict(int)
+    
+    def _room_class(self, rooms: Tuple[int, ...], periods: int) -> int:
+        class_id = self.class_ids.get((rooms, periods))
+        if class_id is None:
+            class_id = self.class_ids[(rooms, periods)] = len(self.class_rooms)
+            self.class_rooms.append(rooms)
+            self.class_periods.append(periods)
+            self.class_members.append([])
+            for classroom_id in rooms:
+                self.classes_by_room[classroom_id].append(class_id)
+            for time_slot_id in self.occupancy.runs(periods):
+                self.free_rooms[(class_id, time_slot_id)] = sum(
+                    1 for classroom_id in rooms
+                    if not self.occupancy.room_busy(classroom_id, time_slot_id, periods=periods))
+        return class_id
+    
+    def set_domain(self, session: ClassSession, time_slot_ids: Set[int], rooms: Tuple[int, ...]):
+        """Install the initial domain for a session; `rooms` is shared with other sessions, in a fixed order"""
+        class_id = self._room_class(rooms, session.periods)
+        self.session_class[session.id] = class_id
+        self.class_members[class_id].append(session.id)
+        slot_bits = self.occupancy.slot_bits
+        usable = [time_slot_id for time_slot_id in time_slot_ids
+                  if self.free_rooms.get((class_id, time_slot_id))] if rooms else []
+        self.values[session.id] = self.initial[session.id] = sum(slot_bits[time_slot_id] for time_slot_id in usable)
+        self.sizes[session.id] = len(usable)
+        if session.time_slot_id is None or session.classroom_id is None:
+            self.unassigned.add(session.id)
+            self.teacher_pending[session.teacher_id] += session.periods
+    
+    def teacher_feasible(self, teacher_id: int) -> bool:
+        """A teacher's pending periods must fit in their remaining weekly periods"""
+        free = self.teacher_free.get(teacher_id)
+        return free is None or self.teacher_pending[teacher_id] <= free
+    
+    def finalize(self):
+        """Compute the static degree (sessions sharing a teacher or group) used for tie-breaking"""
+        for session_id, session in self.sessions.items():
+            neighbours = set(self.by_teacher[session.teacher_id]) | set(self.by_group[session.group_id])
+            self.degree[session_id] = len(neighbours) - 1
+            self.order[session_id] = (len(self.class_rooms[self.session_class[session_id]]),
+                                      -self.degree[session_id], session_id)
+        self.heap = [(self.sizes[session_id], self.order[session_id]) for session_id in self.unassigned]
+        heapq.heapify(self.heap)
+    
+    def _resized(self, session_id: str):
+        heapq.heappush(self.heap, (self.sizes[session_id], self.order[session_id]))
+    
+    def slots(self, session_id: str) -> List[int]:
+        """Time slots a session can still use, in a stable order"""
+        mask = self.values[session_id]
+        return [time_slot_id for time_slot_id, bit in self.slot_order if mask & bit]
+    
+    def rooms(self, session_id: str, time_slot_id: int) -> List[int]:
+        """Suitable rooms still free in a time slot (all of its run), tightest fit first"""
+        periods = self.sessions[session_id].periods
+        return [classroom_id for classroom_id in self.class_rooms[self.session_class[session_id]]
+                if not self.occupancy.room_busy(classroom_id, time_slot_id, periods=periods)]
+    
+    def candidates(self, session_id: str) -> List[Tuple[int, int]]:
+        """Remaining (time_slot_id, classroom_id) pairs for a session"""
+        return [(time_slot_id, classroom_id)
+                for time_slot_id in self.slots(session_id)
+                for classroom_id in self.rooms(session_id, time_slot_id)]
+    
+    def _overlapping(self, periods: int, span: int) -> int:
+        """First slots, as a bitmask, of the runs of `periods` slots sharing a slot with `span`"""
+        if periods == 1:
+            return span
+        covering = self.covering.get(periods)
+        if covering is None:
+            covering = self.covering[periods] = defaultdict(int)
+            for time_slot_id, run in self.occupancy.runs(periods).items():
+                for bit in _bits(run):
+                    covering[bit] |= self.occupancy.slot_bits[time_slot_id]
+        found = 0
+        for bit in _bits(span):
+            found |= covering.get(bit, 0)
+        return found
+    
+    def _remove(self, session_id: str, mask: int, removed: List):
+        lost = self.values[session_id] & mask
+        if lost:
+            self.values[session_id] ^= lost
+            self.sizes[session_id] -= bin(lost).count('1')
+            self._resized(session_id)
+            removed.append((session_id, lost))
+    
+    def _room_runs(self, session: ClassSession, span: int):
+        """(room class, first slot bit) of every run that the session's room is free for
+        apart from the session itself, and that shares a slot with it"""
+        occupancy = self.occupancy
+        # The room is never double-booked by the search, so this is its booking without the session
+        elsewhere = occupancy.room_slots[session.classroom_id] & ~span
+        for class_id in self.classes_by_room[session.classroom_id]:
+            runs = occupancy.runs(self.class_periods[class_id])
+            for bit in _bits(self._overlapping(self.class_periods[class_id], span)):
+                if not runs[occupancy.bit_slots[bit]] & elsewhere:
+                    yield class_id, bit
+    
+    def assign(self, session: ClassSession) -> bool:
+        """Forward-check an assignment, after the session was added to the occupancy index.
+        Returns False if any remaining domain is wiped out or the teacher can no
+        longer fit their pending periods.
+
+        A trail entry is always pushed, so every assign() must be paired with unassign().
+        """
+        removed = []
+        occupancy = self.occupancy
+        span = occupancy.span(session.time_slot_id, session.periods)
+        level = self.level[session.id] = len(self.trail)
+        for bit in _bits(span):
+            self.room_holder[(session.classroom_id, occupancy.bit_slots[bit])] = session.id
+        self.unassigned.discard(session.id)
+        self.teacher_pending[session.teacher_id] -= session.periods
+        if session.teacher_id in self.teacher_free:
+            self.teacher_free[session.teacher_id] -= session.periods
+        
+        # Teacher and group can't be anywhere else while the session runs
+        overlapping = {}
+        for session_ids in (self.by_teacher[session.teacher_id], self.by_group[session.group_id]):
+            for session_id in session_ids:
+                if session_id in self.unassigned:
+                    periods = self.sessions[session_id].periods
+                    if periods not in overlapping:
+                        overlapping[periods] = self._overlapping(periods, span)
+                    self._remove(session_id, overlapping[periods], removed)
+        
+        # One room fewer for every run of every class containing it; a class with
+        # no room left loses the run altogether
+        for class_id, bit in self._room_runs(session, span):
+            key = (class_id, occupancy.bit_slots[bit])
+            self.class_levels[key] |= 1 << level
+            self.free_rooms[key] -= 1
+            if not self.free_rooms[key]:
+                for session_id in self.class_members[class_id]:
+                    if session_id in self.unassigned:
+                        self._remove(session_id, bit, removed)
+        
+        self.trail.append(removed)
+        if not self.teacher_feasible(session.teacher_id):
+            return False
+        return all(self.sizes[session_id] for session_id, _ in removed)
+    
+    def unassign(self, session: ClassSession):
+        """Undo the pruning done by the matching assign(), before the occupancy index releases it"""
+        occupancy = self.occupancy
+        span = occupancy.span(session.time_slot_id, session.periods)
+        for session_id, lost in self.trail.pop():
+            self.values[session_id] |= lost
+            self.sizes[session_id] += bin(lost).count('1')
+            self._resized(session_id)
+        level_bit = 1 << self.level.pop(session.id)
+        for class_id, bit in self._room_runs(session, span):
+            key = (class_id, occupancy.bit_slots[bit])
+            self.free_rooms[key] += 1
+            self.class_levels[key] ^= level_bit
+        for bit in _bits(span):
+            del self.room_holder[(session.classroom_id, occupancy.bit_slots[bit])]
+        self.unassigned.add(session.id)
+        self._resized(session.id)
+        self.teacher_pending[session.teacher_id] += session.periods
+        if session.teacher_id in self.teacher_free:
+            self.teacher_free[session.teacher_id] += session.periods
+    
+    def teacher_sessions(self, teacher_id: int) -> Set[str]:
+        """Sessions of a teacher that are already assigned"""
+        return {session_id for session_id in self.by_teacher[teacher_id] if session_id in self.level}
+    
+    def holders(self, session: ClassSession, time_slot_id: int) -> Set[str]:
+        """Assigned sessions using the session's teacher, group or classroom while it would run"""
+        occupancy = self.occupancy
+        span = occupancy.span(time_slot_id, session.periods)
+        found = set()
+        for holder_id in self.by_teacher[session.teacher_id] + self.by_group[session.group_id]:
+            if holder_id in self.level:
+                holder = self.sessions[holder_id]
+                if occupancy.span(holder.time_slot_id, holder.periods) & span:
+                    found.add(holder_id)
+        for bit in _bits(span):
+            room_holder = self.room_holder.get((session.classroom_id, occupancy.bit_slots[bit]))
+            if room_holder:
+                found.add(room_holder)
+        found.discard(session.id)
+        return found
+    
+    def culprits(self, session_ids: List[str]) -> Tuple[int, int]:
+        """Levels, as (slot, room) bitmasks, of the assignments that took the sessions'
+        initial values: per session and time slot, the one holding its teacher or else
+        its group there, which is to blame for the slot alone, or failing both, every
+        one holding one of its suitable rooms, which is to blame for its room too"""
+        occupancy = self.occupancy
+        level = self.level
+        slot_found = 0
+        # Slots left to blame on room holders, merged per room class
+        class_left = defaultdict(int)
+        for session_id in session_ids:
+            session = self.sessions[session_id]
+            left = self.initial[session_id]
+            for holders in (self.by_teacher[session.teacher_id], self.by_group[session.group_id]):
+                for holder_id in holders:
+                    if holder_id in level:
+                        holder = self.sessions[holder_id]
+                        taken = left & self._overlapping(
+                            session.periods, occupancy.span(holder.time_slot_id, holder.periods))
+                        if taken:
+                            slot_found |= 1 << level[holder_id]
+                            left ^= taken
+            class_left[self.session_class[session_id]] |= left
+        room_found = 0
+        class_levels = self.class_levels
+        for class_id, left in class_left.items():
+            for bit in _bits(left):
+                room_found |= class_levels.get((class_id, occupancy.bit_slots[bit]), 0)
+        return slot_found, room_found
+    
+    def shares_slot(self, session: ClassSession, session_id: str) -> bool:
+        """Whether another session loses a slot to `session` through its teacher or group"""
+        other = self.sessions[session_id]
+        return other.teacher_id == session.teacher_id or other.group_id == session.group_id
+    
+    def wiped_out(self) -> List[str]:
+        """Sessions whose domain the last assign() emptied"""
+        return [session_id for session_id, _ in self.trail[-1] if not self.sizes[session_id]]
+    
+    def select(self) -> Optional[ClassSession]:
+        """MRV: fewest remaining time slots first, then fewest suitable rooms, then highest degree"""
+        heap = self.heap
+        while heap:
+            size, order = heap[0]
+            session_id = order[-1]
+            if session_id in self.unassigned and self.sizes[session_id] == size:
+                return self.sessions[session_id]
+            heapq.heappop(heap)
+        return None
+
+class GenerationCancelled(Exception):
+    """Raised inside a running search once its generation has been cancelled"""
+
+class GenerationPaused(Exception):
+    """Raised by a paused search; `checkpoint` resumes it via backtrack_search"""
+    def __init__(self, checkpoint: Optional[Dict] = None):
+        super().__init__('Generation paused')
+        self.checkpoint = checkpoint
+
+class SearchMonitor:
+    """Progress counters of a running search plus cooperative stop and pause flags.
+
+    Solvers call tick() as they work. At most every `interval` seconds it hands
+    the monitor to on_progress. It raises GenerationCancelled as soon as
+    cancel() has been called, and GenerationPaused after pause().
+
+    The backtracking search also records its tree (nodes, maximum depth,
+    domain wipeouts), the calls, failures and time of each constraint class
+    and the time spent propagating placements into the other domains, plus a
+    trace sampled every `trace_interval` nodes. report() returns all of it.
+    """
+    def __init__(self, on_progress=None, interval: float = PROGRESS_INTERVAL):
+        self.on_progress = on_progress
+        self.interval = interval
+        self.started = time.time()
+        self.placed = 0
+        self.backtracks = 0
+        self.constraint_checks = 0
+        self.nodes = 0
+        self.max_depth = 0
+        self.wipeouts = 0
+        self.propagation_seconds = 0.0
+        self.constraint_stats = defaultdict(lambda: [0, 0, 0.0])  # class name -> [calls, failures, seconds]
+        self.trace = []
+        self.trace_interval = TRACE_INTERVAL
+        self.backjumps = 0
+        self.nogoods = 0
+        self.best_score = None
+        self._stop = threading.Event()
+        self._pause = threading.Event()
+        self._next_report = self.started + interval
+    
+    def cancel(self):
+        self._stop.set()
+    
+    def pause(self):
+        """Ask a checkpointing search to stop and hand back its state"""
+        self._pause.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._stop.is_set()
+    
+    def tick(self):
+        self._check()
+        now = time.time()
+        if now >= self._next_report:
+            self._next_report = now + self.interval
+            if self.on_progress:
+                self.on_progress(self)
+            self._check()
+    
+    def _check(self):
+        if self._stop.is_set():
+            raise GenerationCancelled()
+        if self._pause.is_set():
+            raise GenerationPaused()
+    
+    def record_check(self, constraint: Constraint, seconds: float, satisfied: bool):
+        stats = self.constraint_stats[type(constraint).__name__]
+        stats[0] += 1
+        stats[1] += not satisfied
+        stats[2] += seconds
+    
+    def record_node(self, depth: int, session_id: str):
+        self.nodes += 1
+        self.max_depth = max(self.max_depth, depth)
+        if self.nodes % self.trace_interval:
+            return
+        self.trace.append({
+            'node': self.nodes,
+            'depth': depth,
+            'session': session_id,
+            'placed': self.placed,
+            'backtracks': self.backtracks,
+            'elapsed': round(time.time() - self.started, 3)
+        })
+        if len(self.trace) >= TRACE_LIMIT:
+            del self.trace[::2]
+            self.trace_interval *= 2
+    
+    def snapshot(self) -> Dict:
+        return {
+            'sessions_placed': self.placed,
+            'backtracks': self.backtracks,
+            'constraint_checks': self.constraint_checks,
+            'backjumps': self.backjumps,
+            'nogoods': self.nogoods,
+            'best_score': self.best_score,
+            'elapsed': round(time.time() - self.started, 2)
+        }
+    
+    def report(self) -> Dict:
+        """Everything recorded, as JSON-ready data for the generation log"""
+        return {
+            'search': {
+                'nodes': self.nodes,
+                'backtracks': self.backtracks,
+                'max_depth': self.max_depth,
+                'wipeouts': self.wipeouts,
+                'backjumps': self.backjumps,
+                'nogoods': self.nogoods,
+                'constraint_checks': self.constraint_checks
+            },
+            'constraints': {
+                name: {'calls': calls, 'failures': failures, 'seconds': round(seconds, 4)}
+                for name, (calls, failures, seconds) in sorted(self.constraint_stats.items(),
+                                                               key=lambda item: -item[1][2])
+            },
+            'propagation_seconds': round(self.propagation_seconds, 4),
+            'elapsed': round(time.time() - self.started, 3),
+            'trace_interval': self.trace_interval,
+            'trace': list(self.trace)
+        }
+
+class BacktrackingSearch:
+    """Depth-first search over an explicit stack, one frame per assigned session.
+
+    A frame is [session, slots, slot index, rooms, room index, seed, assigned,
+    slot blame, room blame, wiped out]. Each frame shuffles its session's
+    remaining time slots with its own seed, then, one slot at a time, that
+    slot's free rooms with seed + slot index, so candidates are produced lazily
+    instead of materialising every (slot, room) pair. The stack can therefore
+    be checkpointed as (session id, seed, slot index, room index, assigned,
+    blame, wiped out) per frame plus the seed generator's state, and rebuilt
+    later by replaying the assignments in order. A session's warm-start hint,
+    if it is still a candidate, is tried first.
+
+    Dead ends are handled by conflict-directed backjumping. A frame's blame is
+    the set of frames below it, as bitmasks of depths, that caused its failed
+    candidates: the holders of the domains its candidates wiped out
+    (DomainStore.culprits), the sessions named by failing constraints
+    (Constraint.culprits) and whatever the deeper frames that jumped back to it
+    were blamed on. Slot blame means only the frame's time slot mattered (it
+    holds a teacher or group there), room blame that its room did too. A frame
+    that runs out of candidates jumps straight to the deepest frame it blames,
+    skipping the frames in between, whose choices had nothing to do with the
+    failure; if that frame is only blamed for its slot, its other rooms in the
+    slot are skipped as well. The blamed placements are learned as a nogood,
+    and a candidate that would complete a learned nogood is rejected without
+    checking any constraint.
+    """
+    CHECKPOINT_VERSION = 2
+    
+    def __init__(self, generator, domains: DomainStore, assignments: Dict, data: Dict,
+                 max_backtracks: Optional[int] = None):
+        self.generator = generator
+        self.domains = domains
+        self.assignments = assignments
+        self.data = data
+        self.occupancy = data['occupancy']
+        self.monitor = data.get('monitor')
+        self.stack = []
+        self.depth = {}
+        self.backtracks = 0
+        self.max_backtracks = max_backtracks
+        self.constraints = {constraint.name: constraint for constraint in generator.constraints}
+        # Learned nogoods by each of their (session id, time slot, classroom or None) members
+        self.nogoods = defaultdict(list)
+        self.learned = 0
+        # True when the next step picks a new session, False when backing out of a dead end
+        self.descend = True
+        # Frame seeds come from a private generator so a resumed search draws the same ones
+        self.random = random.Random(random.randrange(2 ** 31))
+    
+    def _push(self, session: ClassSession, seed: int) -> List:
+        slots = self.domains.slots(session.id)
+        random.Random(seed).shuffle(slots)
+        hint = self.domains.hints.get(session.id)
+        if hint and hint[0] in slots:
+            slots.remove(hint[0])
+            slots.insert(0, hint[0])
+        frame = [session, slots, -1, [], 0, seed, False, 0, 0, set()]
+        self.depth[session.id] = len(self.stack)
+        self.stack.append(frame)
+        if self.monitor:
+            self.monitor.record_node(len(self.stack), session.id)
+        return frame
+    
+    def _pop(self):
+        frame = self.stack.pop()
+        session = frame[0]
+        if frame[6]:
+            self._unassign(session)
+            frame[6] = False
+        session.time_slot_id = None
+        session.classroom_id = None
+        del self.depth[session.id]
+    
+    def _load_rooms(self, frame: List):
+        """Free rooms, in shuffled order, for the frame's current slot"""
+        session, slots, slot_index = frame[0], frame[1], frame[2]
+        rooms = self.domains.rooms(session.id, slots[slot_index])
+        random.Random(frame[5] + slot_index).shuffle(rooms)
+        hint = self.domains.hints.get(session.id)
+        if hint and hint[0] == slots[slot_index] and hint[1] in rooms:
+            rooms.remove(hint[1])
+            rooms.insert(0, hint[1])
+        frame[3] = rooms
+    
+    def _next_candidate(self, frame: List) -> Optional[Tuple[int, int]]:
+        while frame[4] >= len(frame[3]):
+            frame[2] += 1
+            if frame[2] >= len(frame[1]):
+                return None
+            self._load_rooms(frame)
+            frame[4] = 0
+        candidate = (frame[1][frame[2]], frame[3][frame[4]])
+        frame[4] += 1
+        return candidate
+    
+    def _assign(self, session: ClassSession, time_slot_id: int, classroom_id: int) -> bool:
+        """Place a session; False (with the placement still recorded) if forward checking fails"""
+        session.time_slot_id = time_slot_id
+        session.classroom_id = classroom_id
+        time_slot = self.data['time_slots'].get(time_slot_id)
+        if time_slot:
+            session.day = time_slot.day
+            session.start_time = time_slot.start_time
+        
+        self.assignments[session.id] = session
+        self.occupancy.assign(session)
+        if not self.monitor:
+            return self.domains.assign(session)
+        self.monitor.placed = max(self.monitor.placed, len(self.assignments))
+        started = time.perf_counter()
+        consistent = self.domains.assign(session)
+        self.monitor.propagation_seconds += time.perf_counter() - started
+        if not consistent:
+            self.monitor.wipeouts += 1
+        return consistent
+    
+    def _unassign(self, session: ClassSession):
+        self.domains.unassign(session)
+        del self.assignments[session.id]
+        self.occupancy.unassign(session)
+        session.time_slot_id = None
+        session.classroom_id = None
+        session.day = None
+        session.start_time = None
+        self.backtracks += 1
+        if self.monitor:
+            self.monitor.backtracks += 1
+    
+    def _depths(self, session_ids) -> int:
+        mask = 0
+        for session_id in session_ids:
+            if session_id in self.depth:
+                mask |= 1 << self.depth[session_id]
+        return mask
+    
+    def _violation_culprits(self, session: ClassSession, violations: List[str]) -> int:
+        """Frames blamed, room included, for failed constraints, from their 'name: reason' messages"""
+        found = set()
+        for violation in violations:
+            constraint = self.constraints.get(violation.split(':', 1)[0])
+            culprits = constraint.culprits(session, self.domains) if constraint else None
+            if culprits is None:
+                return (1 << len(self.stack)) - 1
+            found |= culprits
+        return self._depths(found)
+    
+    def _nogood_culprits(self, session: ClassSession, candidate: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+        """(slot blame, room blame) for the rest of a learned nogood the candidate
+        would complete, or None"""
+        sessions = self.domains.sessions
+        time_slot_id, classroom_id = candidate
+        for key in ((session.id, time_slot_id, classroom_id), (session.id, time_slot_id, None)):
+            for nogood in self.nogoods.get(key, ()):
+                others = [member for member in nogood if member[0] != session.id]
+                if all(member[0] in self.depth and
+                       sessions[member[0]].time_slot_id == member[1] and
+                       member[2] in (None, sessions[member[0]].classroom_id)
+                       for member in others):
+                    return (self._depths(member[0] for member in others if member[2] is None),
+                            self._depths(member[0] for member in others if member[2] is not None))
+        return None
+    
+    def _learn(self, slot_blame: int, room_blame: int):
+        """Remember that the blamed placements can't all stand together"""
+        blame = slot_blame | room_blame
+        if bin(blame).count('1') > NOGOOD_MAX_SIZE or self.learned >= NOGOOD_LIMIT:
+            return
+        nogood = tuple((frame[0].id, frame[0].time_slot_id, frame[0].classroom_id if room_blame >> depth & 1 else None)
+                       for depth, frame in enumerate(self.stack) if blame >> depth & 1)
+        for member in nogood:
+            self.nogoods[member].append(nogood)
+        self.learned += 1
+        if self.monitor:
+            self.monitor.nogoods += 1
+    
+    def _session_ids(self, mask: int) -> List[str]:
+        return [frame[0].id for depth, frame in enumerate(self.stack) if mask >> depth & 1]
+    
+    def checkpoint(self) -> Dict:
+        """JSON-serialisable state of the stack"""
+        version, internal_state, gauss_next = self.random.getstate()
+        return {
+            'version': self.CHECKPOINT_VERSION,
+            'frames': [[frame[0].id, frame[5], frame[2], frame[4], frame[6],
+                        self._session_ids(frame[7]), self._session_ids(frame[8]), sorted(frame[9])]
+                       for frame in self.stack],
+            'descend': self.descend,
+            'random_state': [version, list(internal_state), gauss_next],
+            'backtracks': self.monitor.backtracks if self.monitor else 0
+        }
+    
+    def restore(self, checkpoint: Dict):
+        """Rebuild the stack from a checkpoint by replaying its assignments in order.
+        Version 1 checkpoints carry no blame, so each of their frames blames every
+        frame below it, which backs up one frame at a time like plain backtracking."""
+        version = checkpoint.get('version')
+        if version not in (1, self.CHECKPOINT_VERSION):
+            raise ValueError('Unsupported search checkpoint version')
+        for saved in checkpoint['frames']:
+            session_id, seed, slot_index, room_index, assigned = saved[:5]
+            session = self.domains.select()
+            if session is None or session.id != session_id:
+                raise ValueError('Checkpoint does not match the sessions being scheduled')
+            if version == 1:
+                slot_blame, room_blame, wiped = 0, (1 << len(self.stack)) - 1, set()
+            else:
+                slot_blame, room_blame, wiped = self._depths(saved[5]), self._depths(saved[6]), set(saved[7])
+            frame = self._push(session, seed)
+            frame[7], frame[8], frame[9] = slot_blame, room_blame, wiped
+            frame[2] = slot_index
+            if slot_index >= 0:
+                self._load_rooms(frame)
+            frame[4] = room_index
+            if assigned:
+                self._assign(session, frame[1][slot_index], frame[3][room_index - 1])
+                frame[6] = True
+        self.descend = checkpoint['descend']
+        version, internal_state, gauss_next = checkpoint['random_state']
+        self.random.setstate((version, tuple(internal_state), gauss_next))
+        if self.monitor:
+            self.monitor.backtracks = checkpoint.get('backtracks', 0)
+    
+    def _backjump(self, frame: List) -> bool:
+        """Pop a frame that ran out of candidates and jump back to the deepest frame it
+        blames. False if it blames none: then no earlier choice can make it fit."""
+        session = frame[0]
+        below = (1 << (len(self.stack) - 1)) - 1
+        # Whoever took this session's other values is to blame too
+        frame[9].add(session.id)
+        slot_culprits, room_culprits = self.domains.culprits(frame[9])
+        room_blame = (frame[8] | room_culprits) & below
+        slot_blame = (frame[7] | slot_culprits) & below & ~room_blame
+        self._pop()
+        blame = slot_blame | room_blame
+        if not blame:
+            return False
+        
+        self._learn(slot_blame, room_blame)
+        target = blame.bit_length() - 1
+        while len(self.stack) > target + 1:
+            self._pop()
+            if self.monitor:
+                self.monitor.backjumps += 1
+        frame = self.stack[-1]
+        bit = 1 << target
+        if not room_blame & bit:
+            frame[4] = len(frame[3])  # Any other room in this slot would fail the same way
+        frame[7] |= slot_blame & ~bit
+        frame[8] |= room_blame & ~bit
+        return True
+    
+    def run(self) -> bool:
+        check_constraints = self.generator.check_constraints
+        
+        while True:
+            if self.monitor:
+                try:
+                    self.monitor.tick()
+                except GenerationPaused:
+                    raise GenerationPaused(self.checkpoint())
+            if self.max_backtracks is not None and self.backtracks > self.max_backtracks:
+                return False  # Gave up; the stack is left as it was
+            
+            if self.descend:
+                # MRV (Minimum Remaining Values) with degree tie-breaking
+                session = self.domains.select()
+                if session is None:
+                    return True  # All sessions assigned successfully
+                # Candidates are tried in a random order to avoid always getting the same solution
+                self._push(session, self.random.randrange(2 ** 31))
+            
+            frame = self.stack[-1]
+            session = frame[0]
+            
+            # Coming back from a dead end below: undo this frame's assignment
+            if frame[6]:
+                self._unassign(session)
+                frame[6] = False
+            
+            self.descend = False
+            candidate = self._next_candidate(frame)
+            while candidate is not None:
+                blamed = self._nogood_culprits(session, candidate) if self.nogoods else None
+                if blamed is not None:
+                    frame[7] |= blamed[0]
+                    frame[8] |= blamed[1]
+                    candidate = self._next_candidate(frame)
+                    continue
+                
+                time_slot_id, classroom_id = candidate
+                session.time_slot_id = time_slot_id
+                session.classroom_id = classroom_id
+                if self.monitor:
+                    self.monitor.constraint_checks += 1
+                satisfied, violations = check_constraints(session, self.assignments, self.data)
+                if satisfied:
+                    # Prune remaining domains; go deeper only if none was wiped out
+                    frame[6] = True
+                    if self._assign(session, time_slot_id, classroom_id):
+                        self.descend = True
+                        break
+                    wiped = self.domains.wiped_out()
+                    frame[9].update(wiped)
+                    if not self.domains.teacher_feasible(session.teacher_id):
+                        frame[8] |= self._depths(self.domains.teacher_sessions(session.teacher_id))
+                    if any(self.domains.shares_slot(session, session_id) for session_id in wiped):
+                        frame[4] = len(frame[3])  # Another room in this slot wipes it out too
+                    self._unassign(session)
+                    frame[6] = False
+                else:
+                    frame[8] |= self._violation_culprits(session, violations)
+                candidate = self._next_candidate(frame)
+            
+            if not self.descend and not self._backjump(frame):
+                return False
 
 class TimetableGenerator:
     """Main timetable generation engine"""
@@ -254,14 +1360,13 @@ class TimetableGenerator:
             TeacherAvailabilityConstraint(),
             TeacherQualificationConstraint(),
             RoomSuitabilityConstraint(),
+            RoomAvailabilityConstraint(),
             WorkloadConstraint()
         ]
         
     def get_db_connection(self):
-        """Get database connection"""
-        conn = sqlite3.connect('school_system.db')
-        conn.row_factory = sqlite3.Row
-        return conn
+        """Get a pooled database connection"""
+        return get_connection(sqlite3.Row)
     
     def load_data(self, academic_year: str, semester: int) -> Dict:
         """Load all necessary data for timetable generation"""
@@ -286,7 +1391,8 @@ class TimetableGenerator:
                     name=f"{teacher['first_name']} {teacher['last_name']}",
                     qualifications=json.loads(teacher['subject_qualifications'] or '[]'),
                     max_hours=teacher['max_hours_per_week'],
-                    unavailability=json.loads(teacher['weekly_unavailability'] or '{}')
+                    unavailability=json.loads(teacher['weekly_unavailability'] or '{}'),
+                    preferred_rooms=json.loads(teacher['preferred_rooms'] or '[]')
                 )
             
             # Load subjects
@@ -313,7 +1419,9 @@ class TimetableGenerator:
                     name=classroom['room_name'],
                     room_type=classroom['room_type'],
                     capacity=classroom['seating_capacity'],
-                    facilities=json.loads(classroom['facilities'] or '{}')
+                    facilities=json.loads(classroom['facilities'] or '{}'),
+                    building=classroom['building_name'],
+                    availability=json.loads(classroom['availability_constraints'] or '{}')
                 )
             
             # Load student groups
@@ -358,6 +1466,8 @@ class TimetableGenerator:
         finally:
             conn.close()
         
+        # Unavailability is compiled to slot bitmasks once, not parsed on every check
+        slot_availability(data)
         return data
     
     def create_class_sessions(self, data: Dict) -> List[ClassSession]:
@@ -399,171 +1509,500 @@ class TimetableGenerator:
                     session_type=session_type,
                     duration=session_duration,
                     required_room_type=subject.special_room,
-                    min_capacity=subject.min_capacity
+                    min_capacity=subject.min_capacity,
+                    periods=max(1, session_duration // PERIOD_MINUTES)
                 )
                 sessions.append(session)
         
         return sessions
     
-    def get_domain_values(self, session: ClassSession, data: Dict) -> Dict:
-        """Get possible values for each variable (time_slot, classroom)"""
-        domain = {
-            'time_slots': list(data['time_slots'].keys()),
-            'classrooms': []
-        }
-        
-        # Filter classrooms based on requirements
+    def _domain_cache(self, data: Dict) -> Dict:
+        """Per-`data` cache of domains, shared by every session with the same requirements"""
+        cache = data.get('domain_cache')
+        if cache is None:
+            cache = data['domain_cache'] = {
+                'time_slots': tuple(data['time_slots']),
+                # Room types without underscores, so matching does no string work per session
+                'room_types': {classroom_id: classroom.room_type.replace('_', '')
+                               for classroom_id, classroom in data['classrooms'].items()},
+                'rooms': {},
+                'unary': {},
+                'runs': {}
+            }
+        return cache
+    
+    def suitable_rooms(self, session: ClassSession, data: Dict) -> Tuple[int, ...]:
+        """Classrooms big enough and of the right type for a session, tightest fit first.
+
+        Computed once per (group size, special room) and shared between sessions.
+        """
         subject = data['subjects'].get(session.subject_id)
         group = data['groups'].get(session.group_id)
+        if not group:
+            return ()
         
-        for classroom_id, classroom in data['classrooms'].items():
-            # Check capacity
-            if group and classroom.capacity >= group.student_count:
-                # Check room type if special room required
-                if subject and subject.special_room:
-                    if subject.special_room.replace('_', '') in classroom.room_type.replace('_', ''):
-                        domain['classrooms'].append(classroom_id)
-                else:
-                    domain['classrooms'].append(classroom_id)
-        
-        return domain
+        special_room = subject.special_room if subject else None
+        key = (group.student_count, special_room)
+        cache = self._domain_cache(data)
+        rooms = cache['rooms'].get(key)
+        if rooms is None:
+            required_type = special_room.replace('_', '') if special_room else None
+            room_types = cache['room_types']
+            suitable = [classroom for classroom_id, classroom in data['classrooms'].items()
+                        # Check capacity, then room type if special room required
+                        if classroom.capacity >= group.student_count and
+                        (required_type is None or required_type in room_types[classroom_id])]
+            # Smallest adequate rooms first keeps the large ones free for large groups
+            suitable.sort(key=lambda classroom: (classroom.capacity, classroom.id))
+            rooms = cache['rooms'][key] = tuple(classroom.id for classroom in suitable)
+        return rooms
+    
+    def get_domain_values(self, session: ClassSession, data: Dict) -> Dict:
+        """Get possible values for each variable (time_slot, classroom)"""
+        return {
+            'time_slots': list(self._domain_cache(data)['time_slots']),
+            'classrooms': list(self.suitable_rooms(session, data))
+        }
     
     def check_constraints(self, session: ClassSession, assignments: Dict, data: Dict) -> Tuple[bool, List[str]]:
-        """Check all constraints for a given assignment"""
+        """Check all constraints for a given assignment.
+
+        With a SearchMonitor in data['monitor'], each check is timed and counted.
+        """
         violations = []
         all_satisfied = True
+        monitor = data.get('monitor')
         
         for constraint in self.constraints:
-            satisfied, reason = constraint.check(session, assignments, data)
+            if monitor is None:
+                satisfied, reason = constraint.check(session, assignments, data)
+            else:
+                started = time.perf_counter()
+                satisfied, reason = constraint.check(session, assignments, data)
+                monitor.record_check(constraint, time.perf_counter() - started, satisfied)
             if not satisfied:
                 all_satisfied = False
                 violations.append(f"{constraint.name}: {reason}")
         
         return all_satisfied, violations
     
-    def select_unassigned_variable(self, sessions: List[ClassSession]) -> Optional[ClassSession]:
-        """Select the next session to schedule using MRV (Most Remaining Values) heuristic"""
-        unassigned = [s for s in sessions if s.time_slot_id is None or s.classroom_id is None]
-        
-        if not unassigned:
-            return None
+    def unary_domain(self, session: ClassSession, data: Dict) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        """(time slots, classrooms) that pass every constraint with nothing else scheduled.
+
+        Any time slot can be combined with any of the classrooms. For a session
+        of several periods the time slots are the first slots of the runs whose
+        every slot passes. The result
+        only depends on what a session requires, not on its id, so sessions
+        with the same signature (e.g. the weekly lectures of one subject for
+        one group) share one computed, immutable domain.
+        """
+        signature = (session.group_id, session.subject_id, session.teacher_id, session.session_type,
+                     session.duration, session.required_room_type, session.min_capacity, session.periods)
+        cache = self._domain_cache(data)['unary']
+        domain = cache.get(signature)
+        if domain is not None:
+            return domain
         
-        # Use degree heuristic - pick sessions with most constraints first
-        priority_sessions = []
-        for session in unassigned:
-            priority = 0
-            
-            # Higher priority for lab sessions (longer duration)
-            if session.session_type == 'lab':
-                priority += 2
-            
-            # Higher priority for subjects with special room requirements
-            if session.required_room_type:
-                priority += 3
-            
-            priority_sessions.append((priority, session))
+        rooms = self.suitable_rooms(session, data)
+        time_slot_ids = ()
+        if rooms:
+            # Check slots in isolation, one period at a time: no other assignments and no occupancy index
+            slot_availability(data)  # compiled on `data` itself, not on the copy
+            unary_data = dict(data, occupancy=None)
+            probe = ClassSession(
+                id=session.id, group_id=session.group_id, subject_id=session.subject_id,
+                teacher_id=session.teacher_id, session_type=session.session_type,
+                duration=session.duration, required_room_type=session.required_room_type,
+                min_capacity=session.min_capacity
+            )
+            passing = []
+            for time_slot_id in self._domain_cache(data)['time_slots']:
+                probe.time_slot_id = time_slot_id
+                if self.check_constraints(probe, {}, unary_data)[0]:
+                    passing.append(time_slot_id)
+            if session.periods > 1:
+                runs = _slot_runs(data, session.periods)
+                allowed = set(passing)
+                passing = [time_slot_id for time_slot_id in passing if time_slot_id in runs and
+                           allowed.issuperset(runs[time_slot_id])]
+            time_slot_ids = tuple(passing)
         
-        # Sort by priority (descending) and return the highest priority session
-        priority_sessions.sort(key=lambda x: x[0], reverse=True)
-        return priority_sessions[0][1]
+        domain = cache[signature] = (time_slot_ids, rooms if time_slot_ids else ())
+        return domain
     
-    def backtrack_search(self, sessions: List[ClassSession], assignments: Dict, data: Dict) -> bool:
-        """Backtracking search algorithm for scheduling"""
-        session = self.select_unassigned_variable(sessions)
+    def initialize_domains(self, sessions: List[ClassSession], data: Dict) -> DomainStore:
+        """Build each session's initial domain for one search.
+
+        Keeps only time slots that pass the unary constraints and where the
+        teacher and group are not already taken in data['occupancy'] by fixed
+        assignments; rooms held by fixed assignments are discounted per slot.
+        Warm-start hints come from data['hints'].
+        """
+        occupancy = data['occupancy']
         
-        if session is None:
-            return True  # All sessions assigned successfully
+        # Weekly periods left per teacher after the fixed assignments
+        teacher_capacity = {
+            teacher_id: WorkloadConstraint.max_periods(teacher) - occupancy.teacher_load[teacher_id]
+            for teacher_id, teacher in data['teachers'].items()
+        }
+        domains = DomainStore(sessions, teacher_capacity, occupancy, data.get('hints'))
         
-        # Get domain values
-        domain = self.get_domain_values(session, data)
+        # Teachers with more sessions than weekly periods can never be satisfied
+        pending = defaultdict(int)
+        for session in sessions:
+            if session.time_slot_id is None or session.classroom_id is None:
+                pending[session.teacher_id] += session.periods
+        overloaded = {teacher_id for teacher_id, count in pending.items()
+                      if count > teacher_capacity.get(teacher_id, count)}
         
-        # Try all combinations of time slot and classroom
-        time_slots = list(domain['time_slots'])
-        classrooms = list(domain['classrooms'])
+        for session in sessions:
+            if session.teacher_id in overloaded:
+                domains.set_domain(session, set(), ())
+                continue
+            unary_slots, rooms = self.unary_domain(session, data)
+            time_slot_ids = {time_slot_id for time_slot_id in unary_slots
+                             if not (occupancy.teacher_busy(session.teacher_id, time_slot_id,
+                                                            periods=session.periods) or
+                                     occupancy.group_busy(session.group_id, time_slot_id,
+                                                          periods=session.periods))}
+            domains.set_domain(session, time_slot_ids, rooms)
         
-        # Randomize to avoid always getting the same solution
-        random.shuffle(time_slots)
-        random.shuffle(classrooms)
+        domains.finalize()
+        return domains
+    
+    def backtrack_search(self, sessions: List[ClassSession], assignments: Dict, data: Dict,
+                         monitor: Optional[SearchMonitor] = None,
+                         checkpoint: Optional[Dict] = None,
+                         max_backtracks: Optional[int] = None) -> bool:
+        """Backtracking search with forward checking and MRV ordering.
+
+        Sessions already in `assignments` stay fixed, and data['hints'] maps
+        session ids to a (time slot, classroom) to try first. Occupancy and
+        domains are built fresh for every call, so `data` can be reused
+        between searches; the unary domains cached in data['domain_cache']
+        and the unavailability compiled in data['availability'] are reused
+        too, so drop those keys after editing teachers, rooms or slots in
+        place. Closed classrooms are booked in the occupancy index up front.
+        Progress goes to `monitor`, which can also cancel or pause the search;
+        a paused search raises GenerationPaused carrying a checkpoint that can
+        be passed back here (with the same sessions and fixed assignments) to
+        resume exactly where it stopped. With `max_backtracks` the search gives
+        up (returns False, leaving `assignments` partly filled) once it has
+        backtracked that many times.
+        """
+        occupancy = OccupancyIndex(data['time_slots'])
+        for classroom_id, mask in slot_availability(data).room_masks.items():
+            occupancy.close_room(classroom_id, mask)
+        for fixed_session in assignments.values():
+            occupancy.assign(fixed_session)
         
-        for time_slot_id in time_slots:
-            for classroom_id in classrooms:
-                # Assign values
-                session.time_slot_id = time_slot_id
-                session.classroom_id = classroom_id
-                
-                time_slot = data['time_slots'].get(time_slot_id)
-                if time_slot:
-                    session.day = time_slot.day
-                    session.start_time = time_slot.start_time
-                
-                # Check constraints
-                satisfied, violations = self.check_constraints(session, assignments, data)
-                
-                if satisfied:
-                    # Add to assignments
-                    assignments[session.id] = session
-                    
-                    # Recursively try to assign remaining sessions
-                    if self.backtrack_search(sessions, assignments, data):
-                        return True
-                    
-                    # Backtrack - remove assignment
-                    del assignments[session.id]
-                
-                # Remove values for next iteration
-                session.time_slot_id = None
-                session.classroom_id = None
-                session.day = None
-                session.start_time = None
+        self._domain_cache(data)  # created on `data` itself so later searches reuse it
+        search_data = dict(data, occupancy=occupancy, monitor=monitor)
+        domains = self.initialize_domains(sessions, search_data)
+        search = BacktrackingSearch(self, domains, assignments, search_data, max_backtracks)
+        if checkpoint:
+            search.restore(checkpoint)
+        return search.run()
+    
+    def load_hints(self, sessions: List[ClassSession], data: Dict, academic_year: str, semester: int,
+                   source_year: Optional[str] = None,
+                   source_semester: Optional[int] = None) -> Dict[str, Tuple[int, int]]:
+        """Warm-start hints: the (time slot, classroom) each session had in a saved timetable.
+
+        The source is this semester's own timetable unless another academic
+        year or semester is given. Within one semester entries are matched to
+        sessions like in regenerate_timetable. Another semester has its own
+        group rows, so its entries are matched by group code, subject code and
+        session type instead.
+        """
+        source_year = source_year or academic_year
+        source_semester = source_semester or semester
+        if (source_year, source_semester) == (academic_year, semester):
+            matched, _ = self.match_entries(sessions, self.load_entries(academic_year, semester), data)
+            return {session_id: (entry['time_slot_id'], entry['classroom_id'])
+                    for session_id, entry in matched.items()
+                    if entry['time_slot_id'] in data['time_slots'] and entry['classroom_id'] in data['classrooms']}
+        
+        conn = self.get_db_connection()
+        try:
+            entries = conn.execute('''
+                SELECT g.group_code, s.subject_code, te.session_type, te.time_slot_id, te.classroom_id
+                FROM timetable_entries te
+                JOIN timetable_student_groups g ON te.group_id = g.id
+                JOIN timetable_subjects s ON te.subject_id = s.id
+                WHERE te.academic_year = ? AND te.semester = ? AND te.status = 'active'
+                ORDER BY te.id
+            ''', (source_year, source_semester)).fetchall()
+        finally:
+            conn.close()
+        
+        saved = defaultdict(list)
+        for group_code, subject_code, session_type, time_slot_id, classroom_id in entries:
+            if time_slot_id in data['time_slots'] and classroom_id in data['classrooms']:
+                saved[(group_code, subject_code, session_type)].append(
+                    {'time_slot_id': time_slot_id, 'classroom_id': classroom_id})
         
-        return False  # No valid assignment found
+        hints = {}
+        for session in sessions:
+            group = data['groups'].get(session.group_id)
+            subject = data['subjects'].get(session.subject_id)
+            placements = saved.get((group.code if group else None, subject.code if subject else None,
+                                    session.session_type))
+            if placements:
+                entry = self._take_run(placements, session, data)
+                hints[session.id] = (entry['time_slot_id'], entry['classroom_id'])
+        return hints
+    
+    def constraints_used(self, data: Optional[Dict] = None, assignments: Optional[Dict] = None) -> str:
+        """JSON for timetable_generations.constraints_used: the hard constraints, the
+        soft constraint weights from data['soft_weights'] and, given the finished
+        `assignments`, the timetable's soft score"""
+        from timetable_scoring import score_timetable, soft_weights
+        weights = (data or {}).get('soft_weights')
+        used = {
+            'hard': [c.name for c in self.constraints],
+            'soft_weights': soft_weights(weights)
+        }
+        if assignments is not None:
+            score = score_timetable(data, assignments, weights)
+            used['score'] = score['total']
+            used['penalties'] = score['penalties']
+        return json.dumps(used)
     
-    def save_timetable(self, assignments: Dict, academic_year: str, semester: int, admin_user_id: int) -> Dict:
-        """Save the generated timetable to database"""
+    def save_timetable(self, assignments: Dict, academic_year: str, semester: int, admin_user_id: int,
+                       generation_log: Optional[Dict] = None, generation_id: Optional[int] = None,
+                       data: Optional[Dict] = None, generation_time: Optional[float] = None,
+                       success_rate: Optional[float] = None) -> Dict:
+        """Save the generated timetable to database.
+
+        Only the difference to the semester's saved entries is written: active
+        entries the new timetable holds as they are stay untouched, the rest
+        are deleted and the missing ones inserted, in bulk and in the same
+        transaction as the generation record. Records a new generation, or
+        completes `generation_id` when the run was started as a background
+        job. A session of several periods is saved as one entry per period;
+        `data` is what the timetable was generated from, and is loaded again
+        if not given.
+        """
+        if data is None:
+            data = self.load_data(academic_year, semester)
         conn = self.get_db_connection()
         
         try:
-            # Clear existing timetable for this academic year and semester
-            conn.execute('''
-                DELETE FROM timetable_entries 
+            existing = defaultdict(list)
+            stale = []
+            for entry in conn.execute('''
+                SELECT id, group_id, subject_id, teacher_id, classroom_id, time_slot_id, session_type, status
+                FROM timetable_entries
                 WHERE academic_year = ? AND semester = ?
-            ''', (academic_year, semester))
+            ''', (academic_year, semester)):
+                if entry[7] == 'active':
+                    existing[tuple(entry[1:7])].append(entry[0])
+                else:
+                    stale.append(entry[0])
             
-            # Insert new timetable entries
+            added = []
             total_classes = 0
-            for session_id, session in assignments.items():
+            for session in assignments.values():
                 if session.time_slot_id and session.classroom_id:
-                    conn.execute('''
-                        INSERT INTO timetable_entries
-                        (academic_year, semester, group_id, subject_id, teacher_id, 
-                         classroom_id, time_slot_id, session_type, status, created_by)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        academic_year, semester, session.group_id, session.subject_id,
-                        session.teacher_id, session.classroom_id, session.time_slot_id,
-                        session.session_type, 'active', admin_user_id
-                    ))
+                    for time_slot_id in covered_slots(data, session.time_slot_id, session.periods):
+                        row = (session.group_id, session.subject_id, session.teacher_id,
+                               session.classroom_id, time_slot_id, session.session_type)
+                        if existing.get(row):
+                            existing[row].pop()
+                        else:
+                            added.append(row)
                     total_classes += 1
+            stale.extend(entry_id for entry_ids in existing.values() for entry_id in entry_ids)
+            
+            # Deletes first, so the one-booking-per-slot UNIQUE constraints never see both rows
+            conn.executemany('DELETE FROM timetable_entries WHERE id = ?', [(entry_id,) for entry_id in stale])
+            conn.executemany('''
+                INSERT INTO timetable_entries
+                (academic_year, semester, group_id, subject_id, teacher_id, 
+                 classroom_id, time_slot_id, session_type, status, created_by)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(academic_year, semester) + row + ('active', admin_user_id) for row in added])
+            if stale or added:
+                bump_version(conn, academic_year, semester)
             
             # Record generation metadata
+            constraints_used = self.constraints_used(data, assignments)
+            log_json = json.dumps(generation_log) if generation_log else None
+            if generation_id is None:
+                generation_cursor = conn.execute('''
+                    INSERT INTO timetable_generations
+                    (academic_year, semester, generation_method, constraints_used, 
+                     generation_status, total_classes_scheduled, generated_by, generation_log,
+                     generation_time_seconds, success_rate)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    academic_year, semester, 'auto', constraints_used,
+                    'completed', total_classes, admin_user_id, log_json,
+                    generation_time, success_rate
+                ))
+                generation_id = generation_cursor.lastrowid
+            else:
+                # Complete the job's record, unless it was cancelled in the meantime
+                generation_cursor = conn.execute('''
+                    UPDATE timetable_generations
+                    SET generation_status = 'completed', constraints_used = ?,
+                        total_classes_scheduled = ?, generation_log = ?,
+                        generation_time_seconds = ?, success_rate = ?
+                    WHERE id = ? AND generation_status = 'in_progress'
+                ''', (constraints_used, total_classes, log_json, generation_time, success_rate,
+                      generation_id))
+                if generation_cursor.rowcount == 0:
+                    conn.rollback()
+                    return {
+                        'success': False,
+                        'cancelled': True,
+                        'error': 'Generation was cancelled'
+                    }
+            conn.commit()
+            
+            return {
+                'success': True,
+                'total_classes': total_classes,
+                'generation_id': generation_id,
+                'inserted': len(added),
+                'deleted': len(stale)
+            }
+            
+        except Exception as e:
+            conn.rollback()
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            conn.close()
+    
+    def load_entries(self, academic_year: str, semester: int) -> List[Dict]:
+        """Active timetable entries of a semester, oldest first"""
+        conn = self.get_db_connection()
+        try:
+            entries = conn.execute('''
+                SELECT id, group_id, subject_id, teacher_id, classroom_id, time_slot_id, session_type
+                FROM timetable_entries
+                WHERE academic_year = ? AND semester = ? AND status = 'active'
+                ORDER BY id
+            ''', (academic_year, semester)).fetchall()
+        finally:
+            conn.close()
+        return [dict(entry) for entry in entries]
+    
+    def _take_run(self, candidates: List[Dict], session: ClassSession, data: Dict) -> Dict:
+        """Pop one session's saved entries off `candidates`: the first one and, for a session
+        of several periods, those in the same room holding the rest of its run.
+
+        Returns the first entry with the ids (`entry_ids`) and time slots
+        (`time_slot_ids`) of all of them.
+        """
+        if session.periods > 1:
+            # Earliest first, so the first entry of a run comes before the rest of it
+            def position(entry):
+                time_slot = data['time_slots'].get(entry['time_slot_id'])
+                return (time_slot.day, time_slot.start_time) if time_slot else ('~', '')
+            candidates.sort(key=position)
+        first = candidates.pop(0)
+        taken = [first]
+        for time_slot_id in covered_slots(data, first['time_slot_id'], session.periods)[1:]:
+            for entry in candidates:
+                if (entry['time_slot_id'] == time_slot_id and entry['classroom_id'] == first['classroom_id'] and
+                        entry.get('teacher_id') == first.get('teacher_id')):
+                    candidates.remove(entry)
+                    taken.append(entry)
+                    break
+        return dict(first, entry_ids=[entry.get('id') for entry in taken],
+                    time_slot_ids=tuple(entry['time_slot_id'] for entry in taken))
+    
+    def match_entries(self, sessions: List[ClassSession], entries: List[Dict],
+                      data: Dict) -> Tuple[Dict[str, Dict], List[Dict]]:
+        """Pair saved entries with sessions of the same group, subject and session type.
+
+        Returns (session id -> entry, entries left without a session). A
+        session of several periods is matched with the entries of its whole
+        run, see _take_run().
+        """
+        saved = defaultdict(list)
+        for entry in entries:
+            saved[(entry['group_id'], entry['subject_id'], entry['session_type'])].append(entry)
+        
+        matched = {}
+        for session in sessions:
+            candidates = saved.get((session.group_id, session.subject_id, session.session_type))
+            if candidates:
+                matched[session.id] = self._take_run(candidates, session, data)
+        orphans = [entry for candidates in saved.values() for entry in candidates]
+        return matched, orphans
+    
+    def save_changes(self, resolved: List[ClassSession], matched: Dict[str, Dict], orphans: List[Dict],
+                     academic_year: str, semester: int, admin_user_id: int,
+                     generation_log: Optional[Dict] = None, data: Optional[Dict] = None,
+                     assignments: Optional[Dict] = None, generation_time: Optional[float] = None) -> Dict:
+        """Write an incremental regeneration: only the entries that moved, appeared or went away.
+
+        Re-solved sessions that landed where their saved entries already were
+        are not touched. Stale rows are deleted before the new ones are
+        inserted so the one-booking-per-slot UNIQUE constraints never see both
+        at once. `data` gives sessions of several periods their runs, as in
+        save_timetable(); `assignments`, the whole timetable after the change,
+        is scored for the generation record.
+        """
+        if data is None:
+            data = self.load_data(academic_year, semester)
+        stale = [entry['id'] for entry in orphans]
+        added = []
+        moved = 0
+        for session in resolved:
+            entry = matched.get(session.id)
+            time_slot_ids = covered_slots(data, session.time_slot_id, session.periods)
+            if entry and (entry['time_slot_ids'], entry['classroom_id'], entry['teacher_id']) == \
+                    (time_slot_ids, session.classroom_id, session.teacher_id):
+                continue
+            if entry:
+                stale.extend(entry['entry_ids'])
+            added.extend((session, time_slot_id) for time_slot_id in time_slot_ids)
+            moved += 1
+        
+        conn = self.get_db_connection()
+        try:
+            conn.executemany('DELETE FROM timetable_entries WHERE id = ?', [(entry_id,) for entry_id in stale])
+            conn.executemany('''
+                INSERT INTO timetable_entries
+                (academic_year, semester, group_id, subject_id, teacher_id, 
+                 classroom_id, time_slot_id, session_type, status, created_by)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(
+                academic_year, semester, session.group_id, session.subject_id,
+                session.teacher_id, session.classroom_id, time_slot_id,
+                session.session_type, 'active', admin_user_id
+            ) for session, time_slot_id in added])
+            if stale or added:
+                bump_version(conn, academic_year, semester)
+            
+            # Fixed entries plus automatic placement is what the schema calls 'hybrid'
             generation_cursor = conn.execute('''
                 INSERT INTO timetable_generations
                 (academic_year, semester, generation_method, constraints_used, 
-                 generation_status, total_classes_scheduled, generated_by)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                 generation_status, total_classes_scheduled, generated_by, generation_log,
+                 generation_time_seconds, success_rate)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
-                academic_year, semester, 'auto', 
-                json.dumps([c.name for c in self.constraints]),
-                'completed', total_classes, admin_user_id
+                academic_year, semester, 'hybrid', self.constraints_used(data, assignments),
+                'completed', len(resolved), admin_user_id,
+                json.dumps(generation_log) if generation_log else None,
+                generation_time, 100.0
             ))
-            
-            generation_id = generation_cursor.lastrowid
             conn.commit()
             
             return {
                 'success': True,
-                'total_classes': total_classes,
-                'generation_id': generation_id
+                'generation_id': generation_cursor.lastrowid,
+                'inserted': len(added),
+                'deleted': len(stale),
+                'unchanged': len(resolved) - moved
             }
             
         except Exception as e:
@@ -576,13 +2015,46 @@ class TimetableGenerator:
             conn.close()
     
     def generate_timetable(self, academic_year: str = '2024-25', semester: int = 1, 
-                          method: str = 'auto', admin_user_id: int = 1) -> Dict:
-        """Main timetable generation method"""
+                          method: str = 'auto', admin_user_id: int = 1,
+                          time_budget: Optional[float] = None, seed: Optional[int] = None,
+                          workers: Optional[int] = None, monitor: Optional[SearchMonitor] = None,
+                          generation_id: Optional[int] = None, checkpoint: Optional[Dict] = None,
+                          warm_start=None, weights: Optional[Dict[str, float]] = None) -> Dict:
+        """Main timetable generation method.
+
+        method 'auto' runs the exhaustive backtracking search. method 'anneal'
+        runs simulated annealing for `time_budget` seconds and saves the best
+        conflict-free (possibly partial) timetable it found. method 'portfolio'
+        runs `workers` solvers in parallel and keeps the first complete result.
+        Background jobs pass their `monitor` and pre-created `generation_id`;
+        a paused 'auto' run returns a checkpoint to resume from. An 'auto'
+        run saves the monitor's report (search tree, per-constraint timing,
+        sampled trace) in the generation log under 'instrumentation'.
+        
+        `warm_start` seeds every method with a saved timetable: True for this
+        semester's current entries, or an (academic_year, semester) pair for
+        another one. Each session tries its previous slot and room first, so
+        the result stays close to the old timetable and only what no longer
+        fits is moved.
+        
+        `weights` override the soft constraint weights of timetable_scoring,
+        which annealing optimizes; the weights and the final soft score are
+        recorded with the generation.
+        """
         start_time = time.time()
         
+        if method not in GENERATION_METHODS:
+            return {
+                'success': False,
+                'error': f"Unknown generation method '{method}'. Use one of: {', '.join(GENERATION_METHODS)}"
+            }
+        
         try:
             # Load all data
             data = self.load_data(academic_year, semester)
+            if weights:
+                from timetable_scoring import soft_weights
+                data['soft_weights'] = soft_weights(weights)
             
             # Create sessions to be scheduled
             sessions = self.create_class_sessions(data)
@@ -593,35 +2065,65 @@ class TimetableGenerator:
                     'error': 'No sessions to schedule. Please ensure subjects are assigned to student groups.'
                 }
             
-            # Use backtracking search to find solution
+            if warm_start:
+                source_year, source_semester = (None, None) if warm_start is True else warm_start
+                data['hints'] = self.load_hints(sessions, data, academic_year, semester,
+                                                source_year, source_semester and int(source_semester))
+            
             assignments = {}
-            success = self.backtrack_search(sessions, assignments, data)
+            generation_log = None
+            if method == 'anneal':
+                from timetable_annealing import AnnealingSolver, DEFAULT_TIME_BUDGET
+                solver = AnnealingSolver(self, data, time_budget or DEFAULT_TIME_BUDGET, seed,
+                                         monitor=monitor)
+                generation_log = solver.solve(sessions, assignments)
+                success = bool(assignments)
+            elif method == 'portfolio':
+                from timetable_annealing import DEFAULT_TIME_BUDGET
+                from timetable_portfolio import PortfolioSolver
+                solver = PortfolioSolver(data, workers, time_budget or DEFAULT_TIME_BUDGET, seed,
+                                         monitor=monitor)
+                generation_log = solver.solve(sessions, assignments)
+                success = bool(assignments)
+            else:
+                # Use backtracking search to find solution
+                if seed is not None:
+                    random.seed(seed)
+                monitor = monitor or SearchMonitor()
+                success = self.backtrack_search(sessions, assignments, data, monitor, checkpoint)
+                generation_log = {'solver': 'backtracking', 'instrumentation': monitor.report()}
+            
+            if monitor:
+                generation_log = dict(generation_log or {}, progress=monitor.snapshot())
+            if warm_start:
+                kept = sum(1 for session_id, hint in data['hints'].items()
+                           if session_id in assignments and
+                           (assignments[session_id].time_slot_id, assignments[session_id].classroom_id) == hint)
+                generation_log = dict(generation_log or {}, warm_start={
+                    'hinted_sessions': len(data['hints']),
+                    'kept_placements': kept
+                })
             
             generation_time = time.time() - start_time
             
             if success:
                 # Save timetable to database
-                save_result = self.save_timetable(assignments, academic_year, semester, admin_user_id)
+                success_rate = (len(assignments) / len(sessions)) * 100
+                save_result = self.save_timetable(assignments, academic_year, semester, admin_user_id,
+                                                  generation_log, generation_id, data,
+                                                  generation_time, success_rate)
                 
                 if save_result['success']:
-                    success_rate = (len(assignments) / len(sessions)) * 100
-                    
-                    # Update generation record with timing info
-                    conn = self.get_db_connection()
-                    conn.execute('''
-                        UPDATE timetable_generations 
-                        SET generation_time_seconds = ?, success_rate = ?
-                        WHERE id = ?
-                    ''', (generation_time, success_rate, save_result['generation_id']))
-                    conn.commit()
-                    conn.close()
-                    
                     return {
                         'success': True,
                         'total_classes': save_result['total_classes'],
                         'success_rate': round(success_rate, 2),
                         'generation_id': save_result['generation_id'],
-                        'generation_time': round(generation_time, 2)
+                        'generation_time': round(generation_time, 2),
+                        'unscheduled_sessions': len(sessions) - len(assignments),
+                        'inserted': save_result['inserted'],
+                        'deleted': save_result['deleted'],
+                        'winner': (generation_log or {}).get('winner')
                     }
                 else:
                     return save_result
@@ -632,9 +2134,288 @@ class TimetableGenerator:
                     'generation_time': round(generation_time, 2)
                 }
             
+        except GenerationPaused as paused:
+            return {
+                'success': False,
+                'paused': True,
+                'checkpoint': paused.checkpoint,
+                'error': 'Generation was paused',
+                'generation_time': round(time.time() - start_time, 2)
+            }
+        except GenerationCancelled:
+            return {
+                'success': False,
+                'cancelled': True,
+                'error': 'Generation was cancelled',
+                'generation_time': round(time.time() - start_time, 2)
+            }
         except Exception as e:
             return {
                 'success': False,
                 'error': f'Generation failed: {str(e)}',
                 'generation_time': round(time.time() - start_time, 2)
-            }
\ No newline at end of file
+            }
+    
+    def generate_batch(self, terms, admin_user_id: int = 1, workers: Optional[int] = None,
+                       seed: Optional[int] = None, monitor: Optional[SearchMonitor] = None) -> Dict:
+        """Generate the timetables of several terms at once, sharing teachers and classrooms.
+
+        `terms` are (academic_year, semester) pairs. Their sessions are solved
+        together by timetable_batch.BatchSolver: independent components in
+        parallel over `workers` processes, components that share a teacher,
+        a group or, in the end, a classroom jointly. Each term is saved as its
+        own generation; terms without sessions are left as they are.
+        """
+        start_time = time.time()
+        terms = list(dict.fromkeys((academic_year, int(semester)) for academic_year, semester in terms))
+        if not terms:
+            return {
+                'success': False,
+                'error': 'No terms to generate. Pass (academic_year, semester) pairs.'
+            }
+        
+        try:
+            # Teachers, subjects, classrooms and time slots are shared; the terms differ in their groups' subjects
+            data = None
+            term_of_group = {}
+            for academic_year, semester in terms:
+                term_data = self.load_data(academic_year, semester)
+                if data is None:
+                    data = dict(term_data, group_subjects=[])
+                for gs in term_data['group_subjects']:
+                    term_of_group[gs['group_id']] = (academic_year, semester)
+                data['group_subjects'].extend(term_data['group_subjects'])
+            
+            sessions = self.create_class_sessions(data)
+            if not sessions:
+                return {
+                    'success': False,
+                    'error': 'No sessions to schedule. Please ensure subjects are assigned to student groups.'
+                }
+            
+            from timetable_batch import BatchSolver
+            assignments = {}
+            stats = BatchSolver(data, workers, seed, monitor).solve(sessions, assignments)
+            generation_time = time.time() - start_time
+            if not stats['success']:
+                return {
+                    'success': False,
+                    'error': 'Could not generate conflict-free timetables for these terms together. Please review teacher availability and room requirements.',
+                    'generation_time': round(generation_time, 2)
+                }
+            
+            by_term = {term: {} for term in terms}
+            for session_id, session in assignments.items():
+                by_term[term_of_group[session.group_id]][session_id] = session
+            saved = []
+            for (academic_year, semester), term_assignments in by_term.items():
+                if not term_assignments:
+                    continue
+                generation_log = dict(stats, terms=[list(term) for term in terms])
+                save_result = self.save_timetable(term_assignments, academic_year, semester, admin_user_id,
+                                                  generation_log, data=data,
+                                                  generation_time=generation_time, success_rate=100.0)
+                if not save_result['success']:
+                    return dict(save_result, saved_terms=saved)
+                saved.append({
+                    'academic_year': academic_year,
+                    'semester': semester,
+                    'generation_id': save_result['generation_id'],
+                    'total_classes': save_result['total_classes']
+                })
+            
+            return {
+                'success': True,
+                'terms': saved,
+                'components': stats['components'],
+                'coupled_components': stats['coupled_components'],
+                'rounds': len(stats['rounds']),
+                'generation_time': round(generation_time, 2)
+            }
+            
+        except GenerationCancelled:
+            return {
+                'success': False,
+                'cancelled': True,
+                'error': 'Generation was cancelled',
+                'generation_time': round(time.time() - start_time, 2)
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Batch generation failed: {str(e)}',
+                'generation_time': round(time.time() - start_time, 2)
+            }
+    
+    def _entry_holds(self, session: ClassSession, entry: Dict, unary_data: Dict) -> bool:
+        """Whether a saved entry is still a legal placement for its session on its own"""
+        if (entry['teacher_id'] != session.teacher_id or
+                entry['classroom_id'] not in unary_data['classrooms'] or
+                entry['time_slot_id'] not in unary_data['time_slots'] or
+                # All of a multi-period session's run must still be saved, and still be a run
+                _slot_runs(unary_data, session.periods).get(entry['time_slot_id']) != entry['time_slot_ids']):
+            return False
+        session.time_slot_id = entry['time_slot_id']
+        session.classroom_id = entry['classroom_id']
+        try:
+            return self.check_constraints(session, {}, unary_data)[0]
+        finally:
+            session.time_slot_id = session.classroom_id = None
+    
+    def _widen_scope(self, sessions: List[ClassSession], released: Set[str],
+                     matched: Dict[str, Dict], data: Dict) -> Set[str]:
+        """Released sessions plus every session sharing a group, teacher or special room with them"""
+        groups, teachers, rooms = set(), set(), set()
+        for session in sessions:
+            if session.id in released:
+                groups.add(session.group_id)
+                teachers.add(session.teacher_id)
+                if session.required_room_type:
+                    rooms.update(self.get_domain_values(session, data)['classrooms'])
+        
+        widened = set(released)
+        for session in sessions:
+            entry = matched.get(session.id)
+            if (session.group_id in groups or session.teacher_id in teachers or
+                    (entry and entry['classroom_id'] in rooms)):
+                widened.add(session.id)
+        return widened
+    
+    def _fix_entries(self, sessions: List[ClassSession], matched: Dict[str, Dict], released: Set[str],
+                     data: Dict) -> Tuple[Dict, List[ClassSession]]:
+        """Place every session outside `released` at its saved entry; return (assignments, to solve)"""
+        assignments = {}
+        to_solve = []
+        for session in sessions:
+            session.time_slot_id = session.classroom_id = None
+            session.day = session.start_time = None
+            if session.id in released:
+                to_solve.append(session)
+                continue
+            entry = matched[session.id]
+            time_slot = data['time_slots'][entry['time_slot_id']]
+            session.time_slot_id = entry['time_slot_id']
+            session.classroom_id = entry['classroom_id']
+            session.day = time_slot.day
+            session.start_time = time_slot.start_time
+            assignments[session.id] = session
+        return assignments, to_solve
+    
+    def regenerate_timetable(self, academic_year: str = '2024-25', semester: int = 1,
+                             group_ids=(), teacher_ids=(), classroom_ids=(),
+                             admin_user_id: int = 1, seed: Optional[int] = None,
+                             monitor: Optional[SearchMonitor] = None) -> Dict:
+        """Re-solve part of a saved timetable and keep everything else where it is.
+
+        Sessions of the given groups and teachers, and those booked in the
+        given classrooms, are placed again by the backtracking search with all
+        other saved entries fixed. Entries that no longer hold (teacher
+        reassigned, classroom deactivated, slot now unavailable, subject newly
+        added) are re-solved as well, and entries whose subject was removed
+        are deleted. If the fixed entries leave no solution, the scope is
+        widened step by step up to the whole semester. Only changed rows are
+        written.
+        """
+        start_time = time.time()
+        group_ids, teacher_ids, classroom_ids = set(group_ids), set(teacher_ids), set(classroom_ids)
+        
+        try:
+            data = self.load_data(academic_year, semester)
+            sessions = self.create_class_sessions(data)
+            matched, orphans = self.match_entries(sessions, self.load_entries(academic_year, semester), data)
+            
+            # Saved entries outside the scope stay fixed if they are still valid on their own
+            unary_data = dict(data, occupancy=None)
+            released = set()
+            kept_by_teacher = defaultdict(list)
+            for session in sessions:
+                entry = matched.get(session.id)
+                if entry is None or (
+                        session.group_id in group_ids or session.teacher_id in teacher_ids or
+                        entry['teacher_id'] in teacher_ids or entry['classroom_id'] in classroom_ids or
+                        not self._entry_holds(session, entry, unary_data)):
+                    released.add(session.id)
+                else:
+                    kept_by_teacher[session.teacher_id].append((session.id, session.periods))
+            
+            # A teacher whose fixed sessions alone exceed their weekly periods is re-solved in full
+            for teacher_id, kept in kept_by_teacher.items():
+                teacher = data['teachers'].get(teacher_id)
+                if teacher and sum(periods for _, periods in kept) > WorkloadConstraint.max_periods(teacher):
+                    released.update(session_id for session_id, _ in kept)
+            
+            # Released sessions still try their saved placement first
+            data['hints'] = {session_id: (entry['time_slot_id'], entry['classroom_id'])
+                             for session_id, entry in matched.items()
+                             if entry['time_slot_id'] in data['time_slots'] and
+                             entry['classroom_id'] in data['classrooms']}
+            
+            # The fixed entries may leave the released sessions no room at all, so give up
+            # early and widen: first to everything sharing a group, teacher or special room
+            # with them, then to the whole semester
+            scopes = [released, self._widen_scope(sessions, released, matched, data),
+                      {session.id for session in sessions}]
+            tried = []
+            monitor = monitor or SearchMonitor()
+            for scope in scopes:
+                if scope in tried:
+                    continue
+                tried.append(scope)
+                assignments, to_solve = self._fix_entries(sessions, matched, scope, data)
+                if seed is not None:
+                    random.seed(seed)
+                # Only the whole-semester search runs to the end
+                max_backtracks = None if len(scope) == len(sessions) else INCREMENTAL_BACKTRACK_LIMIT
+                success = self.backtrack_search(to_solve, assignments, data, monitor,
+                                                max_backtracks=max_backtracks)
+                if success:
+                    break
+            fixed_count = len(sessions) - len(to_solve)
+            generation_time = time.time() - start_time
+            
+            if not success:
+                return {
+                    'success': False,
+                    'error': 'Could not re-solve the affected sessions around the fixed timetable. Widen the scope or run a full generation.',
+                    'generation_time': round(generation_time, 2)
+                }
+            
+            generation_log = {
+                'solver': 'incremental',
+                'scope': {
+                    'group_ids': sorted(group_ids),
+                    'teacher_ids': sorted(teacher_ids),
+                    'classroom_ids': sorted(classroom_ids)
+                },
+                'fixed_sessions': fixed_count,
+                'resolved_sessions': len(to_solve),
+                'widened': len(tried) - 1
+            }
+            generation_log['progress'] = monitor.snapshot()
+            generation_log['instrumentation'] = monitor.report()
+            
+            save_result = self.save_changes(to_solve, matched, orphans, academic_year, semester,
+                                            admin_user_id, generation_log, data, assignments,
+                                            generation_time)
+            if not save_result['success']:
+                return save_result
+            
+            return dict(save_result,
+                        fixed_sessions=fixed_count,
+                        resolved_sessions=len(to_solve),
+                        widened=len(tried) - 1,
+                        generation_time=round(generation_time, 2))
+            
+        except GenerationCancelled:
+            return {
+                'success': False,
+                'cancelled': True,
+                'error': 'Generation was cancelled',
+                'generation_time': round(time.time() - start_time, 2)
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Regeneration failed: {str(e)}',
+                'generation_time': round(time.time() - start_time, 2)
+            }
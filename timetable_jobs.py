@@ -0,0 +1,244 @@
+"""
+Background Timetable Generation Jobs
+Runs TimetableGenerator.generate_timetable in a background thread so the API
+can answer at once with a generation id. The job's timetable_generations row
+stays 'in_progress' while it runs and holds its progress (sessions placed,
+backtracks, best score, elapsed time). It ends as 'completed', 'failed' or
+'cancelled'. Cancellation goes through the row itself, so a job can be
+stopped from any web worker process, not only the one running it.
+
+Backtracking ('auto') jobs can also be paused by the process running them.
+A paused job is stored as 'cancelled' with its search checkpoint in
+generation_log, and resume_generation() continues it from that checkpoint.
+"""
+
+import json
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from database import get_connection
+from timetable_generator import TimetableGenerator, SearchMonitor
+
+# Monitor and generate_timetable options of the jobs running in this process, by generation id
+_running_jobs: Dict[int, Tuple[SearchMonitor, Dict]] = {}
+_jobs_lock = threading.Lock()
+
+
+def _record_progress(generation_id: int, monitor: SearchMonitor):
+    """Write a running job's progress; stop it if its row was cancelled elsewhere"""
+    progress = monitor.snapshot()
+    conn = get_connection()
+    try:
+        cursor = conn.execute('''
+            UPDATE timetable_generations
+            SET total_classes_scheduled = ?, generation_time_seconds = ?, generation_log = ?
+            WHERE id = ? AND generation_status = 'in_progress'
+        ''', (progress['sessions_placed'], progress['elapsed'],
+              json.dumps({'progress': progress}), generation_id))
+        conn.commit()
+        if cursor.rowcount == 0:
+            monitor.cancel()
+    finally:
+        conn.close()
+
+
+def _run_job(generation_id: int, generator: TimetableGenerator, monitor: SearchMonitor, options: Dict,
+             checkpoint: Optional[Dict]):
+    try:
+        result = generator.generate_timetable(monitor=monitor, generation_id=generation_id,
+                                              checkpoint=checkpoint, **options)
+    except Exception as e:
+        result = {'success': False, 'error': f'Generation failed: {str(e)}'}
+    finally:
+        with _jobs_lock:
+            _running_jobs.pop(generation_id, None)
+
+    if result['success']:
+        return
+
+    log = {'error': result['error'], 'progress': monitor.snapshot()}
+    if monitor.nodes:
+        log['instrumentation'] = monitor.report()
+    status = 'cancelled' if result.get('cancelled') or result.get('paused') else 'failed'
+    if result.get('paused'):
+        log.update(paused=True, checkpoint=result['checkpoint'], options=options)
+
+    conn = get_connection()
+    try:
+        conn.execute('''
+            UPDATE timetable_generations
+            SET generation_status = ?, generation_time_seconds = ?, generation_log = ?
+            WHERE id = ? AND generation_status = 'in_progress'
+        ''', (status, time.time() - monitor.started, json.dumps(log), generation_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def start_generation_job(academic_year: str, semester: int, admin_user_id: int, **options) -> int:
+    """Record an 'in_progress' generation and start solving it in the background.
+
+    `options` are passed on to generate_timetable (method, time_budget, seed, workers,
+    warm_start, weights).
+    """
+    generator = TimetableGenerator()
+    conn = get_connection()
+    try:
+        cursor = conn.execute('''
+            INSERT INTO timetable_generations
+            (academic_year, semester, generation_method, constraints_used,
+             generation_status, total_classes_scheduled, generated_by)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            academic_year, semester, 'auto',
+            generator.constraints_used({'soft_weights': options.get('weights')}),
+            'in_progress', 0, admin_user_id
+        ))
+        generation_id = cursor.lastrowid
+        conn.commit()
+    finally:
+        conn.close()
+
+    options.update(academic_year=academic_year, semester=semester, admin_user_id=admin_user_id)
+    _launch(generation_id, generator, options)
+    return generation_id
+
+
+def _launch(generation_id: int, generator: TimetableGenerator, options: Dict, checkpoint: Optional[Dict] = None):
+    monitor = SearchMonitor(on_progress=lambda m: _record_progress(generation_id, m))
+    with _jobs_lock:
+        _running_jobs[generation_id] = (monitor, options)
+
+    thread = threading.Thread(
+        target=_run_job,
+        args=(generation_id, generator, monitor, options, checkpoint),
+        name=f'timetable-generation-{generation_id}',
+        daemon=True
+    )
+    thread.start()
+
+
+def get_generation_status(generation_id: int) -> Optional[Dict]:
+    """Current state of a generation, or None if it doesn't exist"""
+    conn = get_connection()
+    try:
+        row = conn.execute('''
+            SELECT id, academic_year, semester, generation_status, total_classes_scheduled,
+                   generation_time_seconds, success_rate, generation_log, created_at,
+                   constraints_used
+            FROM timetable_generations WHERE id = ?
+        ''', (generation_id,)).fetchone()
+    finally:
+        conn.close()
+
+    if row is None:
+        return None
+
+    log = json.loads(row[7]) if row[7] else {}
+    # Generations recorded before soft scoring stored a plain list of constraint names
+    used = json.loads(row[9]) if row[9] else {}
+    used = used if isinstance(used, dict) else {}
+    return {
+        'generation_id': row[0],
+        'academic_year': row[1],
+        'semester': row[2],
+        'status': row[3],
+        'total_classes_scheduled': row[4],
+        'elapsed': row[5],
+        'success_rate': row[6],
+        'progress': log.get('progress'),
+        'paused': bool(log.get('paused')),
+        'error': None if log.get('paused') else log.get('error'),
+        'soft_weights': used.get('soft_weights'),
+        'soft_score': used.get('score'),
+        'created_at': row[8]
+    }
+
+
+def get_generation_instrumentation(generation_id: int) -> Optional[Dict]:
+    """Solver statistics saved in a generation's log, or None if the generation doesn't exist.
+
+    'instrumentation' is SearchMonitor.report() of a backtracking run, and
+    None for other solvers and for generations still running.
+    """
+    conn = get_connection()
+    try:
+        row = conn.execute('''
+            SELECT generation_status, generation_method, generation_log
+            FROM timetable_generations WHERE id = ?
+        ''', (generation_id,)).fetchone()
+    finally:
+        conn.close()
+
+    if row is None:
+        return None
+
+    log = json.loads(row[2]) if row[2] else {}
+    return {
+        'generation_id': generation_id,
+        'status': row[0],
+        'method': row[1],
+        'solver': log.get('solver'),
+        'progress': log.get('progress'),
+        'instrumentation': log.get('instrumentation')
+    }
+
+
+def cancel_generation(generation_id: int) -> bool:
+    """Mark an in-progress generation cancelled. Returns False if it wasn't running."""
+    conn = get_connection()
+    try:
+        cursor = conn.execute('''
+            UPDATE timetable_generations
+            SET generation_status = 'cancelled'
+            WHERE id = ? AND generation_status = 'in_progress'
+        ''', (generation_id,))
+        conn.commit()
+        cancelled = cursor.rowcount > 0
+    finally:
+        conn.close()
+
+    # Stop a local job at once; jobs in other processes notice at their next progress report
+    with _jobs_lock:
+        job = _running_jobs.get(generation_id)
+    if job:
+        job[0].cancel()
+    return cancelled
+
+
+def pause_generation(generation_id: int) -> bool:
+    """Ask a backtracking job running in this process to stop at a checkpoint"""
+    with _jobs_lock:
+        job = _running_jobs.get(generation_id)
+    if not job or job[1].get('method', 'auto') != 'auto':
+        return False
+    job[0].pause()
+    return True
+
+
+def resume_generation(generation_id: int) -> bool:
+    """Continue a paused job from its checkpoint. Returns False if it isn't paused."""
+    conn = get_connection()
+    try:
+        row = conn.execute('''
+            SELECT generation_log FROM timetable_generations
+            WHERE id = ? AND generation_status = 'cancelled'
+        ''', (generation_id,)).fetchone()
+        log = json.loads(row[0]) if row and row[0] else {}
+        if not log.get('paused'):
+            return False
+        
+        cursor = conn.execute('''
+            UPDATE timetable_generations
+            SET generation_status = 'in_progress'
+            WHERE id = ? AND generation_status = 'cancelled'
+        ''', (generation_id,))
+        conn.commit()
+        if cursor.rowcount == 0:
+            return False
+    finally:
+        conn.close()
+
+    _launch(generation_id, TimetableGenerator(), log['options'], log['checkpoint'])
+    return True
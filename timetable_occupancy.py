@@ -0,0 +1,206 @@
+"""
+Live Occupancy of Saved Timetables
+Keeps, per term (academic year, semester), the active timetable entries
+booked into an OccupancyIndex, with the term's compiled teacher and room
+unavailability, so checking whether an entry can move to another time slot
+is a few bitmask lookups instead of queries over timetable_entries.
+
+A term's occupancy is loaded on first use and kept with the data version it
+was loaded at (see timetable_cache). A write in any worker bumps that
+version, so the next use reloads it; a move made through move_entry() is
+applied to the loaded occupancy in place instead, as long as no other write
+came in between.
+
+A move's target is a time slot id, or a day and start time, which is what
+the dashboard's grid cells know.
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from timetable_cache import bump_version, data_version
+from timetable_generator import ClassSession, OccupancyIndex, TimetableGenerator, slot_availability
+
+
+def _minutes(clock: str) -> int:
+    hours, minutes = clock.split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+class TermOccupancy:
+    """The active entries of one term booked by teacher, room and group x time slot.
+
+    Every entry is one period, booked as a session of its own keyed by the
+    entry id, so checking an entry against its new slot ignores its own
+    booking.
+    """
+    def __init__(self, data: Dict, entries: List[Dict], version: Tuple[int, int]):
+        self.data = data
+        self.version = version
+        self.availability = slot_availability(data)
+        self.index = OccupancyIndex(data['time_slots'])
+        self.slot_starts = {(time_slot.day.lower(), _minutes(time_slot.start_time)): time_slot_id
+                            for time_slot_id, time_slot in data['time_slots'].items()}
+        self.entries = {}
+        for entry in entries:
+            self.entries[entry['id']] = entry
+            if entry['time_slot_id'] in data['time_slots']:
+                self.index.assign(self._session(entry, entry['time_slot_id']))
+
+    def _session(self, entry: Dict, time_slot_id: int) -> ClassSession:
+        return ClassSession(
+            id=entry['id'], group_id=entry['group_id'], subject_id=entry['subject_id'],
+            teacher_id=entry['teacher_id'], session_type=entry['session_type'],
+            duration=self.data['time_slots'][time_slot_id].duration, required_room_type=None,
+            min_capacity=0, classroom_id=entry['classroom_id'], time_slot_id=time_slot_id
+        )
+
+    def slot_at(self, day: str, start_time: str) -> Optional[int]:
+        """The teaching period starting at a time of a day, or None"""
+        try:
+            return self.slot_starts.get((day.lower(), _minutes(start_time)))
+        except (AttributeError, ValueError):
+            return None
+
+    def check_move(self, entry_id: int, time_slot_id: int) -> List[Dict]:
+        """Conflicts the entry would have at the time slot, in the validator's conflict types"""
+        entry = self.entries[entry_id]
+        time_slot = self.data['time_slots'].get(time_slot_id)
+        if time_slot is None:
+            return [{'conflict_type': 'invalid_time_slot',
+                     'description': f'Time slot {time_slot_id} is not a teaching period'}]
+        when = f'{time_slot.day} {time_slot.start_time}'
+        teacher, room, group = (self.data['teachers'].get(entry['teacher_id']),
+                                self.data['classrooms'].get(entry['classroom_id']),
+                                self.data['groups'].get(entry['group_id']))
+        teacher = teacher.name if teacher else f"#{entry['teacher_id']}"
+        room = room.number if room else f"#{entry['classroom_id']}"
+        group = group.code if group else f"#{entry['group_id']}"
+
+        conflicts = []
+
+        def add(conflict_type: str, description: str):
+            conflicts.append({'conflict_type': conflict_type, 'description': description})
+
+        if self.index.teacher_busy(entry['teacher_id'], time_slot_id, entry_id):
+            add('teacher_double_booking', f'Teacher {teacher} already teaches on {when}')
+        if self.index.room_busy(entry['classroom_id'], time_slot_id, entry_id):
+            add('room_double_booking', f'Room {room} is already taken on {when}')
+        if self.index.group_busy(entry['group_id'], time_slot_id, entry_id):
+            add('group_double_booking', f'Group {group} already has a class on {when}')
+
+        bit = self.availability.slot_bits[time_slot_id]
+        if self.availability.teacher_masks.get(entry['teacher_id'], 0) & bit:
+            reason = self.availability.teacher_slots[entry['teacher_id']][time_slot_id]
+            add('teacher_unavailable', f'Teacher {teacher} is unavailable {reason}')
+        if self.availability.room_masks.get(entry['classroom_id'], 0) & bit:
+            reason = self.availability.room_slots[entry['classroom_id']][time_slot_id]
+            add('room_unsuitable', f'Room {room} is closed {reason}')
+        return conflicts
+
+    def move(self, entry_id: int, time_slot_id: int):
+        entry = self.entries[entry_id]
+        entry['time_slot_id'] = time_slot_id
+        self.index.assign(self._session(entry, time_slot_id))
+
+
+_occupancies: Dict[Tuple[str, int], TermOccupancy] = {}
+_lock = threading.Lock()
+
+
+def _load(conn, academic_year: str, semester: int, version: Tuple[int, int]) -> TermOccupancy:
+    data = TimetableGenerator().load_data(academic_year, semester)
+    cursor = conn.execute('''
+        SELECT id, group_id, subject_id, teacher_id, classroom_id, time_slot_id, session_type
+        FROM timetable_entries
+        WHERE academic_year = ? AND semester = ? AND status = 'active'
+    ''', (academic_year, semester))
+    # Plain tuples or sqlite3.Row, whatever the connection's row factory
+    columns = [column[0] for column in cursor.description]
+    return TermOccupancy(data, [dict(zip(columns, entry)) for entry in cursor.fetchall()], version)
+
+
+def term_occupancy(conn, academic_year: str, semester: int) -> TermOccupancy:
+    """The occupancy of a term at its current data version, loaded if it is stale or missing"""
+    term = (academic_year, int(semester))
+    version = data_version(conn, *term)
+    with _lock:
+        occupancy = _occupancies.get(term)
+        if occupancy is not None and occupancy.version == version:
+            return occupancy
+    occupancy = _load(conn, academic_year, semester, version)
+    with _lock:
+        _occupancies[term] = occupancy
+    return occupancy
+
+
+def clear():
+    """Forget every loaded occupancy, e.g. after pointing the database pool at another file"""
+    with _lock:
+        _occupancies.clear()
+
+
+def entry_term(conn, entry_id: int) -> Optional[Tuple[str, int]]:
+    """(academic year, semester) of an active entry, or None"""
+    row = conn.execute('''
+        SELECT academic_year, semester FROM timetable_entries WHERE id = ? AND status = 'active'
+    ''', (entry_id,)).fetchone()
+    return (row[0], row[1]) if row else None
+
+
+def _check(occupancy: TermOccupancy, entry_id: int, time_slot_id: Optional[int], day: Optional[str],
+           start_time: Optional[str]) -> Dict:
+    if time_slot_id is None:
+        time_slot_id = occupancy.slot_at(day, start_time)
+        if time_slot_id is None:
+            return {'time_slot_id': None, 'conflicts': [{
+                'conflict_type': 'invalid_time_slot',
+                'description': f'No teaching period starts at {start_time} on {day}'}]}
+    with _lock:
+        return {'time_slot_id': time_slot_id, 'conflicts': occupancy.check_move(entry_id, time_slot_id)}
+
+
+def validate_move(conn, entry_id: int, time_slot_id: Optional[int] = None, day: Optional[str] = None,
+                  start_time: Optional[str] = None) -> Optional[Dict]:
+    """The target time slot id and the conflicts of moving an active entry there.
+
+    The target is `time_slot_id`, or the period starting at `start_time` on
+    `day`. None if there is no such entry.
+    """
+    term = entry_term(conn, entry_id)
+    if term is None:
+        return None
+    return _check(term_occupancy(conn, *term), entry_id, time_slot_id, day, start_time)
+
+
+def move_entry(conn, entry_id: int, time_slot_id: Optional[int] = None, day: Optional[str] = None,
+               start_time: Optional[str] = None) -> Optional[Dict]:
+    """Move an active entry to a time slot unless that conflicts; returns what validate_move does.
+
+    The entry and the term's data version are written in one transaction.
+    The loaded occupancy is then moved along with it if it was current when
+    the write started, and reloaded on next use otherwise.
+    """
+    term = entry_term(conn, entry_id)
+    if term is None:
+        return None
+    occupancy = term_occupancy(conn, *term)
+    result = _check(occupancy, entry_id, time_slot_id, day, start_time)
+    if result['conflicts']:
+        return result
+    time_slot_id = result['time_slot_id']
+
+    conn.execute('''
+        UPDATE timetable_entries SET time_slot_id = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
+    ''', (time_slot_id, entry_id))
+    bump_version(conn, *term)
+    # The write lock is held from the UPDATE on, so this is exactly our own bump
+    version = data_version(conn, *term)
+    conn.commit()
+
+    with _lock:
+        if (_occupancies.get(term) is occupancy and occupancy.version[1] == version[1] and
+                occupancy.version[0] + 1 == version[0]):
+            occupancy.move(entry_id, time_slot_id)
+            occupancy.version = version
+    return result
@@ -0,0 +1,146 @@
+"""
+Parallel Portfolio Timetable Generation
+Runs several independent solvers at once, one per process, each with its own
+random seed and strategy. The first complete timetable wins; otherwise the
+fullest timetable returned before the deadline is used. Workers still
+running are terminated. The winning strategy and seed are reported so the
+run can be reproduced with generate_timetable(method=strategy, seed=seed);
+annealing runs cut short by the clock also need the reported iteration count.
+"""
+
+import multiprocessing
+import os
+import random
+import time
+from queue import Empty
+from typing import Dict, List, Optional
+
+from timetable_generator import TimetableGenerator, ClassSession, SearchMonitor
+from timetable_annealing import AnnealingSolver, DEFAULT_TIME_BUDGET
+
+# Strategies handed out to workers in turn
+PORTFOLIO_STRATEGIES = ('auto', 'anneal')
+# Extra time allowed for worker start-up and returning results
+RESULT_GRACE_SECONDS = 2.0
+
+
+def _run_worker(worker_id: int, strategy: str, seed: int, data: Dict,
+                sessions: List[ClassSession], time_budget: float, results):
+    """Solve in a child process and put the placements on the results queue"""
+    generator = TimetableGenerator()
+    assignments = {}
+    start = time.time()
+
+    try:
+        if strategy == 'anneal':
+            stats = AnnealingSolver(generator, data, time_budget, seed).solve(sessions, assignments)
+        else:
+            random.seed(seed)
+            generator.backtrack_search(sessions, assignments, data)
+            stats = {'solver': strategy}
+        error = None
+    except Exception as e:
+        assignments, stats, error = {}, {'solver': strategy}, str(e)
+
+    results.put({
+        'worker': worker_id,
+        'strategy': strategy,
+        'seed': seed,
+        'placements': {session_id: (session.time_slot_id, session.classroom_id)
+                       for session_id, session in assignments.items()},
+        'complete': len(assignments) == len(sessions),
+        'elapsed': round(time.time() - start, 3),
+        'stats': stats,
+        'error': error
+    })
+
+
+class PortfolioSolver:
+    """Race independent solver workers across CPU cores"""
+
+    def __init__(self, data: Dict, workers: Optional[int] = None,
+                 time_budget: float = DEFAULT_TIME_BUDGET, seed: Optional[int] = None,
+                 strategies=PORTFOLIO_STRATEGIES, monitor: Optional[SearchMonitor] = None):
+        self.data = data
+        self.monitor = monitor
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.time_budget = time_budget
+        self.base_seed = seed if seed is not None else random.randrange(2 ** 31)
+        self.strategies = strategies
+
+    def solve(self, sessions: List[ClassSession], assignments: Dict) -> Dict:
+        """Run the portfolio and copy the winning placements into `assignments`.
+
+        Returns stats with the winner's worker id, strategy and seed, or
+        winner None when no worker placed anything before the deadline.
+        """
+        start = time.time()
+        results = multiprocessing.Queue()
+        processes = []
+        for worker_id in range(self.workers):
+            strategy = self.strategies[worker_id % len(self.strategies)]
+            process = multiprocessing.Process(
+                target=_run_worker,
+                args=(worker_id, strategy, self.base_seed + worker_id, self.data,
+                      sessions, self.time_budget, results),
+                daemon=True
+            )
+            process.start()
+            processes.append(process)
+
+        deadline = start + self.time_budget + RESULT_GRACE_SECONDS
+        finished = []
+        best = None
+        try:
+            while len(finished) < len(processes):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                if self.monitor:
+                    self.monitor.tick()
+                    remaining = min(remaining, self.monitor.interval)
+                try:
+                    result = results.get(timeout=remaining)
+                except Empty:
+                    continue
+                finished.append(result)
+                if best is None or len(result['placements']) > len(best['placements']):
+                    best = result
+                    if self.monitor:
+                        self.monitor.placed = len(best['placements'])
+                if result['complete']:
+                    break
+        finally:
+            # Cancel whoever is still searching
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+            for process in processes:
+                process.join()
+            results.close()
+
+        if best is not None:
+            time_slots = self.data['time_slots']
+            for session in sessions:
+                placement = best['placements'].get(session.id)
+                if placement is None:
+                    continue
+                session.time_slot_id, session.classroom_id = placement
+                session.day = time_slots[session.time_slot_id].day
+                session.start_time = time_slots[session.time_slot_id].start_time
+                assignments[session.id] = session
+
+        return {
+            'solver': 'portfolio',
+            'workers': len(processes),
+            'finished_workers': len(finished),
+            'winner': None if best is None else {
+                'worker': best['worker'],
+                'strategy': best['strategy'],
+                'seed': best['seed'],
+                'complete': best['complete'],
+                'elapsed': best['elapsed'],
+                'stats': best['stats']
+            },
+            'elapsed': round(time.time() - start, 3)
+        }
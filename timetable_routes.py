@@ -8,6 +8,9 @@ import sqlite3
 import json
 from datetime import datetime
 from functools import wraps
+from database import get_db
+from timetable_cache import bump_version, cached_json
+from pagination import parse_page, page_headers
 
 # Create blueprint for timetable management
 timetable_bp = Blueprint('timetable', __name__, url_prefix='/api/timetable')
@@ -22,26 +25,46 @@ def require_admin(f):
     return decorated_function
 
 def get_db_connection():
-    """Get database connection with row factory"""
-    conn = sqlite3.connect('school_system.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get the request's pooled database connection with row factory"""
+    return get_db(sqlite3.Row)
 
 # Teachers API
+TEACHER_FIELDS = ('id', 'user_id', 'teacher_code', 'first_name', 'last_name', 'email', 'phone',
+                  'subject_qualifications', 'weekly_unavailability', 'max_hours_per_week', 'preferred_rooms',
+                  'created_at', 'updated_at')
+
+def list_teachers(conn):
+    """All teachers with a login, by name"""
+    return [dict(teacher) for teacher in conn.execute('''
+        SELECT * FROM timetable_teachers 
+        WHERE user_id IS NOT NULL
+        ORDER BY first_name, last_name, id
+    ''').fetchall()]
+
 @timetable_bp.route('/teachers', methods=['GET'])
 @require_admin
 def get_teachers():
-    """Get all teachers with their details"""
+    """Get all teachers with their details, in keyset pages with ?limit= and ?cursor= (see pagination)"""
     try:
+        try:
+            page = parse_page(request.args, TEACHER_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         conn = get_db_connection()
-        teachers = conn.execute('''
+        after, params = page.where(['first_name', 'last_name', 'id'])
+        teachers = conn.execute(f'''
             SELECT * FROM timetable_teachers 
-            WHERE user_id IS NOT NULL
-            ORDER BY first_name, last_name
-        ''').fetchall()
+            WHERE user_id IS NOT NULL {'AND ' + after if after else ''}
+            ORDER BY first_name, last_name, id{page.limit_clause()}
+        ''', params).fetchall()
         conn.close()
         
-        return jsonify([dict(teacher) for teacher in teachers])
+        teachers, next_cursor = page.split(teachers, lambda teacher: [teacher['first_name'], teacher['last_name'],
+                                                                     teacher['id']])
+        response = jsonify(page.project([dict(teacher) for teacher in teachers]))
+        response.headers.update(page_headers(request, next_cursor))
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -88,6 +111,7 @@ def create_teacher():
         ))
         
         teacher_id = cursor.lastrowid
+        bump_version(conn)
         conn.commit()
         conn.close()
         
@@ -132,6 +156,7 @@ def update_teacher(teacher_id):
             teacher_id
         ))
         
+        bump_version(conn)
         conn.commit()
         conn.close()
         
@@ -169,6 +194,7 @@ def delete_teacher(teacher_id):
         
         # Delete teacher
         conn.execute('DELETE FROM timetable_teachers WHERE id = ?', (teacher_id,))
+        bump_version(conn)
         conn.commit()
         conn.close()
         
@@ -178,19 +204,23 @@ def delete_teacher(teacher_id):
         return jsonify({'error': str(e)}), 500
 
 # Subjects API
+def list_subjects(conn):
+    """All subjects by name"""
+    return [dict(subject) for subject in conn.execute('''
+        SELECT * FROM timetable_subjects 
+        ORDER BY subject_name
+    ''').fetchall()]
+
 @timetable_bp.route('/subjects', methods=['GET'])
 @require_admin
 def get_subjects():
     """Get all subjects"""
     try:
         conn = get_db_connection()
-        subjects = conn.execute('''
-            SELECT * FROM timetable_subjects 
-            ORDER BY subject_name
-        ''').fetchall()
+        subjects = list_subjects(conn)
         conn.close()
         
-        return jsonify([dict(subject) for subject in subjects])
+        return jsonify(subjects)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -239,6 +269,7 @@ def create_subject():
         ))
         
         subject_id = cursor.lastrowid
+        bump_version(conn)
         conn.commit()
         conn.close()
         
@@ -248,20 +279,24 @@ def create_subject():
         return jsonify({'error': str(e)}), 500
 
 # Classrooms API
+def list_classrooms(conn):
+    """All active classrooms by room number"""
+    return [dict(classroom) for classroom in conn.execute('''
+        SELECT * FROM timetable_classrooms 
+        WHERE is_active = 1
+        ORDER BY room_number
+    ''').fetchall()]
+
 @timetable_bp.route('/classrooms', methods=['GET'])
 @require_admin
 def get_classrooms():
     """Get all classrooms"""
     try:
         conn = get_db_connection()
-        classrooms = conn.execute('''
-            SELECT * FROM timetable_classrooms 
-            WHERE is_active = 1
-            ORDER BY room_number
-        ''').fetchall()
+        classrooms = list_classrooms(conn)
         conn.close()
         
-        return jsonify([dict(classroom) for classroom in classrooms])
+        return jsonify(classrooms)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -307,6 +342,7 @@ def create_classroom():
         ))
         
         classroom_id = cursor.lastrowid
+        bump_version(conn)
         conn.commit()
         conn.close()
         
@@ -316,22 +352,26 @@ def create_classroom():
         return jsonify({'error': str(e)}), 500
 
 # Student Groups API
+def list_student_groups(conn):
+    """All student groups, of every term, by code with their coordinator's name"""
+    return [dict(group) for group in conn.execute('''
+        SELECT sg.*, 
+               t.first_name || ' ' || t.last_name as coordinator_name
+        FROM timetable_student_groups sg
+        LEFT JOIN timetable_teachers t ON sg.coordinator_teacher_id = t.id
+        ORDER BY sg.group_code
+    ''').fetchall()]
+
 @timetable_bp.route('/student-groups', methods=['GET'])
 @require_admin
 def get_student_groups():
     """Get all student groups with coordinator details"""
     try:
         conn = get_db_connection()
-        groups = conn.execute('''
-            SELECT sg.*, 
-                   t.first_name || ' ' || t.last_name as coordinator_name
-            FROM timetable_student_groups sg
-            LEFT JOIN timetable_teachers t ON sg.coordinator_teacher_id = t.id
-            ORDER BY sg.group_code
-        ''').fetchall()
+        groups = list_student_groups(conn)
         conn.close()
         
-        return jsonify([dict(group) for group in groups])
+        return jsonify(groups)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -376,6 +416,7 @@ def create_student_group():
         ))
         
         group_id = cursor.lastrowid
+        bump_version(conn, data['academic_year'], data['semester'])
         conn.commit()
         conn.close()
         
@@ -385,66 +426,149 @@ def create_student_group():
         return jsonify({'error': str(e)}), 500
 
 # Statistics API
+def last_generation_time(conn):
+    """When the last completed generation was started, or None"""
+    last_gen = conn.execute('''
+        SELECT created_at FROM timetable_generations 
+        WHERE generation_status = 'completed'
+        ORDER BY created_at DESC LIMIT 1
+    ''').fetchone()
+    return last_gen['created_at'] if last_gen else None
+
+def collect_statistics(conn):
+    """Counts of teachers, subjects, active classrooms and student groups, and the last generation"""
+    stats = {}
+    
+    # Count teachers
+    result = conn.execute('SELECT COUNT(*) as count FROM timetable_teachers').fetchone()
+    stats['teachers'] = result['count']
+    
+    # Count subjects
+    result = conn.execute('SELECT COUNT(*) as count FROM timetable_subjects').fetchone()
+    stats['subjects'] = result['count']
+    
+    # Count classrooms
+    result = conn.execute('SELECT COUNT(*) as count FROM timetable_classrooms WHERE is_active = 1').fetchone()
+    stats['classrooms'] = result['count']
+    
+    # Count student groups
+    result = conn.execute('SELECT COUNT(*) as count FROM timetable_student_groups').fetchone()
+    stats['student_groups'] = result['count']
+    
+    # Last generation info
+    stats['last_generation'] = last_generation_time(conn)
+    return stats
+
 @timetable_bp.route('/stats', methods=['GET'])
 @require_admin
 def get_statistics():
     """Get statistics for the timetable management dashboard"""
     try:
         conn = get_db_connection()
-        
-        stats = {}
-        
-        # Count teachers
-        result = conn.execute('SELECT COUNT(*) as count FROM timetable_teachers').fetchone()
-        stats['teachers'] = result['count']
-        
-        # Count subjects
-        result = conn.execute('SELECT COUNT(*) as count FROM timetable_subjects').fetchone()
-        stats['subjects'] = result['count']
-        
-        # Count classrooms
-        result = conn.execute('SELECT COUNT(*) as count FROM timetable_classrooms WHERE is_active = 1').fetchone()
-        stats['classrooms'] = result['count']
-        
-        # Count student groups
-        result = conn.execute('SELECT COUNT(*) as count FROM timetable_student_groups').fetchone()
-        stats['student_groups'] = result['count']
-        
-        # Last generation info
-        last_gen = conn.execute('''
-            SELECT created_at FROM timetable_generations 
-            WHERE generation_status = 'completed'
-            ORDER BY created_at DESC LIMIT 1
-        ''').fetchone()
-        
-        stats['last_generation'] = last_gen['created_at'] if last_gen else None
-        
+        stats = collect_statistics(conn)
         conn.close()
         return jsonify(stats)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@timetable_bp.route('/bootstrap', methods=['GET'])
+@require_admin
+def get_bootstrap():
+    """Get everything the management page shows on load in one response.
+
+    Teachers, subjects, classrooms, student groups and statistics are read in
+    one transaction, so they are a consistent snapshot. The response is
+    cached per data version of every term and carries an ETag, like the view.
+    Generations are not versioned, so the time of the last one is part of
+    the cache key.
+    """
+    try:
+        conn = get_db_connection()
+        # The first read fixes the snapshot every later read sees
+        conn.execute('BEGIN')
+        try:
+            last_generation = last_generation_time(conn)
+            
+            def load_bootstrap():
+                return {
+                    'teachers': list_teachers(conn),
+                    'subjects': list_subjects(conn),
+                    'classrooms': list_classrooms(conn),
+                    'student_groups': list_student_groups(conn),
+                    'stats': collect_statistics(conn)
+                }, {}
+            
+            response = cached_json(conn, 'bootstrap', None, None, {'last_generation': last_generation},
+                                   load_bootstrap)
+        finally:
+            conn.rollback()
+        conn.close()
+        return response
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Timetable Generation API
 @timetable_bp.route('/generate', methods=['POST'])
 @require_admin
 def generate_timetable():
-    """Generate automated timetable"""
+    """Start timetable generation as a background job.
+
+    Returns 202 with the generation id to poll. Pass "wait": true to generate
+    synchronously inside the request instead.
+    """
     try:
         data = request.get_json()
         academic_year = data.get('academic_year', '2024-25')
         semester = data.get('semester', 1)
         method = data.get('method', 'auto')
+        time_budget = data.get('time_budget')
+        seed = data.get('seed')
+        workers = data.get('workers')
+        # true for this semester's current timetable, or {"academic_year", "semester"} of another
+        warm_start = data.get('warm_start')
+        if isinstance(warm_start, dict):
+            warm_start = [warm_start.get('academic_year', academic_year), int(warm_start.get('semester', semester))]
+        # {"teacher_gaps": 5, ...} overrides soft constraint weights; 0 switches one off
+        weights = data.get('weights')
         
         # Import the generation engine
-        from timetable_generator import TimetableGenerator
+        from timetable_generator import TimetableGenerator, GENERATION_METHODS
+        from timetable_jobs import start_generation_job
+        from timetable_scoring import soft_weights
+        
+        if method not in GENERATION_METHODS:
+            return jsonify({'error': f"Unknown generation method '{method}'"}), 400
+        try:
+            weights = {name: float(weight) for name, weight in (weights or {}).items()}
+            soft_weights(weights)
+        except (AttributeError, TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid weights: {e}'}), 400
+        
+        options = {
+            'method': method,
+            'time_budget': float(time_budget) if time_budget is not None else None,
+            'seed': int(seed) if seed is not None else None,
+            'workers': int(workers) if workers is not None else None,
+            'warm_start': warm_start or None,
+            'weights': weights or None
+        }
+        
+        if not data.get('wait'):
+            generation_id = start_generation_job(academic_year, semester, session['user_id'], **options)
+            return jsonify({
+                'message': 'Timetable generation started',
+                'generation_id': generation_id,
+                'status': 'in_progress'
+            }), 202
         
         generator = TimetableGenerator()
         result = generator.generate_timetable(
             academic_year=academic_year,
             semester=semester,
-            method=method,
-            admin_user_id=session['user_id']
+            admin_user_id=session['user_id'],
+            **options
         )
         
         if result['success']:
@@ -452,7 +576,9 @@ def generate_timetable():
                 'message': 'Timetable generated successfully',
                 'total_classes': result['total_classes'],
                 'success_rate': result['success_rate'],
-                'generation_id': result['generation_id']
+                'generation_id': result['generation_id'],
+                'unscheduled_sessions': result['unscheduled_sessions'],
+                'winner': result['winner']
             })
         else:
             return jsonify({
@@ -463,87 +589,300 @@ def generate_timetable():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@timetable_bp.route('/generate/batch', methods=['POST'])
+@require_admin
+def generate_timetable_batch():
+    """Generate several terms together so shared teachers and classrooms are never double booked.
+
+    Takes "terms": [{"academic_year": "2024-25", "semester": 1}, ...].
+    """
+    try:
+        data = request.get_json()
+        terms = data.get('terms') or []
+        seed = data.get('seed')
+        workers = data.get('workers')
+        try:
+            terms = [(term.get('academic_year', '2024-25'), int(term['semester'])) for term in terms]
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return jsonify({'error': 'Each term needs an academic_year and a semester'}), 400
+        
+        from timetable_generator import TimetableGenerator
+        
+        generator = TimetableGenerator()
+        result = generator.generate_batch(
+            terms,
+            admin_user_id=session['user_id'],
+            workers=int(workers) if workers is not None else None,
+            seed=int(seed) if seed is not None else None
+        )
+        
+        if result['success']:
+            return jsonify({
+                'message': 'Timetables generated successfully',
+                'terms': result['terms'],
+                'components': result['components'],
+                'coupled_components': result['coupled_components'],
+                'generation_time': result['generation_time']
+            })
+        else:
+            return jsonify({'error': result['error']}), 400
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@timetable_bp.route('/regenerate', methods=['POST'])
+@require_admin
+def regenerate_timetable():
+    """Re-solve the sessions of some groups, teachers or classrooms, keeping the rest fixed"""
+    try:
+        data = request.get_json()
+        academic_year = data.get('academic_year', '2024-25')
+        semester = data.get('semester', 1)
+        seed = data.get('seed')
+        scope = {key: [int(item_id) for item_id in data.get(key) or []]
+                 for key in ('group_ids', 'teacher_ids', 'classroom_ids')}
+        
+        from timetable_generator import TimetableGenerator
+        
+        generator = TimetableGenerator()
+        result = generator.regenerate_timetable(
+            academic_year=academic_year,
+            semester=semester,
+            admin_user_id=session['user_id'],
+            seed=int(seed) if seed is not None else None,
+            **scope
+        )
+        
+        if result['success']:
+            return jsonify({
+                'message': 'Timetable updated successfully',
+                'generation_id': result['generation_id'],
+                'resolved_sessions': result['resolved_sessions'],
+                'fixed_sessions': result['fixed_sessions'],
+                'widened': result['widened'],
+                'inserted': result['inserted'],
+                'deleted': result['deleted'],
+                'unchanged': result['unchanged'],
+                'generation_time': result['generation_time']
+            })
+        else:
+            return jsonify({'error': result['error']}), 400
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@timetable_bp.route('/generations/<int:generation_id>', methods=['GET'])
+@require_admin
+def get_generation(generation_id):
+    """Poll the status and progress of a timetable generation"""
+    try:
+        from timetable_jobs import get_generation_status
+        
+        status = get_generation_status(generation_id)
+        if status is None:
+            return jsonify({'error': 'Generation not found'}), 404
+        return jsonify(status)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@timetable_bp.route('/generations/<int:generation_id>/instrumentation', methods=['GET'])
+@require_admin
+def get_generation_instrumentation(generation_id):
+    """Search statistics, per-constraint timing and sampled trace of a finished generation"""
+    try:
+        from timetable_jobs import get_generation_instrumentation as load_instrumentation
+        
+        instrumentation = load_instrumentation(generation_id)
+        if instrumentation is None:
+            return jsonify({'error': 'Generation not found'}), 404
+        return jsonify(instrumentation)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@timetable_bp.route('/generations/<int:generation_id>/cancel', methods=['POST'])
+@require_admin
+def cancel_generation(generation_id):
+    """Cancel a running timetable generation"""
+    try:
+        from timetable_jobs import cancel_generation as cancel_job, get_generation_status
+        
+        if cancel_job(generation_id):
+            return jsonify({'message': 'Generation cancelled', 'generation_id': generation_id})
+        
+        status = get_generation_status(generation_id)
+        if status is None:
+            return jsonify({'error': 'Generation not found'}), 404
+        return jsonify({'error': f"Generation is already {status['status']}"}), 409
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@timetable_bp.route('/generations/<int:generation_id>/pause', methods=['POST'])
+@require_admin
+def pause_generation(generation_id):
+    """Pause a running backtracking generation at a resumable checkpoint"""
+    try:
+        from timetable_jobs import pause_generation as pause_job, get_generation_status
+        
+        if pause_job(generation_id):
+            return jsonify({'message': 'Generation pausing', 'generation_id': generation_id})
+        
+        status = get_generation_status(generation_id)
+        if status is None:
+            return jsonify({'error': 'Generation not found'}), 404
+        return jsonify({'error': 'Only backtracking generations running on this server can be paused'}), 409
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@timetable_bp.route('/generations/<int:generation_id>/resume', methods=['POST'])
+@require_admin
+def resume_generation(generation_id):
+    """Resume a paused generation from its checkpoint"""
+    try:
+        from timetable_jobs import resume_generation as resume_job, get_generation_status
+        
+        if resume_job(generation_id):
+            return jsonify({'message': 'Generation resumed', 'generation_id': generation_id, 'status': 'in_progress'}), 202
+        
+        status = get_generation_status(generation_id)
+        if status is None:
+            return jsonify({'error': 'Generation not found'}), 404
+        return jsonify({'error': 'Generation is not paused'}), 409
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Timetable View API
+VIEW_FIELDS = ('id', 'session_type', 'group_code', 'group_name', 'subject_code', 'subject_name', 'subject_type',
+               'teacher_name', 'room_number', 'room_name', 'room_type', 'day_of_week', 'start_time', 'end_time',
+               'slot_code', 'slot_type', 'created_at')
+
+# Compact view: per dimension, the entry column that references it and the fields it holds
+VIEW_DIMENSIONS = (
+    ('groups', 'group_id', ('group_code', 'group_name')),
+    ('subjects', 'subject_id', ('subject_code', 'subject_name', 'subject_type')),
+    ('teachers', 'teacher_id', ('teacher_name',)),
+    ('rooms', 'classroom_id', ('room_number', 'room_name', 'room_type')),
+    ('slots', 'time_slot_id', ('day_of_week', 'start_time', 'end_time', 'slot_code', 'slot_type')),
+)
+VIEW_FORMATS = ('objects', 'compact')
+
+def compact_view(entries, fields=None):
+    """Entries of the view as dimension tables plus parallel columns.
+
+    Every group, subject, teacher, room and slot is sent once, as a row of its
+    dimension; an entry refers to it by the row's position, so
+    entries[name][i] is the row of dimension `name` for entry i. Only the
+    fields asked for are sent, and a dimension none of them are in is left out.
+    """
+    fields = fields or VIEW_FIELDS
+    own = [field for field in ('id', 'session_type', 'created_at') if field in fields]
+    view = {'format': 'compact', 'count': len(entries), 'dimensions': {},
+            'entries': {field: [entry[field] for entry in entries] for field in own}}
+    
+    for name, key, columns in VIEW_DIMENSIONS:
+        columns = [column for column in columns if column in fields]
+        if not columns:
+            continue
+        positions = {}
+        rows = []
+        refs = []
+        for entry in entries:
+            position = positions.get(entry[key])
+            if position is None:
+                position = positions[entry[key]] = len(rows)
+                rows.append([entry[column] for column in columns])
+            refs.append(position)
+        view['dimensions'][name] = {'columns': columns, 'rows': rows}
+        view['entries'][name] = refs
+    return view
+
 @timetable_bp.route('/view', methods=['GET'])
 @require_admin
 def get_timetable_view():
-    """Get timetable data for viewing - Optimized version"""
+    """Get timetable data for viewing.
+
+    Entries come in id order, in keyset pages with ?limit= and ?cursor=
+    (see pagination); ?fields= picks the keys of each entry. With
+    ?format=compact the response is an object of dimension tables and entry
+    columns (see compact_view) instead of one object per entry. Responses are
+    cached per filters and data version and carry an ETag; a matching
+    If-None-Match gets 304 Not Modified.
+    """
     try:
         academic_year = request.args.get('academic_year', '2024-25')
         semester = request.args.get('semester', 1, type=int)
         group_id = request.args.get('group_id', type=int)
         teacher_id = request.args.get('teacher_id', type=int)
         classroom_id = request.args.get('classroom_id', type=int)
+        view_format = request.args.get('format', 'objects')
+        if view_format not in VIEW_FORMATS:
+            return jsonify({'error': f"Unknown format '{view_format}'. Use one of: {', '.join(VIEW_FORMATS)}"}), 400
+        try:
+            page = parse_page(request.args, VIEW_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         conn = get_db_connection()
         
-        # Optimized query with selective fields and better indexing
-        query = '''
-            SELECT te.id, te.session_type, te.created_at,
-                   sg.group_code, sg.group_name,
-                   s.subject_code, s.subject_name, s.subject_type,
-                   t.first_name, t.last_name,
-                   c.room_number, c.room_name, c.room_type,
-                   ts.day_of_week, ts.start_time, ts.end_time, ts.slot_code, ts.slot_type
-            FROM timetable_entries te
-            INDEXED BY idx_timetable_entries_academic
-            JOIN timetable_student_groups sg ON te.group_id = sg.id
-            JOIN timetable_subjects s ON te.subject_id = s.id
-            JOIN timetable_teachers t ON te.teacher_id = t.id
-            JOIN timetable_classrooms c ON te.classroom_id = c.id
-            JOIN time_slots ts ON te.time_slot_id = ts.id
-            WHERE te.academic_year = ? AND te.semester = ? AND te.status = 'active'
-        '''
-        
-        params = [academic_year, semester]
-        
-        # Add optimized filters with proper indexing
-        if group_id:
-            query = query.replace('INDEXED BY idx_timetable_entries_academic', 'INDEXED BY idx_timetable_entries_group')
-            query += ' AND te.group_id = ?'
-            params.append(group_id)
-        elif teacher_id:
-            query = query.replace('INDEXED BY idx_timetable_entries_academic', 'INDEXED BY idx_timetable_entries_teacher')
-            query += ' AND te.teacher_id = ?'
-            params.append(teacher_id)
-        elif classroom_id:
-            query = query.replace('INDEXED BY idx_timetable_entries_academic', 'INDEXED BY idx_timetable_entries_classroom')
-            query += ' AND te.classroom_id = ?'
-            params.append(classroom_id)
-        
-        # Optimized ordering using index
-        query += ' ORDER BY ts.day_of_week, ts.start_time LIMIT 500'
-        
-        entries = conn.execute(query, params).fetchall()
-        
-        # Convert to optimized format
-        result = []
-        for entry in entries:
-            result.append({
-                'id': entry['id'],
-                'session_type': entry['session_type'],
-                'group_code': entry['group_code'],
-                'group_name': entry['group_name'],
-                'subject_code': entry['subject_code'],
-                'subject_name': entry['subject_name'],
-                'subject_type': entry['subject_type'],
-                'teacher_name': f"{entry['first_name']} {entry['last_name']}",
-                'room_number': entry['room_number'],
-                'room_name': entry['room_name'],
-                'room_type': entry['room_type'],
-                'day_of_week': entry['day_of_week'],
-                'start_time': entry['start_time'],
-                'end_time': entry['end_time'],
-                'slot_code': entry['slot_code'],
-                'slot_type': entry['slot_type'],
-                'created_at': entry['created_at']
-            })
-        
+        def load_entries():
+            # Optimized query with selective fields and better indexing
+            query = '''
+                SELECT te.id, te.session_type, te.created_at,
+                       te.group_id, te.subject_id, te.teacher_id, te.classroom_id, te.time_slot_id,
+                       sg.group_code, sg.group_name,
+                       s.subject_code, s.subject_name, s.subject_type,
+                       t.first_name || ' ' || t.last_name AS teacher_name,
+                       c.room_number, c.room_name, c.room_type,
+                       ts.day_of_week, ts.start_time, ts.end_time, ts.slot_code, ts.slot_type
+                FROM timetable_entries te
+                INDEXED BY idx_timetable_entries_academic
+                JOIN timetable_student_groups sg ON te.group_id = sg.id
+                JOIN timetable_subjects s ON te.subject_id = s.id
+                JOIN timetable_teachers t ON te.teacher_id = t.id
+                JOIN timetable_classrooms c ON te.classroom_id = c.id
+                JOIN time_slots ts ON te.time_slot_id = ts.id
+                WHERE te.academic_year = ? AND te.semester = ? AND te.status = 'active'
+            '''
+            
+            params = [academic_year, semester]
+            
+            # Add optimized filters with proper indexing
+            if group_id:
+                query = query.replace('INDEXED BY idx_timetable_entries_academic', 'INDEXED BY idx_timetable_entries_group')
+                query += ' AND te.group_id = ?'
+                params.append(group_id)
+            elif teacher_id:
+                query = query.replace('INDEXED BY idx_timetable_entries_academic', 'INDEXED BY idx_timetable_entries_teacher')
+                query += ' AND te.teacher_id = ?'
+                params.append(teacher_id)
+            elif classroom_id:
+                query = query.replace('INDEXED BY idx_timetable_entries_academic', 'INDEXED BY idx_timetable_entries_classroom')
+                query += ' AND te.classroom_id = ?'
+                params.append(classroom_id)
+            
+            # Entry id order: every index above ends with the rowid, so a page starts with a seek
+            after, after_params = page.where(['te.id'])
+            if after:
+                query += f' AND {after}'
+                params.extend(after_params)
+            query += ' ORDER BY te.id' + page.limit_clause()
+            
+            entries, next_cursor = page.split(conn.execute(query, params).fetchall(), lambda entry: [entry['id']])
+            headers = page_headers(request, next_cursor)
+            
+            if view_format == 'compact':
+                return compact_view(entries, page.fields), headers
+            fields = page.fields or VIEW_FIELDS
+            return [{field: entry[field] for field in fields} for entry in entries], headers
+        
+        filters = {'group_id': group_id, 'teacher_id': teacher_id, 'classroom_id': classroom_id, 'format': view_format,
+                   'limit': page.limit, 'cursor': request.args.get('cursor'), 'fields': page.fields and ','.join(page.fields)}
+        response = cached_json(conn, 'view', academic_year, semester, filters, load_entries)
         conn.close()
-        
-        # Add cache headers for better performance
-        response = jsonify(result)
-        response.headers['Cache-Control'] = 'private, max-age=60'  # Cache for 1 minute
         return response
         
     except Exception as e:
@@ -580,4 +919,100 @@ def get_conflicts():
         return jsonify([dict(conflict) for conflict in conflicts])
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+@timetable_bp.route('/conflicts/validate', methods=['POST'])
+@require_admin
+def validate_timetable():
+    """Re-check a semester's whole timetable and record the conflicts found"""
+    try:
+        data = request.get_json(silent=True) or {}
+        academic_year = data.get('academic_year', '2024-25')
+        semester = data.get('semester', 1)
+        
+        from timetable_validator import validate_timetable as run_validation
+        
+        result = run_validation(academic_year, semester)
+        return jsonify({
+            'entries': result['entries'],
+            'counts': result['counts'],
+            'conflicts': result['conflicts'],
+            'validation_time': result['validation_time']
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Drag-and-drop moves, checked against the term's live occupancy (see timetable_occupancy)
+def move_target(data, slot_key):
+    """(time slot id, day, start time) a move request names; the id, or else the day and start time.
+
+    Raises ValueError if it names neither.
+    """
+    if data.get(slot_key) is not None:
+        try:
+            return int(data[slot_key]), None, None
+        except (TypeError, ValueError):
+            raise ValueError(f'{slot_key} must be a number')
+    if data.get('day_of_week') and data.get('start_time'):
+        return None, str(data['day_of_week']), str(data['start_time'])
+    raise ValueError(f'Give either {slot_key} or day_of_week and start_time')
+
+@timetable_bp.route('/validate-move', methods=['POST'])
+@require_admin
+def validate_entry_move():
+    """Check whether an entry can move to another time slot, without moving it"""
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            entry_id = int(data['entry_id'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'entry_id is required'}), 400
+        try:
+            target = move_target(data, 'new_time_slot_id')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        from timetable_occupancy import validate_move
+        
+        conn = get_db_connection()
+        result = validate_move(conn, entry_id, *target)
+        conn.close()
+        
+        if result is None:
+            return jsonify({'error': 'Timetable entry not found'}), 404
+        return jsonify({'valid': not result['conflicts'], **result})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@timetable_bp.route('/entries/<int:entry_id>', methods=['PUT'])
+@require_admin
+def move_timetable_entry(entry_id):
+    """Move an entry to another time slot; 409 with the conflicts if it can't go there"""
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            target = move_target(data, 'time_slot_id')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        from timetable_occupancy import move_entry
+        
+        conn = get_db_connection()
+        try:
+            result = move_entry(conn, entry_id, *target)
+        except sqlite3.IntegrityError:
+            # Another write took the slot after the check
+            conn.rollback()
+            result = {'conflicts': [{'conflict_type': 'double_booking',
+                                     'description': 'The time slot was taken by another change, reload the timetable'}]}
+        conn.close()
+        
+        if result is None:
+            return jsonify({'error': 'Timetable entry not found'}), 404
+        if result['conflicts']:
+            return jsonify({'error': 'The move conflicts with the timetable', **result}), 409
+        return jsonify({'message': 'Timetable entry moved', 'id': entry_id, 'time_slot_id': result['time_slot_id']})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -5,11 +5,51 @@ This module extends the existing EduTrack database with comprehensive timetable
 
 from flask import Flask
 import sqlite3
+from database import get_connection
 from datetime import datetime
 
+# Slot types written by insert_sample_time_slots; the generator schedules 'academic' slots
+TIME_SLOT_TYPES = ('academic', 'regular', 'lunch_break', 'short_break', 'lab_session',
+                   'extra_curricular', 'extended_break')
+
+def create_time_slots_table(cursor):
+    """Time Slots Definition"""
+    slot_types = ', '.join(f"'{slot_type}'" for slot_type in TIME_SLOT_TYPES)
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS time_slots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            slot_code TEXT UNIQUE NOT NULL,  -- e.g., 'MON_09_10', 'TUE_14_15'
+            day_of_week TEXT NOT NULL CHECK(day_of_week IN ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday')),
+            start_time TIME NOT NULL,
+            end_time TIME NOT NULL,
+            slot_type TEXT NOT NULL CHECK(slot_type IN ({slot_types})),
+            duration_minutes INTEGER NOT NULL,
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def migrate_time_slot_types(cursor):
+    """Rebuild a time_slots table created with the old slot_type CHECK, which rejected 'academic' slots.
+    SQLite can't alter a CHECK constraint, so the rows are copied into a new table."""
+    row = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'time_slots'").fetchone()
+    if row is None or "'academic'" in row[0]:
+        return
+
+    cursor.execute('ALTER TABLE time_slots RENAME TO time_slots_old')
+    create_time_slots_table(cursor)
+    cursor.execute('''
+        INSERT INTO time_slots
+        (id, slot_code, day_of_week, start_time, end_time, slot_type, duration_minutes, is_active, created_at)
+        SELECT id, slot_code, day_of_week, start_time, end_time, slot_type, duration_minutes, is_active, created_at
+        FROM time_slots_old
+    ''')
+    cursor.execute('DROP TABLE time_slots_old')
+    print("✅ time_slots migrated to accept academic slot types")
+
 def create_timetable_tables():
     """Create all tables required for the automated timetable scheduling system"""
-    conn = sqlite3.connect('school_system.db')
+    conn = get_connection()
     cursor = conn.cursor()
     
     # Enhanced Teachers table with qualifications and constraints
@@ -105,19 +145,8 @@ def create_timetable_tables():
     ''')
     
     # Time Slots Definition
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS time_slots (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            slot_code TEXT UNIQUE NOT NULL,  -- e.g., 'MON_09_10', 'TUE_14_15'
-            day_of_week TEXT NOT NULL CHECK(day_of_week IN ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday')),
-            start_time TIME NOT NULL,
-            end_time TIME NOT NULL,
-            slot_type TEXT NOT NULL CHECK(slot_type IN ('regular', 'lunch_break', 'short_break', 'lab_session')),
-            duration_minutes INTEGER NOT NULL,
-            is_active BOOLEAN DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    migrate_time_slot_types(cursor)
+    create_time_slots_table(cursor)
     
     # Main Timetable Entries
     cursor.execute('''
@@ -185,13 +214,23 @@ def create_timetable_tables():
         )
     ''')
     
+    # Data version per term, bumped by every write a timetable view shows ('*', 0 is shared by all terms)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS timetable_data_versions (
+            academic_year TEXT NOT NULL,
+            semester INTEGER NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (academic_year, semester)
+        )
+    ''')
+
     conn.commit()
     conn.close()
     print("✅ Timetable database schema created successfully!")
 
 def insert_sample_time_slots():
     """Insert time slots for EduTrack: 9:00 AM - 4:30 PM with lunch break (12:00-1:30 PM), 4:30-5:30 PM curricular activities, Saturday half-day"""
-    conn = sqlite3.connect('school_system.db')
+    conn = get_connection()
     cursor = conn.cursor()
     
     # Clear existing time slots
@@ -0,0 +1,269 @@
+"""
+Soft Constraint Scoring
+Weighted penalties for the quality of a conflict-free timetable: teacher
+gaps, rooms other than a teacher's preferred ones, days heavier than the
+weekly load spread evenly, back-to-back sessions in different buildings and
+the same subject twice in a day. Each soft constraint keeps counters of the
+placements it has seen, so booking or releasing one session returns the
+change in penalty without rescoring the timetable.
+"""
+
+import math
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from timetable_generator import ClassSession, Constraint, contiguous_runs, covered_slots
+
+
+class SoftConstraint(Constraint):
+    """A quality objective: it never rejects a placement, it only adds a penalty.
+
+    update() books (sign 1) or releases (sign -1) a placement and returns the
+    change in the unweighted penalty.
+    """
+    def __init__(self, name: str, data: Dict):
+        super().__init__(name, severity='minor')
+        self.data = data
+
+    def check(self, session: ClassSession, assignments: Dict, data: Dict):
+        return True, ''
+
+    def update(self, session: ClassSession, time_slot_id: int, classroom_id: int, sign: int) -> int:
+        raise NotImplementedError
+
+
+def _entities(session: ClassSession):
+    return ('group', session.group_id), ('teacher', session.teacher_id)
+
+
+class SubjectRepeatsConstraint(SoftConstraint):
+    """One point for each extra session of a subject on a day a group already has it"""
+    def __init__(self, data: Dict, sessions: List[ClassSession]):
+        super().__init__('subject_repeats', data)
+        self.count = defaultdict(int)
+
+    def update(self, session, time_slot_id, classroom_id, sign):
+        key = (session.group_id, session.subject_id, self.data['time_slots'][time_slot_id].day)
+        if sign < 0:
+            self.count[key] -= 1
+            return -1 if self.count[key] else 0
+        self.count[key] += 1
+        return 1 if self.count[key] > 1 else 0
+
+
+class TeacherGapsConstraint(SoftConstraint):
+    """One point for each free period between a teacher's first and last period of a day"""
+    def __init__(self, data: Dict, sessions: List[ClassSession]):
+        super().__init__('teacher_gaps', data)
+        by_day = defaultdict(list)
+        for time_slot in data['time_slots'].values():
+            by_day[time_slot.day].append(time_slot)
+        self.position = {}
+        for day, day_slots in by_day.items():
+            day_slots.sort(key=lambda time_slot: time_slot.start_time)
+            for index, time_slot in enumerate(day_slots):
+                self.position[time_slot.id] = (day, index)
+        self.busy = defaultdict(Counter)  # (teacher, day) -> {position: sessions}
+
+    @staticmethod
+    def _gaps(busy: Counter) -> int:
+        if not busy:
+            return 0
+        return max(busy) - min(busy) + 1 - len(busy)
+
+    def update(self, session, time_slot_id, classroom_id, sign):
+        day = self.position[time_slot_id][0]
+        busy = self.busy[(session.teacher_id, day)]
+        before = self._gaps(busy)
+        for covered_id in covered_slots(self.data, time_slot_id, session.periods):
+            index = self.position[covered_id][1]
+            busy[index] += sign
+            if not busy[index]:
+                del busy[index]
+        return self._gaps(busy) - before
+
+
+class PreferredRoomsConstraint(SoftConstraint):
+    """One point for each session outside its teacher's preferred rooms, if they have any"""
+    def __init__(self, data: Dict, sessions: List[ClassSession]):
+        super().__init__('preferred_rooms', data)
+        self.preferred = {teacher_id: frozenset(teacher.preferred_rooms)
+                          for teacher_id, teacher in data['teachers'].items() if teacher.preferred_rooms}
+
+    def update(self, session, time_slot_id, classroom_id, sign):
+        preferred = self.preferred.get(session.teacher_id)
+        if preferred and classroom_id not in preferred:
+            return sign
+        return 0
+
+
+class DailyLoadConstraint(SoftConstraint):
+    """One point for each period a group or teacher has on a day above an even spread.
+
+    The even spread is the weekly periods of all `sessions` of that group or
+    teacher over the days of the week, rounded up.
+    """
+    def __init__(self, data: Dict, sessions: List[ClassSession]):
+        super().__init__('daily_load', data)
+        days = len({time_slot.day for time_slot in data['time_slots'].values()}) or 1
+        weekly = defaultdict(int)
+        for session in sessions:
+            for entity in _entities(session):
+                weekly[entity] += session.periods
+        self.limit = {entity: math.ceil(periods / days) for entity, periods in weekly.items()}
+        self.load = defaultdict(int)
+
+    def update(self, session, time_slot_id, classroom_id, sign):
+        day = self.data['time_slots'][time_slot_id].day
+        delta = 0
+        for entity in _entities(session):
+            key = (entity, day)
+            limit = self.limit.get(entity, 0)
+            before = max(0, self.load[key] - limit)
+            self.load[key] += sign * session.periods
+            delta += max(0, self.load[key] - limit) - before
+        return delta
+
+
+class BuildingMovesConstraint(SoftConstraint):
+    """One point for each back-to-back pair of periods a group or teacher spends in different buildings.
+
+    Periods are back to back when a session of two periods could run through
+    both. Rooms without a building never count as a move, so they are not
+    tracked at all.
+    """
+    def __init__(self, data: Dict, sessions: List[ClassSession]):
+        super().__init__('building_moves', data)
+        self.follows = {run[0]: run[1] for run in contiguous_runs(data['time_slots'], 2).values()}
+        self.precedes = {second: first for first, second in self.follows.items()}
+        self.day = {time_slot.id: time_slot.day for time_slot in data['time_slots'].values()}
+        self.pairs = {}  # (time slot, periods) -> back-to-back pairs touching the run
+        self.buildings = defaultdict(lambda: defaultdict(Counter))  # (entity, day) -> slot -> {building: sessions}
+
+    def _pairs(self, time_slot_id: int, periods: int):
+        pairs = self.pairs.get((time_slot_id, periods))
+        if pairs is None:
+            pairs = set()
+            for covered_id in covered_slots(self.data, time_slot_id, periods):
+                if covered_id in self.precedes:
+                    pairs.add((self.precedes[covered_id], covered_id))
+                if covered_id in self.follows:
+                    pairs.add((covered_id, self.follows[covered_id]))
+            pairs = self.pairs[(time_slot_id, periods)] = tuple(pairs)
+        return pairs
+
+    @staticmethod
+    def _moves(booked: Dict[int, Counter], pairs) -> int:
+        moves = 0
+        for first, second in pairs:
+            here, there = booked.get(first), booked.get(second)
+            if here and there:
+                moves += sum(count * other_count
+                             for building, count in here.items()
+                             for other, other_count in there.items() if other != building)
+        return moves
+
+    def update(self, session, time_slot_id, classroom_id, sign):
+        classroom = self.data['classrooms'].get(classroom_id)
+        building = classroom.building if classroom else None
+        if building is None:
+            return 0
+        day = self.day[time_slot_id]
+        slots = covered_slots(self.data, time_slot_id, session.periods)
+        pairs = self._pairs(time_slot_id, session.periods)
+        delta = 0
+        for entity in _entities(session):
+            booked = self.buildings[(entity, day)]
+            before = self._moves(booked, pairs)
+            for covered_id in slots:
+                booked[covered_id][building] += sign
+                if not booked[covered_id][building]:
+                    del booked[covered_id][building]
+                    if not booked[covered_id]:
+                        del booked[covered_id]
+            delta += self._moves(booked, pairs) - before
+        return delta
+
+
+# Weight 0 switches a soft constraint off
+SOFT_CONSTRAINTS = {
+    'subject_repeats': SubjectRepeatsConstraint,
+    'teacher_gaps': TeacherGapsConstraint,
+    'preferred_rooms': PreferredRoomsConstraint,
+    'daily_load': DailyLoadConstraint,
+    'building_moves': BuildingMovesConstraint,
+}
+DEFAULT_SOFT_WEIGHTS = {
+    'subject_repeats': 1,
+    'teacher_gaps': 2,
+    'preferred_rooms': 1,
+    'daily_load': 1,
+    'building_moves': 3,
+}
+
+
+def soft_weights(weights: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """The default weights overridden by `weights`; unknown names raise ValueError"""
+    unknown = set(weights or ()) - set(SOFT_CONSTRAINTS)
+    if unknown:
+        raise ValueError(f"Unknown soft constraints: {', '.join(sorted(unknown))}. "
+                         f"Use any of: {', '.join(SOFT_CONSTRAINTS)}")
+    return dict(DEFAULT_SOFT_WEIGHTS, **(weights or {}))
+
+
+class SoftScorer:
+    """The weighted sum of the soft constraint penalties, kept up to date move by move.
+
+    `sessions` are all sessions the timetable will hold, fixed ones included;
+    they set the even daily spread. place() and remove() return the change in
+    the weighted score, which is also kept in `total`.
+    """
+
+    def __init__(self, data: Dict, sessions: Iterable[ClassSession],
+                 weights: Optional[Dict[str, float]] = None):
+        self.weights = soft_weights(weights)
+        sessions = list(sessions)
+        self.constraints = [(SOFT_CONSTRAINTS[name](data, sessions), weight)
+                            for name, weight in self.weights.items() if weight]
+        self.penalties = {name: 0 for name in self.weights}
+        self.total = 0
+
+    def _update(self, session: ClassSession, time_slot_id: int, classroom_id: int, sign: int) -> float:
+        delta = 0
+        for constraint, weight in self.constraints:
+            change = constraint.update(session, time_slot_id, classroom_id, sign)
+            if change:
+                self.penalties[constraint.name] += change
+                delta += change * weight
+        self.total += delta
+        return delta
+
+    def place(self, session: ClassSession, time_slot_id: int, classroom_id: int) -> float:
+        return self._update(session, time_slot_id, classroom_id, 1)
+
+    def remove(self, session: ClassSession, time_slot_id: int, classroom_id: int) -> float:
+        return self._update(session, time_slot_id, classroom_id, -1)
+
+    def trial(self, session: ClassSession, time_slot_id: int, classroom_id: int) -> float:
+        """The change placing a session would make, leaving the score as it was"""
+        delta = self.place(session, time_slot_id, classroom_id)
+        self.remove(session, time_slot_id, classroom_id)
+        return delta
+
+    def summary(self) -> Dict:
+        return {
+            'total': self.total,
+            'penalties': dict(self.penalties),
+            'weights': dict(self.weights)
+        }
+
+
+def score_timetable(data: Dict, assignments: Dict[str, ClassSession],
+                    weights: Optional[Dict[str, float]] = None) -> Dict:
+    """Score a finished timetable from scratch: its total, unweighted penalties and weights"""
+    placed = [session for session in assignments.values()
+              if session.time_slot_id is not None and session.classroom_id is not None]
+    scorer = SoftScorer(data, placed, weights)
+    for session in placed:
+        scorer.place(session, session.time_slot_id, session.classroom_id)
+    return scorer.summary()
@@ -0,0 +1,260 @@
+"""
+Whole-Timetable Validator
+Checks every active timetable entry of a semester in one vectorized pass and
+records what it finds in timetable_conflicts. Entries are loaded into NumPy
+columns and booked into occupancy tensors (entity x day x time cell), one each
+for teachers, rooms and groups, so double bookings are found by counting
+instead of comparing entries pairwise. Time cells are the spans between every
+distinct slot boundary of the week, which also catches overlapping slots that
+don't share an id. Capacity, room type, teacher unavailability and room
+closures are checked column-wise against the joined room, group, subject and
+teacher rows.
+"""
+
+import bisect
+import json
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from database import get_connection
+from timetable_generator import TimeSlot, closed_slots, unavailable_slots
+
+DAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday')
+
+SEVERITY = {
+    'teacher_double_booking': 'critical',
+    'room_double_booking': 'critical',
+    'group_double_booking': 'critical',
+    'teacher_unavailable': 'critical',
+    'room_unsuitable': 'major',
+    'capacity_exceeded': 'major'
+}
+
+
+def _minutes(clock: str) -> int:
+    hours, minutes = clock.split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def load_entries(academic_year: str, semester: int) -> Dict[str, np.ndarray]:
+    """Active entries of a semester as NumPy columns, joined with what the checks need.
+    Missing numbers (no room, group or subject row) are -1, missing labels None."""
+    conn = get_connection()
+    try:
+        rows = conn.execute('''
+            SELECT e.id, e.teacher_id, e.classroom_id, e.group_id, e.time_slot_id,
+                   COALESCE(c.seating_capacity, -1), c.room_type, c.room_number,
+                   COALESCE(g.student_count, -1), g.group_code,
+                   s.requires_special_room, COALESCE(s.min_room_capacity, -1),
+                   t.first_name || ' ' || t.last_name
+            FROM timetable_entries e
+            LEFT JOIN timetable_classrooms c ON e.classroom_id = c.id
+            LEFT JOIN timetable_student_groups g ON e.group_id = g.id
+            LEFT JOIN timetable_subjects s ON e.subject_id = s.id
+            LEFT JOIN timetable_teachers t ON e.teacher_id = t.id
+            WHERE e.academic_year = ? AND e.semester = ? AND e.status = 'active'
+            ORDER BY e.id
+        ''', (academic_year, semester)).fetchall()
+        slots = conn.execute('SELECT id, day_of_week, start_time, end_time FROM time_slots').fetchall()
+        unavailability = conn.execute('''
+            SELECT id, weekly_unavailability FROM timetable_teachers
+            WHERE weekly_unavailability IS NOT NULL AND weekly_unavailability NOT IN ('', '{}')
+        ''').fetchall()
+        closures = conn.execute('''
+            SELECT id, availability_constraints FROM timetable_classrooms
+            WHERE availability_constraints IS NOT NULL AND availability_constraints NOT IN ('', '{}')
+        ''').fetchall()
+    finally:
+        conn.close()
+
+    names = ('id', 'teacher_id', 'classroom_id', 'group_id', 'time_slot_id', 'capacity', 'room_type',
+             'room_number', 'student_count', 'group_code', 'special_room', 'min_capacity', 'teacher_name')
+    labels = {'room_type', 'room_number', 'group_code', 'special_room', 'teacher_name'}
+    columns = list(zip(*rows)) or [()] * len(names)
+    entries = {name: np.array(column, dtype=object if name in labels else np.int64)
+               for name, column in zip(names, columns)}
+    entries['slots'] = {row[0]: (row[1], row[2], row[3]) for row in slots}
+    entries['unavailability'] = {row[0]: row[1] for row in unavailability}
+    entries['closures'] = {row[0]: row[1] for row in closures}
+    return entries
+
+
+def _time_cells(slot_ids: List[int], slots: Dict):
+    """Day index plus first and past-the-end time cell for each slot id.
+    Slots with no time_slots row get day -1 and are left out of the occupancy."""
+    known = [slots[slot_id] for slot_id in slot_ids if slot_id in slots]
+    boundaries = sorted({_minutes(clock) for _, start, end in known for clock in (start, end)})
+    days, first, last = [], [], []
+    for slot_id in slot_ids:
+        if slot_id not in slots or slots[slot_id][0] not in DAYS:
+            days.append(-1)
+            first.append(0)
+            last.append(0)
+            continue
+        day, start, end = slots[slot_id]
+        days.append(DAYS.index(day))
+        start_cell = bisect.bisect_left(boundaries, _minutes(start))
+        first.append(start_cell)
+        last.append(max(bisect.bisect_left(boundaries, _minutes(end)), start_cell + 1))
+    return np.array(days, dtype=np.int64), np.array(first, dtype=np.int64), \
+        np.array(last, dtype=np.int64), max(len(boundaries), 1)
+
+
+def _double_bookings(entity_ids: np.ndarray, day: np.ndarray, first: np.ndarray, last: np.ndarray,
+                     cells: int) -> List[np.ndarray]:
+    """Groups of entry positions that book the same entity in overlapping time.
+
+    Each entry is spread over the time cells it covers and counted into an
+    (entity, day, cell) occupancy tensor; every cell counted more than once is
+    a clash between the entries that booked it.
+    """
+    placed = np.flatnonzero(day >= 0)
+    span = last[placed] - first[placed]
+    position = np.repeat(placed, span)
+    offsets = np.arange(len(position)) - np.repeat(np.cumsum(span) - span, span)
+    cell = first[position] + offsets
+
+    entities, entity = np.unique(entity_ids[position], return_inverse=True)
+    key = (entity * len(DAYS) + day[position]) * cells + cell
+    occupancy = np.bincount(key, minlength=len(entities) * len(DAYS) * cells)
+    clashing = occupancy[key] > 1
+
+    # Entries sharing a clashing cell; the same pair clashing in several cells is reported once
+    order = np.argsort(key[clashing], kind='stable')
+    clash_keys, clash_positions = key[clashing][order], position[clashing][order]
+    groups = np.split(clash_positions, np.flatnonzero(np.diff(clash_keys)) + 1)
+    unique = {tuple(group.tolist()): group for group in groups if len(group)}
+    return list(unique.values())
+
+
+def _unavailable(entity_ids: np.ndarray, slot_index: np.ndarray, slot_ids: np.ndarray, time_slots: Dict,
+                 rules: Dict[int, str], compile_rules) -> List[Tuple[int, str]]:
+    """(entry position, reason) of every entry booking an entity in a slot its rules block.
+
+    Each distinct JSON pattern is compiled once by `compile_rules` (e.g.
+    unavailable_slots) into a row of a pattern x slot matrix, so the entries
+    are checked by indexing it.
+    """
+    patterns = {}
+    entity_pattern = {entity_id: patterns.setdefault(pattern, len(patterns)) for entity_id, pattern in rules.items()}
+    if not patterns:
+        return []
+    reasons = []
+    for pattern in patterns:
+        blocked = compile_rules(json.loads(pattern), time_slots)
+        reasons.append([blocked.get(slot_id, '') for slot_id in slot_ids.tolist()])
+    blocked = np.array([[bool(reason) for reason in row] for row in reasons])
+    pattern = np.array([entity_pattern.get(entity_id, -1) for entity_id in entity_ids.tolist()])
+    has_pattern = pattern >= 0
+    unavailable = np.zeros(len(entity_ids), dtype=bool)
+    unavailable[has_pattern] = blocked[pattern[has_pattern], slot_index[has_pattern]]
+    return [(position, reasons[pattern[position]][slot_index[position]])
+            for position in np.flatnonzero(unavailable)]
+
+
+def detect_conflicts(entries: Dict) -> List[Dict]:
+    """Every conflict among the loaded entries, one per entry and conflict type"""
+    ids = entries['id']
+    if not len(ids):
+        return []
+    slot_ids, slot_index = np.unique(entries['time_slot_id'], return_inverse=True)
+    slot_day, slot_first, slot_last, cells = _time_cells(slot_ids.tolist(), entries['slots'])
+    day, first, last = slot_day[slot_index], slot_first[slot_index], slot_last[slot_index]
+
+    found = {}
+
+    def add(position: int, conflict_type: str, description: str):
+        found.setdefault((int(ids[position]), conflict_type), description)
+
+    def when(position: int) -> str:
+        slot = entries['slots'].get(int(entries['time_slot_id'][position]))
+        return f"{slot[0]} {slot[1]}-{slot[2]}" if slot else f"slot {entries['time_slot_id'][position]}"
+
+    for conflict_type, column, noun, name in (
+            ('teacher_double_booking', 'teacher_id', 'Teacher', 'teacher_name'),
+            ('room_double_booking', 'classroom_id', 'Room', 'room_number'),
+            ('group_double_booking', 'group_id', 'Group', 'group_code')):
+        for group in _double_bookings(entries[column], day, first, last, cells):
+            others = ', '.join(str(ids[position]) for position in group)
+            for position in group:
+                label = entries[name][position] or entries[column][position]
+                add(position, conflict_type,
+                    f"{noun} {label} is double-booked on {when(position)} (entries {others})")
+
+    # Rooms too small for the group or below the subject's minimum
+    capacity = entries['capacity']
+    known = capacity >= 0
+    for position in np.flatnonzero(known & (entries['student_count'] > capacity)):
+        add(position, 'capacity_exceeded', f"Room {entries['room_number'][position]} seats {capacity[position]} "
+                                           f"but group {entries['group_code'][position]} has "
+                                           f"{entries['student_count'][position]} students")
+    for position in np.flatnonzero(known & (entries['min_capacity'] > capacity)):
+        add(position, 'capacity_exceeded', f"Room {entries['room_number'][position]} seats {capacity[position]}, "
+                                           f"below the subject minimum of {entries['min_capacity'][position]}")
+
+    # Subjects needing a special room type
+    required, room_type = entries['special_room'], entries['room_type']
+    for position in np.flatnonzero((required != None) & (room_type != None) & (required != room_type)):  # noqa: E711
+        add(position, 'room_unsuitable', f"Room {entries['room_number'][position]} is a {room_type[position]}, "
+                                         f"the subject needs a {required[position]}")
+
+    # Teachers and rooms booked while unavailable
+    time_slots = {slot_id: TimeSlot(slot_id, *entries['slots'][slot_id], duration=0, slot_code='')
+                  for slot_id in slot_ids.tolist() if slot_id in entries['slots']}
+    for position, reason in _unavailable(entries['teacher_id'], slot_index, slot_ids, time_slots,
+                                         entries['unavailability'], unavailable_slots):
+        add(position, 'teacher_unavailable', f"Teacher {entries['teacher_name'][position]} is unavailable {reason}")
+    for position, reason in _unavailable(entries['classroom_id'], slot_index, slot_ids, time_slots,
+                                         entries['closures'], closed_slots):
+        add(position, 'room_unsuitable', f"Room {entries['room_number'][position]} is closed {reason}")
+
+    return [{'entry_id': entry_id, 'conflict_type': conflict_type, 'severity': SEVERITY[conflict_type],
+             'description': description}
+            for (entry_id, conflict_type), description in sorted(found.items())]
+
+
+def record_conflicts(academic_year: str, semester: int, conflicts: List[Dict]):
+    """Replace the semester's unresolved conflicts with `conflicts`.
+    Conflicts an admin marked 'ignored' are not raised again."""
+    conn = get_connection()
+    try:
+        conn.execute('''
+            DELETE FROM timetable_conflicts
+            WHERE resolution_status = 'unresolved' AND entry_id IN (
+                SELECT id FROM timetable_entries WHERE academic_year = ? AND semester = ?)
+        ''', (academic_year, semester))
+        ignored = set(conn.execute('''
+            SELECT tc.entry_id, tc.conflict_type FROM timetable_conflicts tc
+            JOIN timetable_entries te ON tc.entry_id = te.id
+            WHERE tc.resolution_status = 'ignored' AND te.academic_year = ? AND te.semester = ?
+        ''', (academic_year, semester)).fetchall())
+        conn.executemany('''
+            INSERT INTO timetable_conflicts (entry_id, conflict_type, conflict_description, severity)
+            VALUES (?, ?, ?, ?)
+        ''', [(c['entry_id'], c['conflict_type'], c['description'], c['severity'])
+              for c in conflicts if (c['entry_id'], c['conflict_type']) not in ignored])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def validate_timetable(academic_year: str, semester: int, record: bool = True) -> Dict:
+    """Check a semester's whole timetable and, unless `record` is False, store the conflicts found"""
+    start = time.perf_counter()
+    entries = load_entries(academic_year, semester)
+    conflicts = detect_conflicts(entries)
+    if record:
+        record_conflicts(academic_year, semester, conflicts)
+
+    counts = defaultdict(int)
+    for conflict in conflicts:
+        counts[conflict['conflict_type']] += 1
+    return {
+        'entries': len(entries['id']),
+        'conflicts': conflicts,
+        'counts': dict(counts),
+        'validation_time': time.perf_counter() - start
+    }
@@ -4,7 +4,7 @@ Handles sending and validating verification codes
 """
 import random
 import string
-import sqlite3
+from database import get_db
 from datetime import datetime, timedelta
 from flask_mail import Mail, Message
 from twilio.rest import Client
@@ -139,7 +139,7 @@ EduTrack Team
     
     def store_verification_codes(self, email, mobile_number, email_code, mobile_code, user_id=None):
         """Store verification codes in database"""
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         expiry_time = datetime.now() + timedelta(minutes=Config.VERIFICATION_CODE_EXPIRY_MINUTES)
@@ -182,7 +182,7 @@ EduTrack Team
     
     def verify_code(self, identifier, code, verification_type='email'):
         """Verify a code (email or mobile)"""
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         try:
@@ -252,7 +252,7 @@ EduTrack Team
     
     def mark_verified(self, email, mobile_number):
         """Mark email and mobile as verified in users table"""
-        conn = sqlite3.connect('school_system.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         try: